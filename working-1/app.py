@@ -1,30 +1,59 @@
 from flask import Flask, request, jsonify, current_app, send_from_directory
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from database import get_db_connection, init_db, close_db
+from database import (get_db_connection, init_db, close_db, init_app as init_db_pool, pool as db_pool,
+                      immediate_transaction, TransactionAborted)
 from models import User, UserRole, OTP
-from utils import generate_otp, get_otp_expiry, send_otp_email, is_otp_expired
+from utils import generate_otp, get_otp_expiry, build_otp_email, is_otp_expired
 from file_utils import save_uploaded_file, delete_file
+from facility_loader import load_facility_relations
+from pagination import parse_limit, parse_page_limit, fetch_limit, decode_cursor, page_response
+from cache import cached, invalidate, response_cache
+from conditional import conditional
+from slot_generator import generate_time_slots, parse_schedule, DEFAULT_SCHEDULE
+from availability import (availability_index, build_availability_grid, search_available_slots, time_to_minutes,
+                          minutes_to_time, AVAILABILITY_MAX_DAYS)
+from slot_inventory import (start_inventory_roller, ensure_inventory, resync_court_inventory,
+                            inventory_source, claim_booking_slots, release_booking_slots)
+from bulk_booking import parse_occurrences, check_occurrences, insert_occurrences
+from kpi_snapshot import kpi_snapshot, snapshot_response
+from email_outbox import email_outbox, enqueue_email
+from password_hashing import password_hasher, HashingBusy
+from otp_janitor import start_otp_janitor, get_janitor_report
+from rate_limit import rate_limited, rate_limiter
+from auth_tokens import init_app as init_auth, issue_token, login_required, principal_cache, request_user_id
+from holds import (hold_wheel, start_hold_expiry, place_hold, release_holds, release_expired_holds,
+                   HOLD_DEFAULT_MINUTES, HOLD_MAX_MINUTES)
 import sqlite3
 import re
 import os
 from datetime import datetime, timedelta
 import random
 import string
+import time
 
 # Configuration
 UPLOAD_FOLDER = 'uploads/facility_photos'
 ALLOWED_CITIES = ['Ahmedabad', 'Bangalore', 'Delhi', 'Mumbai', 'Hyderabad']
 
+# Tables that facility read endpoints are built from (for conditional GETs)
+FACILITY_TABLES = ('facilities', 'facility_courts', 'facility_amenities', 'facility_photos',
+                   'courts', 'reviews', 'users')
+
 # Create Flask app
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this in production
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')  # Set SECRET_KEY in production; it signs session tokens
 
 # Enable CORS for all routes
 CORS(app, origins=["http://localhost:3000", "http://localhost:3001"], supports_credentials=True)
 
-# Initialize database
+# Initialize database and request-scoped connection pooling
 init_db()
+init_db_pool(app)
+init_auth(app)
+start_inventory_roller()
+kpi_snapshot.start()
+email_outbox.start()
+start_otp_janitor()
 
 def validate_email(email):
     """Validate email format"""
@@ -35,6 +64,27 @@ def validate_password(password):
     """Validate password strength"""
     return len(password) >= 6
 
+def build_search_query(text):
+    """Turn free text into an FTS5 query of quoted prefix terms (all must match)"""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def invalidate_facility(facility_id):
+    """Purge cached reads for a facility and the facility listings"""
+    invalidate('facilities', f'facility:{facility_id}', f'availability:{facility_id}')
+
+def invalidate_availability(facility_id=None):
+    """Purge cached availability grids for a facility, or for every facility"""
+    invalidate(f'availability:{facility_id}' if facility_id is not None else 'availability')
+
+def release_hold_caches(facility_ids):
+    """Purge cached availability for facilities whose slot holds expired"""
+    for facility_id in facility_ids:
+        invalidate_availability(facility_id)
+
+# Reload checkout holds and start expiring them
+start_hold_expiry(release_hold_caches)
+
 def create_user_from_row(row):
     """Create User object from database row"""
     return User(
@@ -58,6 +108,7 @@ def create_otp_from_row(row):
     )
 
 @app.route('/signup', methods=['POST'])
+@rate_limited('signup', ip='10/minute', account='3/minute')
 def signup():
     """Send OTP for signup (account not created yet)"""
     try:
@@ -82,6 +133,9 @@ def signup():
         if role not in ['user', 'facility_owner', 'admin']:
             return jsonify({'error': 'Invalid role. Must be "user", "facility_owner", or "admin"'}), 400
         
+        # Hash before taking a connection; the KDF runs in the hashing pool
+        password_hash = password_hasher.hash(data['password'])
+        
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
@@ -102,7 +156,7 @@ def signup():
             ''', (
                 data['email'], 
                 data['full_name'], 
-                generate_password_hash(data['password']), 
+                password_hash, 
                 role, 
                 data.get('avatar_url'), 
                 otp_code, 
@@ -110,19 +164,17 @@ def signup():
                 False
             ))
             
-            conn.commit()
-            
-            # Send OTP email
-            email_sent, email_message = send_otp_email(data['email'], data['full_name'], otp_code)
+            # Queue the OTP email in the same transaction; the outbox sends it in the background
+            subject, body = build_otp_email(data['full_name'], otp_code)
+            enqueue_email(cursor, data['email'], subject, body)
             
-            if not email_sent:
-                print(f"Warning: Failed to send OTP email to {data['email']}: {email_message}")
-                return jsonify({'error': 'Failed to send OTP email. Please try again.'}), 500
+            conn.commit()
+            email_outbox.wake()
             
             return jsonify({
                 'message': 'OTP sent successfully. Please check your email for verification.',
                 'email': data['email'],
-                'email_sent': True
+                'email_queued': True
             }), 200
             
         except sqlite3.IntegrityError as e:
@@ -133,10 +185,13 @@ def signup():
         finally:
             close_db(conn)
             
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/verify-otp', methods=['POST'])
+@rate_limited('verify_otp', ip='30/minute', account='10/minute')
 def verify_otp():
     """Verify OTP and create user account"""
     try:
@@ -172,8 +227,8 @@ def verify_otp():
             
             # Create the user account
             cursor.execute('''
-                INSERT INTO users (full_name, email, password_hash, avatar_url, role)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO users (full_name, email, password_hash, avatar_url, role, email_verified)
+                VALUES (?, ?, ?, ?, ?, TRUE)
             ''', (
                 otp_temp_row['full_name'],
                 otp_temp_row['email'],
@@ -202,6 +257,7 @@ def verify_otp():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/login', methods=['POST'])
+@rate_limited('login', ip='30/minute', account='10/minute')
 def login():
     try:
         data = request.get_json()
@@ -223,36 +279,45 @@ def login():
             user = create_user_from_row(user_row)
             
             # Check password
-            if not check_password_hash(user.password_hash, data['password']):
+            if not password_hasher.verify(user.password_hash, data['password']):
                 return jsonify({'error': 'Invalid credentials'}), 401
             
-            # Check if user has verified OTP (skip for admin users)
-            if user.role == 'admin':
-                otp_verified = True
-            else:
-                cursor.execute('''
-                    SELECT COUNT(*) as verified_count 
-                    FROM otps 
-                    WHERE user_id = ? AND is_used = TRUE
-                ''', (user.id,))
-                
-                verified_count = cursor.fetchone()['verified_count']
-                otp_verified = verified_count > 0
+            # Upgrade hashes made with an older method or cost; best effort, the login still succeeds
+            try:
+                if password_hasher.needs_rehash(user.password_hash):
+                    cursor.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                                   (password_hasher.hash(data['password']), user.id, user.password_hash))
+                    conn.commit()
+                    password_hasher.record_rehash()
+            except HashingBusy:
+                pass
+            
+            # Admins are treated as verified
+            otp_verified = user_row['role'] == 'admin' or bool(user_row['email_verified'])
+            
+            # Signed session token; later requests send it as 'Authorization: Bearer <token>'
+            token, token_expires_at = issue_token(app.config['SECRET_KEY'], user.id, user_row['role'])
+            principal_cache.put(user_row)
             
             # Return user details
             return jsonify({
                 'message': 'Login successful',
                 'user': user.to_dict(),
-                'otp_verified': otp_verified
+                'otp_verified': otp_verified,
+                'token': token,
+                'token_expires_at': datetime.fromtimestamp(token_expires_at).isoformat()
             }), 200
             
         finally:
             close_db(conn)
         
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/users', methods=['GET'])
+@conditional('users')
 def get_users():
     """Get all users with role='user'"""
     try:
@@ -279,6 +344,7 @@ def get_users():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/facility-owners', methods=['GET'])
+@conditional('users')
 def get_facility_owners():
     """Get all users with role='facility_owner'"""
     try:
@@ -306,82 +372,12 @@ def get_facility_owners():
 
 @app.route('/admin/stats', methods=['GET'])
 def get_admin_stats():
-    """Get admin dashboard statistics"""
+    """Get admin dashboard statistics from the in-memory KPI snapshot"""
     try:
         conn = get_db_connection()
         try:
-            cursor = conn.cursor()
-            
-            # Get total users count
-            cursor.execute('SELECT COUNT(*) FROM users WHERE role = ?', ('user',))
-            total_users = cursor.fetchone()[0]
-            
-            # Get total facility owners count
-            cursor.execute('SELECT COUNT(*) FROM users WHERE role = ?', ('facility_owner',))
-            total_facility_owners = cursor.fetchone()[0]
-            
-            # Get total facilities count
-            cursor.execute('SELECT COUNT(*) FROM facilities')
-            total_facilities = cursor.fetchone()[0]
-            
-            # Get total bookings count
-            cursor.execute('SELECT COUNT(*) FROM bookings')
-            total_bookings = cursor.fetchone()[0]
-            
-            # Get total courts count
-            cursor.execute('SELECT COUNT(*) FROM courts')
-            total_courts = cursor.fetchone()[0]
-            
-            # Get pending facility approvals
-            cursor.execute('SELECT COUNT(*) FROM facilities WHERE status = ?', ('pending',))
-            pending_approvals = cursor.fetchone()[0]
-            
-            # Get monthly user registrations (last 6 months)
-            cursor.execute('''
-                SELECT strftime('%Y-%m', created_at) as month, COUNT(*) as count
-                FROM users 
-                WHERE created_at >= date('now', '-6 months')
-                GROUP BY strftime('%Y-%m', created_at)
-                ORDER BY month DESC
-            ''')
-            monthly_registrations = cursor.fetchall()
-            
-            # Get monthly bookings (last 6 months)
-            cursor.execute('''
-                SELECT strftime('%Y-%m', created_at) as month, COUNT(*) as count
-                FROM bookings 
-                WHERE created_at >= date('now', '-6 months')
-                GROUP BY strftime('%Y-%m', created_at)
-                ORDER BY month DESC
-            ''')
-            monthly_bookings = cursor.fetchall()
-            
-            # Get most active sports
-            cursor.execute('''
-                SELECT fc.sport_type, COUNT(b.id) as booking_count
-                FROM facility_courts fc
-                LEFT JOIN courts c ON fc.facility_id = c.facility_id
-                LEFT JOIN bookings b ON c.id = b.court_id
-                WHERE b.id IS NOT NULL
-                GROUP BY fc.sport_type
-                ORDER BY booking_count DESC
-                LIMIT 5
-            ''')
-            most_active_sports = cursor.fetchall()
-            
-            return jsonify({
-                'kpi_data': {
-                    'total_users': total_users,
-                    'total_facility_owners': total_facility_owners,
-                    'total_facilities': total_facilities,
-                    'total_bookings': total_bookings,
-                    'total_courts': total_courts,
-                    'pending_approvals': pending_approvals
-                },
-                'monthly_registrations': [{'month': row[0], 'count': row[1]} for row in monthly_registrations],
-                'monthly_bookings': [{'month': row[0], 'count': row[1]} for row in monthly_bookings],
-                'most_active_sports': [{'sport': row[0], 'bookings': row[1]} for row in most_active_sports]
-            }), 200
+            snapshot = kpi_snapshot.get(conn.cursor())
+            return jsonify(snapshot_response(snapshot)), 200
             
         finally:
             close_db(conn)
@@ -390,34 +386,67 @@ def get_admin_stats():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/admin/users', methods=['GET'])
+@conditional('users', 'bookings', 'facilities')
 def get_all_users():
-    """Get all users for admin management"""
+    """Get users for admin management, newest first
+    
+    Query parameters: limit, cursor (from the previous page's next_cursor),
+    role, status and q (case-insensitive prefix of name or email). Without
+    limit or cursor every matching user is returned.
+    """
     try:
+        try:
+            limit = parse_page_limit(request.args)
+            cursor_values = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conditions = []
+        params = []
+        
+        if request.args.get('role'):
+            conditions.append('u.role = ?')
+            params.append(request.args['role'])
+        
+        if request.args.get('status'):
+            conditions.append('u.status = ?')
+            params.append(request.args['status'])
+        
+        # Prefix match served by the NOCASE name and email indexes
+        if request.args.get('q'):
+            prefix = re.sub(r'([\\%_])', r'\\\1', request.args['q'].strip()) + '%'
+            conditions.append("(u.full_name LIKE ? ESCAPE '\\' OR u.email LIKE ? ESCAPE '\\')")
+            params.extend([prefix, prefix])
+        
+        # Keyset pagination on (created_at, id) so later pages cost the same as the first
+        if cursor_values:
+            conditions.append('(u.created_at, u.id) < (?, ?)')
+            params.extend(cursor_values)
+        
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
             
-            # Get all users with their details
-            cursor.execute('''
-                SELECT u.*, 
-                       COUNT(DISTINCT b.id) as total_bookings,
-                       COALESCE(SUM(b.total_amount), 0) as total_spent,
-                       COUNT(DISTINCT f.id) as facilities_owned
+            # Per-user aggregates come from user_stats, kept current by triggers
+            cursor.execute(f'''
+                SELECT u.id, u.full_name, u.email, u.role, u.status, u.created_at,
+                       s.total_bookings, s.total_spent, s.facilities_owned
                 FROM users u
-                LEFT JOIN bookings b ON u.id = b.user_id
-                LEFT JOIN facilities f ON u.id = f.owner_id
-                GROUP BY u.id
-                ORDER BY u.created_at DESC
-            ''')
+                LEFT JOIN user_stats s ON s.user_id = u.id
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY u.created_at DESC, u.id DESC
+                LIMIT ?
+            ''', params + [fetch_limit(limit)])
+            rows, next_cursor = page_response(cursor.fetchall(), limit, lambda row: (row['created_at'], row['id']))
             
             users_data = []
-            for row in cursor.fetchall():
+            for row in rows:
                 user_data = {
                     'id': row['id'],
                     'full_name': row['full_name'],
                     'email': row['email'],
                     'role': row['role'],
-                    'status': 'active',  # Default status
+                    'status': row['status'],
                     'join_date': row['created_at'],
                     'last_active': row['created_at'],  # Default to creation date
                     'total_bookings': row['total_bookings'] or 0,
@@ -428,7 +457,9 @@ def get_all_users():
             
             return jsonify({
                 'users': users_data,
-                'count': len(users_data)
+                'count': len(users_data),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }), 200
             
         finally:
@@ -438,6 +469,7 @@ def get_all_users():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/admin/facilities', methods=['GET'])
+@conditional(*FACILITY_TABLES)
 def get_all_facilities():
     """Get all facilities for admin management"""
     try:
@@ -447,31 +479,22 @@ def get_all_facilities():
             
             # Get all facilities with owner details
             cursor.execute('''
-                SELECT f.*, u.full_name as owner_name, u.email as owner_email
+                SELECT f.*, u.full_name as owner_name, u.email as owner_email,
+                       s.avg_rating, s.review_count, s.court_count
                 FROM facilities f
                 LEFT JOIN users u ON f.owner_id = u.id
+                LEFT JOIN facility_summary s ON s.facility_id = f.id
                 ORDER BY f.created_at DESC
             ''')
             
+            rows = [dict(row) for row in cursor.fetchall()]
+            
+            # Load sports and photos for all facilities in one batch
+            relations = load_facility_relations(cursor, [row['id'] for row in rows])
+            
             facilities_data = []
-            for row in cursor.fetchall():
-                # Get sports for this facility from facility_courts
-                cursor.execute('''
-                    SELECT sport_type, court_count
-                    FROM facility_courts
-                    WHERE facility_id = ?
-                ''', (row['id'],))
-                sports_data = cursor.fetchall()
-                
-                # Get photos for this facility
-                cursor.execute('''
-                    SELECT photo_url, is_primary
-                    FROM facility_photos
-                    WHERE facility_id = ?
-                    ORDER BY is_primary DESC, created_at ASC
-                ''', (row['id'],))
-                photos_data = cursor.fetchall()
-                
+            for row in rows:
+                related = relations[row['id']]
                 facility_data = {
                     'id': row['id'],
                     'name': row['name'],
@@ -481,10 +504,13 @@ def get_all_facilities():
                     'submission_date': row['created_at'],
                     'status': row.get('status', 'pending'),
                     'description': row.get('description', ''),
-                    'sports': [sport['sport_type'] for sport in sports_data],
+                    'sports': [sport['sport_type'] for sport in related['facility_courts']],
                     'amenities': ['Parking', 'Restrooms'],  # Default amenities
-                    'photos': [photo['photo_url'] for photo in photos_data],
-                    'documents': ['Business License']  # Default documents
+                    'photos': [photo['url'] for photo in related['photos']],
+                    'documents': ['Business License'],  # Default documents
+                    'court_count': row['court_count'] or 0,
+                    'average_rating': round(row['avg_rating'], 1) if row['avg_rating'] else 0,
+                    'total_reviews': row['review_count'] or 0
                 }
                 facilities_data.append(facility_data)
             
@@ -521,6 +547,7 @@ def approve_facility(facility_id):
                 return jsonify({'error': 'Invalid action'}), 400
             
             conn.commit()
+            invalidate_facility(facility_id)
             
             return jsonify({
                 'message': message,
@@ -535,11 +562,12 @@ def approve_facility(facility_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/update-profile', methods=['POST'])
+@login_required
 def update_profile():
     """Update user profile information"""
     try:
         data = request.get_json()
-        user_id = data.get('user_id')
+        user_id = request_user_id(data.get('user_id'))
         full_name = data.get('full_name')
         email = data.get('email')
         current_password = data.get('current_password')
@@ -567,11 +595,11 @@ def update_profile():
                 if not user:
                     return jsonify({'error': 'User not found'}), 404
                 
-                if not check_password_hash(current_password, user['password_hash']):
+                if not password_hasher.verify(user['password_hash'], current_password):
                     return jsonify({'error': 'Current password is incorrect'}), 400
                 
                 # Hash new password
-                new_password_hash = generate_password_hash(new_password)
+                new_password_hash = password_hasher.hash(new_password)
                 cursor.execute('''
                     UPDATE users 
                     SET full_name = ?, email = ?, password_hash = ?
@@ -586,6 +614,11 @@ def update_profile():
                 ''', (full_name, email, user_id))
             
             conn.commit()
+            principal_cache.invalidate(user_id)
+            
+            # Owner names and emails appear in facility listings and in each owned facility's details
+            cursor.execute('SELECT id FROM facilities WHERE owner_id = ?', (user_id,))
+            invalidate('facilities', *(f"facility:{row['id']}" for row in cursor.fetchall()))
             
             return jsonify({
                 'message': 'Profile updated successfully',
@@ -597,6 +630,8 @@ def update_profile():
         finally:
             close_db(conn)
         
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -659,52 +694,81 @@ def check_email_status():
 # Venue and Facility Management Endpoints
 
 @app.route('/facilities', methods=['GET'])
+@conditional(*FACILITY_TABLES)
+@cached(['facilities'])
 def get_facilities():
-    """Get all active facilities"""
+    """Get active facilities, newest first, a page at a time when limit or cursor is given
+    
+    Query parameters: limit, cursor (from the previous page's next_cursor),
+    city, sport, amenity, min_rating, min_rate and max_rate.
+    """
     try:
+        try:
+            limit = parse_page_limit(request.args)
+            cursor_values = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+            min_rating = request.args.get('min_rating', type=float)
+            min_rate = request.args.get('min_rate', type=float)
+            max_rate = request.args.get('max_rate', type=float)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conditions = ["f.status = 'active'"]
+        params = []
+        
+        if request.args.get('city'):
+            conditions.append('f.city = ?')
+            params.append(request.args['city'])
+        
+        if request.args.get('sport'):
+            conditions.append('f.id IN (SELECT facility_id FROM facility_courts WHERE sport_type = ?)')
+            params.append(request.args['sport'])
+        
+        if request.args.get('amenity'):
+            conditions.append('f.id IN (SELECT facility_id FROM facility_amenities WHERE amenity_name = ?)')
+            params.append(request.args['amenity'])
+        
+        if min_rating is not None:
+            conditions.append('s.avg_rating >= ?')
+            params.append(min_rating)
+        
+        if min_rate is not None or max_rate is not None:
+            conditions.append('''EXISTS (
+                SELECT 1 FROM courts c
+                WHERE c.facility_id = f.id AND c.hourly_rate >= ? AND c.hourly_rate <= ?
+            )''')
+            params.extend([min_rate if min_rate is not None else 0,
+                           max_rate if max_rate is not None else float('inf')])
+        
+        # Keyset pagination on (created_at, id) so later pages cost the same as the first
+        if cursor_values:
+            conditions.append('(f.created_at, f.id) < (?, ?)')
+            params.extend(cursor_values)
+        
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT f.id, f.name, f.description, f.location, f.city, f.phone, f.email, f.website,
                        f.operating_hours_weekdays, f.operating_hours_weekends, f.status,
                        f.created_at, f.updated_at,
-                       u.full_name as owner_name, u.email as owner_email
+                       u.full_name as owner_name, u.email as owner_email,
+                       s.avg_rating, s.review_count, s.court_count, s.min_hourly_rate, s.primary_photo_url
                 FROM facilities f
                 JOIN users u ON f.owner_id = u.id
-                WHERE f.status = 'active'
-                ORDER BY f.created_at DESC
-            ''')
-            
-            # Get reviews for each facility
-            cursor.execute('''
-                SELECT facility_id, AVG(rating) as avg_rating, COUNT(*) as total_reviews
-                FROM reviews
-                GROUP BY facility_id
-            ''')
-            
-            reviews_data = {}
-            for row in cursor.fetchall():
-                reviews_data[row['facility_id']] = {
-                    'average_rating': round(row['avg_rating'], 1) if row['avg_rating'] else 0,
-                    'total_reviews': row['total_reviews']
-                }
+                LEFT JOIN facility_summary s ON s.facility_id = f.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY f.created_at DESC, f.id DESC
+                LIMIT ?
+            ''', params + [fetch_limit(limit)])
+            rows, next_cursor = page_response(cursor.fetchall(), limit, lambda row: (row['created_at'], row['id']))
             
-            # Get the facilities data
-            cursor.execute('''
-                SELECT f.id, f.name, f.description, f.location, f.city, f.phone, f.email, f.website,
-                       f.operating_hours_weekdays, f.operating_hours_weekends, f.status,
-                       f.created_at, f.updated_at,
-                       u.full_name as owner_name, u.email as owner_email
-                FROM facilities f
-                JOIN users u ON f.owner_id = u.id
-                WHERE f.status = 'active'
-                ORDER BY f.created_at DESC
-            ''')
+            # Load sports, amenities and photos for all facilities in one batch
+            relations = load_facility_relations(cursor, [row['id'] for row in rows])
             
             # Format facilities with reviews
             facilities = []
-            for row in cursor.fetchall():
+            for row in rows:
+                related = relations[row['id']]
                 facility = {
                     'id': row['id'],
                     'name': row['name'],
@@ -720,37 +784,101 @@ def get_facilities():
                     'owner_name': row['owner_name'],
                     'owner_email': row['owner_email'],
                     'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
+                    'updated_at': row['updated_at'],
+                    'court_count': row['court_count'] or 0,
+                    'min_hourly_rate': float(row['min_hourly_rate']) if row['min_hourly_rate'] is not None else None,
+                    'primary_photo': row['primary_photo_url']
                 }
                 
                 # Add review stats
-                if row['id'] in reviews_data:
-                    facility['reviews'] = reviews_data[row['id']]
-                else:
-                    facility['reviews'] = {'average_rating': 0, 'total_reviews': 0}
-                
-                # Get sports
-                cursor.execute('SELECT sport_type FROM facility_courts WHERE facility_id = ?', (row['id'],))
-                facility['sports'] = [sport_row['sport_type'] for sport_row in cursor.fetchall()]
-                
-                # Get amenities
-                cursor.execute('SELECT amenity_name FROM facility_amenities WHERE facility_id = ?', (row['id'],))
-                facility['amenities'] = [amenity_row['amenity_name'] for amenity_row in cursor.fetchall()]
+                facility['reviews'] = {
+                    'average_rating': round(row['avg_rating'], 1) if row['avg_rating'] else 0,
+                    'total_reviews': row['review_count'] or 0
+                }
                 
-                # Get photos
-                cursor.execute('''
-                    SELECT fp.photo_url, fp.caption, fp.is_primary 
-                    FROM facility_photos fp
-                    WHERE fp.facility_id = ?
-                    ORDER BY fp.is_primary DESC, fp.id ASC
-                ''', (row['id'],))
-                facility['photos'] = [{'url': photo_row['photo_url'], 'caption': photo_row['caption'], 'is_primary': bool(photo_row['is_primary'])} for photo_row in cursor.fetchall()]
+                facility['sports'] = [court['sport_type'] for court in related['facility_courts']]
+                facility['amenities'] = related['amenities']
+                facility['photos'] = [{'url': photo['url'], 'caption': photo['caption'], 'is_primary': bool(photo['is_primary'])} for photo in related['photos']]
                 
                 facilities.append(facility)
             
             return jsonify({
                 'facilities': facilities,
-                'count': len(facilities)
+                'count': len(facilities),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }), 200
+            
+        finally:
+            close_db(conn)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/facilities/search', methods=['GET'])
+@conditional(*FACILITY_TABLES)
+@cached(['facilities'])
+def search_facilities():
+    """Full-text search over active facilities, ranked by bm25
+    
+    Query parameters: q, limit, cursor and an optional city filter.
+    """
+    try:
+        match_query = build_search_query(request.args.get('q', ''))
+        if not match_query:
+            return jsonify({'error': 'Search query q is required'}), 400
+        
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            cursor_values = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conditions = ['facility_search MATCH ?', "f.status = 'active'"]
+        params = [match_query]
+        
+        if request.args.get('city'):
+            conditions.append('f.city = ?')
+            params.append(request.args['city'])
+        
+        # Keyset pagination on (rank, id)
+        if cursor_values:
+            conditions.append('(s.rank, s.rowid) > (?, ?)')
+            params.extend(cursor_values)
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT s.rowid as id, s.rank,
+                       highlight(facility_search, 0, '<mark>', '</mark>') as name_highlight,
+                       snippet(facility_search, -1, '<mark>', '</mark>', '...', 16) as snippet,
+                       f.name, f.location, f.city
+                FROM facility_search s
+                JOIN facilities f ON f.id = s.rowid
+                WHERE {' AND '.join(conditions)}
+                ORDER BY s.rank, s.rowid
+                LIMIT ?
+            ''', params + [limit + 1])
+            rows, next_cursor = page_response(cursor.fetchall(), limit, lambda row: (row['rank'], row['id']))
+            
+            results = []
+            for row in rows:
+                results.append({
+                    'id': row['id'],
+                    'name': row['name'],
+                    'location': row['location'],
+                    'city': row['city'],
+                    'name_highlight': row['name_highlight'],
+                    'snippet': row['snippet'],
+                    'score': -row['rank']
+                })
+            
+            return jsonify({
+                'results': results,
+                'count': len(results),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }), 200
             
         finally:
@@ -760,11 +888,12 @@ def get_facilities():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/facilities/my', methods=['GET'])
+@conditional(*FACILITY_TABLES)
 def get_my_facilities():
     """Get facilities owned by the authenticated user"""
     try:
-        # Get user ID from query parameter (in a real app, use JWT tokens)
-        user_id = request.args.get('user_id')
+        # Session token's user, or user_id from the query string for older clients
+        user_id = request_user_id(request.args.get('user_id'))
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
         
@@ -773,8 +902,7 @@ def get_my_facilities():
             cursor = conn.cursor()
             
             # Verify user exists and is a facility owner
-            cursor.execute('SELECT id, role FROM users WHERE id = ?', (user_id,))
-            user = cursor.fetchone()
+            user = principal_cache.get(cursor, user_id)
             
             if not user:
                 return jsonify({'error': 'User not found'}), 404
@@ -784,29 +912,20 @@ def get_my_facilities():
             
             # Get facilities owned by this user
             cursor.execute('''
-                SELECT * FROM facilities 
-                WHERE owner_id = ? 
-                ORDER BY created_at DESC
+                SELECT f.*, s.court_count
+                FROM facilities f
+                LEFT JOIN facility_summary s ON s.facility_id = f.id
+                WHERE f.owner_id = ? 
+                ORDER BY f.created_at DESC
             ''', (user_id,))
+            rows = cursor.fetchall()
+            
+            # Load sports, amenities and photos in one batch
+            relations = load_facility_relations(cursor, [row['id'] for row in rows])
             
             facilities = []
-            for row in cursor.fetchall():
-                # Get sports for this facility
-                cursor.execute('SELECT sport_type FROM facility_courts WHERE facility_id = ?', (row['id'],))
-                sports = [sport_row['sport_type'] for sport_row in cursor.fetchall()]
-                
-                # Get amenities for this facility
-                cursor.execute('SELECT amenity_name FROM facility_amenities WHERE facility_id = ?', (row['id'],))
-                amenities = [amenity_row['amenity_name'] for amenity_row in cursor.fetchall()]
-                
-                # Get all photos
-                cursor.execute('SELECT photo_url, caption, is_primary FROM facility_photos WHERE facility_id = ? ORDER BY is_primary DESC, created_at ASC', (row['id'],))
-                photos = [{'url': photo_row['photo_url'], 'caption': photo_row['caption'], 'is_primary': photo_row['is_primary']} for photo_row in cursor.fetchall()]
-                
-                # Get courts count
-                cursor.execute('SELECT COUNT(*) as court_count FROM courts WHERE facility_id = ?', (row['id'],))
-                court_count = cursor.fetchone()['court_count']
-                
+            for row in rows:
+                related = relations[row['id']]
                 facility = {
                     'id': row['id'],
                     'name': row['name'],
@@ -818,10 +937,10 @@ def get_my_facilities():
                     'operating_hours_weekdays': row['operating_hours_weekdays'],
                     'operating_hours_weekends': row['operating_hours_weekends'],
                     'status': row['status'],
-                    'sports': sports,
-                    'amenities': amenities,
-                    'photos': photos,
-                    'court_count': court_count,
+                    'sports': [court['sport_type'] for court in related['facility_courts']],
+                    'amenities': related['amenities'],
+                    'photos': related['photos'],
+                    'court_count': row['court_count'] or 0,
                     'created_at': row['created_at'],
                     'updated_at': row['updated_at']
                 }
@@ -839,6 +958,8 @@ def get_my_facilities():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/facilities/<int:facility_id>', methods=['GET'])
+@conditional(*FACILITY_TABLES)
+@cached(lambda: [f"facility:{request.view_args['facility_id']}"])
 def get_facility(facility_id):
     """Get a specific facility by ID with all details"""
     try:
@@ -851,9 +972,11 @@ def get_facility(facility_id):
                 SELECT f.id, f.name, f.description, f.location, f.city, f.phone, f.email, f.website,
                        f.operating_hours_weekdays, f.operating_hours_weekends, f.status,
                        f.created_at, f.updated_at,
-                       u.full_name as owner_name, u.email as owner_email
+                       u.full_name as owner_name, u.email as owner_email,
+                       s.avg_rating, s.review_count, s.court_count, s.min_hourly_rate
                 FROM facilities f
                 JOIN users u ON f.owner_id = u.id
+                LEFT JOIN facility_summary s ON s.facility_id = f.id
                 WHERE f.id = ? AND f.status = 'active'
             ''', (facility_id,))
             
@@ -861,41 +984,12 @@ def get_facility(facility_id):
             if not facility:
                 return jsonify({'error': 'Facility not found'}), 404
             
-            # Get photos for this facility
-            cursor.execute('''
-                SELECT fp.photo_url, fp.caption, fp.is_primary 
-                FROM facility_photos fp
-                WHERE fp.facility_id = ?
-                ORDER BY fp.is_primary DESC, fp.id ASC
-            ''', (facility_id,))
-            
-            photos = []
-            for photo_row in cursor.fetchall():
-                photos.append({
-                    'url': photo_row['photo_url'],
-                    'is_primary': bool(photo_row['is_primary'])
-                })
-            
-            # Get sports for this facility
-            cursor.execute('SELECT sport_type FROM facility_courts WHERE facility_id = ?', (facility_id,))
-            sports = [sport_row['sport_type'] for sport_row in cursor.fetchall()]
+            # Load photos, sports and amenities
+            related = load_facility_relations(cursor, [facility_id])[facility_id]
             
-            # Get amenities for this facility
-            cursor.execute('SELECT amenity_name FROM facility_amenities WHERE facility_id = ?', (facility_id,))
-            amenities = [amenity_row['amenity_name'] for amenity_row in cursor.fetchall()]
-            
-            # Get reviews for this facility
-            cursor.execute('''
-                SELECT AVG(rating) as average_rating, COUNT(*) as total_reviews
-                FROM reviews
-                WHERE facility_id = ?
-            ''', (facility_id,))
-            
-            review_stats = cursor.fetchone()
-            reviews = {
-                'average_rating': float(review_stats['average_rating'] or 0),
-                'total_reviews': review_stats['total_reviews'] or 0
-            }
+            photos = [{'url': photo['url'], 'is_primary': bool(photo['is_primary'])} for photo in related['photos']]
+            sports = [court['sport_type'] for court in related['facility_courts']]
+            amenities = related['amenities']
             
             facility_data = {
                 'id': facility['id'],
@@ -908,6 +1002,12 @@ def get_facility(facility_id):
                 'photos': photos,
                 'facility_courts': [{'sport_type': sport, 'court_count': 1} for sport in sports],
                 'amenities': amenities,
+                'reviews': {
+                    'average_rating': round(facility['avg_rating'], 1) if facility['avg_rating'] else 0,
+                    'total_reviews': facility['review_count'] or 0
+                },
+                'court_count': facility['court_count'] or 0,
+                'min_hourly_rate': float(facility['min_hourly_rate']) if facility['min_hourly_rate'] is not None else None,
                 'owner_name': facility['owner_name'],
                 'created_at': facility['created_at']
             }
@@ -922,7 +1022,123 @@ def get_facility(facility_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/facilities/<int:facility_id>/availability', methods=['GET'])
+@conditional('facilities', 'courts', 'time_slots', 'bookings', 'slot_holds')
+@cached(lambda: ['availability', f"availability:{request.view_args['facility_id']}"])
+def get_facility_availability(facility_id):
+    """Get a court x date x slot availability grid for a facility"""
+    try:
+        sport = request.args.get('sport')
+        try:
+            start_date = datetime.strptime(request.args.get('from') or datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+            end_date = datetime.strptime(request.args['to'], '%Y-%m-%d') if request.args.get('to') else start_date + timedelta(days=6)
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+        
+        if end_date < start_date:
+            return jsonify({'error': 'to must not be before from'}), 400
+        if (end_date - start_date).days + 1 > AVAILABILITY_MAX_DAYS:
+            return jsonify({'error': f'Date range cannot exceed {AVAILABILITY_MAX_DAYS} days'}), 400
+        
+        dates = []
+        for offset in range((end_date - start_date).days + 1):
+            dates.append((start_date + timedelta(days=offset)).strftime('%Y-%m-%d'))
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT id FROM facilities WHERE id = ? AND status = 'active'", (facility_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Facility not found'}), 404
+            
+            courts = build_availability_grid(cursor, facility_id, dates, sport, inventory_source)
+            
+            return jsonify({
+                'facility_id': facility_id,
+                'from': dates[0],
+                'to': dates[-1],
+                'dates': dates,
+                'courts': [{
+                    'id': court['id'],
+                    'name': court['name'],
+                    'sport_type': court['sport_type'],
+                    'hourly_rate': float(court['hourly_rate']) if court['hourly_rate'] is not None else None,
+                    'days': court['days']
+                } for court in courts]
+            }), 200
+            
+        finally:
+            close_db(conn)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/availability/search', methods=['GET'])
+@conditional('facilities', 'courts', 'time_slots', 'bookings', 'slot_holds')
+def search_availability():
+    """Find open court slots across facilities
+    
+    Query parameters: sport, city, date (or from and to), start_time and
+    end_time bounding the slot, duration in minutes (default 60), sort
+    (start or price) and limit.
+    """
+    try:
+        sort = request.args.get('sort', 'start')
+        if sort not in ('start', 'price'):
+            return jsonify({'error': 'sort must be start or price'}), 400
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        duration = request.args.get('duration', 60, type=int)
+        try:
+            start_date = datetime.strptime(request.args.get('from') or request.args.get('date')
+                                           or datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+            end_date = datetime.strptime(request.args.get('to') or request.args.get('date')
+                                         or start_date.strftime('%Y-%m-%d'), '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'date, from and to must be dates in YYYY-MM-DD format'}), 400
+        try:
+            window_start = time_to_minutes(request.args.get('start_time', '00:00'))
+            window_end = time_to_minutes(request.args.get('end_time', '24:00'))
+        except ValueError:
+            return jsonify({'error': 'start_time and end_time must be in HH:MM format'}), 400
+        
+        if end_date < start_date:
+            return jsonify({'error': 'to must not be before from'}), 400
+        if (end_date - start_date).days + 1 > AVAILABILITY_MAX_DAYS:
+            return jsonify({'error': f'Date range cannot exceed {AVAILABILITY_MAX_DAYS} days'}), 400
+        if duration <= 0 or window_start + duration > window_end:
+            return jsonify({'error': 'duration must fit between start_time and end_time'}), 400
+        
+        dates = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            
+            results = search_available_slots(cursor, dates[0], dates[-1], window_start, window_end, duration,
+                                             request.args.get('sport'), request.args.get('city'), sort, limit,
+                                             inventory_source)
+            
+            return jsonify({
+                'results': results,
+                'count': len(results),
+                'from': dates[0],
+                'to': dates[-1],
+                'duration': duration,
+                'sort': sort
+            }), 200
+            
+        finally:
+            close_db(conn)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/facilities', methods=['POST'])
+@login_required
 def create_facility():
     """Create a new facility with file upload support"""
     try:
@@ -961,11 +1177,13 @@ def create_facility():
                           for i, url in enumerate(data.get('photos', []))]
         
         # Validate required fields
-        required_fields = ['owner_id', 'name', 'location', 'city']
+        required_fields = ['name', 'location', 'city']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
+        owner_id = request_user_id(data.get('owner_id'))
+        
         # Validate city
         if data['city'] not in ALLOWED_CITIES:
             return jsonify({'error': f'Invalid city. Must be one of: {ALLOWED_CITIES}'}), 400
@@ -975,8 +1193,7 @@ def create_facility():
             cursor = conn.cursor()
             
             # Verify user exists and is a facility owner
-            cursor.execute('SELECT id, role FROM users WHERE id = ?', (data['owner_id'],))
-            user = cursor.fetchone()
+            user = principal_cache.get(cursor, owner_id)
             
             if not user:
                 return jsonify({'error': 'User not found'}), 404
@@ -991,7 +1208,7 @@ def create_facility():
                     operating_hours_weekdays, operating_hours_weekends, status
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                data['owner_id'],
+                owner_id,
                 data['name'],
                 data.get('description', ''),
                 data['location'],
@@ -1062,7 +1279,7 @@ def create_facility():
                     photo['path'] or '',
                     'image/jpeg',  # Default, could be more specific
                     os.path.getsize(photo['path']) if photo['path'] else 0,
-                    data['owner_id']
+                    owner_id
                 ))
                 
                 file_storage_id = cursor.lastrowid
@@ -1080,6 +1297,7 @@ def create_facility():
                 ))
             
             conn.commit()
+            invalidate('facilities')
             
             return jsonify({
                 'message': 'Facility created successfully',
@@ -1169,6 +1387,7 @@ def update_facility(facility_id):
                     ''', (facility_id, photo, '', is_primary))
             
             conn.commit()
+            invalidate_facility(facility_id)
             
             return jsonify({
                 'message': 'Facility updated successfully',
@@ -1198,6 +1417,7 @@ def delete_facility(facility_id):
             cursor.execute('UPDATE facilities SET status = "inactive", updated_at = CURRENT_TIMESTAMP WHERE id = ?', (facility_id,))
             
             conn.commit()
+            invalidate_facility(facility_id)
             
             return jsonify({
                 'message': 'Facility deleted successfully',
@@ -1213,6 +1433,7 @@ def delete_facility(facility_id):
 # Court Management Endpoints
 
 @app.route('/courts', methods=['GET'])
+@conditional('courts')
 def get_courts():
     """Get all courts for a specific facility"""
     try:
@@ -1298,6 +1519,7 @@ def create_court():
             court_id = cursor.lastrowid
             
             conn.commit()
+            invalidate_facility(data['facility_id'])
             
             return jsonify({
                 'message': 'Court created successfully',
@@ -1348,6 +1570,7 @@ def update_court(court_id):
                 ''', update_values)
             
             conn.commit()
+            invalidate_facility(court['facility_id'])
             
             return jsonify({
                 'message': 'Court updated successfully',
@@ -1369,14 +1592,16 @@ def delete_court(court_id):
             cursor = conn.cursor()
             
             # Check if court exists
-            cursor.execute('SELECT id FROM courts WHERE id = ?', (court_id,))
-            if not cursor.fetchone():
+            cursor.execute('SELECT id, facility_id FROM courts WHERE id = ?', (court_id,))
+            court = cursor.fetchone()
+            if not court:
                 return jsonify({'error': 'Court not found'}), 404
             
             # Delete the court
             cursor.execute('DELETE FROM courts WHERE id = ?', (court_id,))
             
             conn.commit()
+            invalidate_facility(court['facility_id'])
             
             return jsonify({
                 'message': 'Court deleted successfully',
@@ -1392,6 +1617,7 @@ def delete_court(court_id):
 # Time Slot Management Endpoints
 
 @app.route('/time-slots', methods=['GET'])
+@conditional('time_slots', 'bookings', 'slot_holds')
 def get_time_slots():
     """Get time slots for a specific court and date"""
     try:
@@ -1410,42 +1636,46 @@ def get_time_slots():
         try:
             cursor = conn.cursor()
             
-            # Determine day_of_week
+            time_slots = []
             if date:
+                # Date-specific availability comes straight from the slot inventory (read-only)
+                inventory, inventory_params = inventory_source(date, date, [court_id])
                 target_day_of_week = get_day_of_week(date)
+                cursor.execute(f'''
+                    SELECT si.court_id, si.start_minute, si.end_minute, si.status, si.hold_id,
+                           si.time_slot_id, ts.created_at
+                    FROM {inventory} si
+                    LEFT JOIN time_slots ts ON ts.id = si.time_slot_id
+                    WHERE si.court_id = ? AND si.slot_date = ?
+                    ORDER BY si.start_minute
+                ''', inventory_params + [court_id, date])
+                for row in cursor.fetchall():
+                    time_slots.append({
+                        'id': row['time_slot_id'],
+                        'court_id': row['court_id'],
+                        'day_of_week': target_day_of_week,
+                        'start_time': minutes_to_time(row['start_minute']),
+                        'end_time': minutes_to_time(row['end_minute']),
+                        'is_available': row['status'] == 'open' and row['hold_id'] is None,
+                        'created_at': row['created_at']
+                    })
             else:
-                target_day_of_week = int(day_of_week)
-            
-            # Get time slots for the court and day
-            cursor.execute('''
-                SELECT ts.*, 
-                       CASE WHEN b.id IS NOT NULL THEN FALSE ELSE ts.is_available END as is_actually_available
-                FROM time_slots ts
-                LEFT JOIN (
-                    SELECT b.id, b.start_time, b.end_time
-                    FROM bookings b
-                    WHERE b.court_id = ? 
-                    AND b.booking_date = ? 
-                    AND b.status != 'cancelled'
-                ) b ON (
-                    ts.start_time >= b.start_time AND ts.start_time < b.end_time
-                )
-                WHERE ts.court_id = ? AND ts.day_of_week = ?
-                ORDER BY ts.start_time
-            ''', (court_id, date, court_id, target_day_of_week))
-            
-            time_slots = []
-            for row in cursor.fetchall():
-                time_slot = {
-                    'id': row['id'],
-                    'court_id': row['court_id'],
-                    'day_of_week': row['day_of_week'],
-                    'start_time': row['start_time'],
-                    'end_time': row['end_time'],
-                    'is_available': bool(row['is_actually_available']),
-                    'created_at': row['created_at']
-                }
-                time_slots.append(time_slot)
+                # Without a date, return the weekly templates
+                cursor.execute('''
+                    SELECT * FROM time_slots
+                    WHERE court_id = ? AND day_of_week = ?
+                    ORDER BY start_time
+                ''', (court_id, int(day_of_week)))
+                for row in cursor.fetchall():
+                    time_slots.append({
+                        'id': row['id'],
+                        'court_id': row['court_id'],
+                        'day_of_week': row['day_of_week'],
+                        'start_time': row['start_time'],
+                        'end_time': row['end_time'],
+                        'is_available': bool(row['is_available']),
+                        'created_at': row['created_at']
+                    })
             
             return jsonify({
                 'time_slots': time_slots,
@@ -1475,8 +1705,9 @@ def create_time_slots():
             cursor = conn.cursor()
             
             # Verify court exists
-            cursor.execute('SELECT id FROM courts WHERE id = ?', (data['court_id'],))
-            if not cursor.fetchone():
+            cursor.execute('SELECT id, facility_id FROM courts WHERE id = ?', (data['court_id'],))
+            court = cursor.fetchone()
+            if not court:
                 return jsonify({'error': 'Court not found'}), 404
             
             # Insert time slot
@@ -1493,14 +1724,21 @@ def create_time_slots():
             ))
             
             time_slot_id = cursor.lastrowid
+            resync_court_inventory(cursor, [data['court_id']])
             
             conn.commit()
+            invalidate_availability(court['facility_id'])
             
             return jsonify({
                 'message': 'Time slot created successfully',
                 'time_slot_id': time_slot_id
             }), 201
             
+        except sqlite3.IntegrityError as e:
+            conn.rollback()
+            if "UNIQUE constraint failed" in str(e):
+                return jsonify({'error': 'A time slot already starts at this time on this day'}), 409
+            raise e
         finally:
             close_db(conn)
         
@@ -1518,8 +1756,14 @@ def update_time_slot(time_slot_id):
             cursor = conn.cursor()
             
             # Check if time slot exists
-            cursor.execute('SELECT * FROM time_slots WHERE id = ?', (time_slot_id,))
-            if not cursor.fetchone():
+            cursor.execute('''
+                SELECT ts.*, c.facility_id
+                FROM time_slots ts
+                LEFT JOIN courts c ON c.id = ts.court_id
+                WHERE ts.id = ?
+            ''', (time_slot_id,))
+            time_slot = cursor.fetchone()
+            if not time_slot:
                 return jsonify({'error': 'Time slot not found'}), 404
             
             # Update time slot fields
@@ -1541,14 +1785,21 @@ def update_time_slot(time_slot_id):
                     SET {', '.join(update_sql)}
                     WHERE id = ?
                 ''', update_values)
+                resync_court_inventory(cursor, [time_slot['court_id']])
             
             conn.commit()
+            invalidate_availability(time_slot['facility_id'])
             
             return jsonify({
                 'message': 'Time slot updated successfully',
                 'time_slot_id': time_slot_id
             }), 200
             
+        except sqlite3.IntegrityError as e:
+            conn.rollback()
+            if "UNIQUE constraint failed" in str(e):
+                return jsonify({'error': 'A time slot already starts at this time on this day'}), 409
+            raise e
         finally:
             close_db(conn)
         
@@ -1572,8 +1823,9 @@ def bulk_update_time_slots():
             cursor = conn.cursor()
             
             # Verify court exists
-            cursor.execute('SELECT id FROM courts WHERE id = ?', (data['court_id'],))
-            if not cursor.fetchone():
+            cursor.execute('SELECT id, facility_id FROM courts WHERE id = ?', (data['court_id'],))
+            court = cursor.fetchone()
+            if not court:
                 return jsonify({'error': 'Court not found'}), 404
             
             # Update time slots in the range
@@ -1591,8 +1843,10 @@ def bulk_update_time_slots():
             ))
             
             affected_rows = cursor.rowcount
+            resync_court_inventory(cursor, [data['court_id']])
             
             conn.commit()
+            invalidate_availability(court['facility_id'])
             
             return jsonify({
                 'message': f'{affected_rows} time slots updated successfully',
@@ -1608,19 +1862,65 @@ def bulk_update_time_slots():
 # Booking Management Endpoints
 
 @app.route('/bookings', methods=['GET'])
+@conditional('bookings', 'courts', 'facilities', 'users')
 def get_bookings():
-    """Get all bookings for a user"""
+    """Get a user's or a facility's bookings, latest date first
+    
+    Query parameters: user_id and/or facility_id (one is required), status
+    (comma-separated), from and to (booking dates, inclusive), limit and
+    cursor (from the previous page's next_cursor). Without limit or cursor
+    every matching booking is returned.
+    """
     try:
         user_id = request.args.get('user_id')
-        if not user_id:
+        facility_id = request.args.get('facility_id')
+        if not user_id and not facility_id:
+            user_id = request_user_id()
+        if not user_id and not facility_id:
             return jsonify({'error': 'User ID is required'}), 400
         
+        try:
+            limit = parse_page_limit(request.args)
+            cursor_values = decode_cursor(request.args['cursor'], 3) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conditions = []
+        params = []
+        
+        if user_id:
+            conditions.append('b.user_id = ?')
+            params.append(user_id)
+        
+        if facility_id:
+            conditions.append('b.facility_id = ?')
+            params.append(facility_id)
+        
+        if request.args.get('status'):
+            statuses = request.args['status'].split(',')
+            conditions.append(f"b.status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        
+        if request.args.get('from'):
+            conditions.append('b.booking_date >= ?')
+            params.append(request.args['from'])
+        
+        if request.args.get('to'):
+            conditions.append('b.booking_date <= ?')
+            params.append(request.args['to'])
+        
+        # Keyset pagination on (booking_date DESC, start_time, id) so later pages cost the same as the first
+        if cursor_values:
+            conditions.append('''(b.booking_date < ? OR (b.booking_date = ? AND
+                                 (b.start_time > ? OR (b.start_time = ? AND b.id > ?))))''')
+            params.extend([cursor_values[0], cursor_values[0], cursor_values[1], cursor_values[1], cursor_values[2]])
+        
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
             
             # Get bookings with court, facility, and venue details
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT 
                     b.id, b.booking_date, b.start_time, b.end_time, b.duration, 
                     b.total_amount, b.payment_method, b.status, b.created_at,
@@ -1631,12 +1931,15 @@ def get_bookings():
                 JOIN courts c ON b.court_id = c.id
                 JOIN facilities f ON c.facility_id = f.id
                 JOIN users u ON b.user_id = u.id
-                WHERE b.user_id = ?
-                ORDER BY b.booking_date DESC, b.start_time ASC
-            ''', (user_id,))
+                WHERE {' AND '.join(conditions)}
+                ORDER BY b.booking_date DESC, b.start_time ASC, b.id ASC
+                LIMIT ?
+            ''', params + [fetch_limit(limit)])
+            rows, next_cursor = page_response(cursor.fetchall(), limit,
+                                              lambda row: (row['booking_date'], row['start_time'], row['id']))
             
             bookings = []
-            for row in cursor.fetchall():
+            for row in rows:
                 booking = {
                     'id': row['id'],
                     'booking_date': row['booking_date'],
@@ -1657,7 +1960,9 @@ def get_bookings():
             
             return jsonify({
                 'bookings': bookings,
-                'count': len(bookings)
+                'count': len(bookings),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }), 200
             
         finally:
@@ -1667,16 +1972,18 @@ def get_bookings():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/bookings', methods=['POST'])
+@login_required
 def create_booking():
     """Create a new booking"""
     try:
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['user_id', 'court_id', 'booking_date', 'start_time', 'end_time', 'duration', 'total_amount', 'payment_method', 'status']
+        required_fields = ['court_id', 'booking_date', 'start_time', 'end_time', 'duration', 'total_amount', 'payment_method', 'status']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
+        user_id = request_user_id(data.get('user_id'))
         
         conn = get_db_connection()
         try:
@@ -1692,81 +1999,181 @@ def create_booking():
             if court['status'] != 'active':
                 return jsonify({'error': 'Court is not available for booking'}), 400
             
-            # Check if time slot is available
-            day_of_week = get_day_of_week(data['booking_date'])
+            # Generate the date's inventory up front so the booking transaction only claims rows
+            if ensure_inventory(cursor, data['booking_date'], data['booking_date'], [data['court_id']]):
+                conn.commit()
             
-            # Check if the specific time slot is already booked
-            cursor.execute('''
-                SELECT b.id FROM bookings b
-                JOIN courts c ON b.court_id = c.id
-                WHERE b.court_id = ? 
-                AND b.booking_date = ? 
-                AND b.status != 'cancelled'
-                AND (
-                    (b.start_time <= ? AND b.end_time > ?) OR
-                    (b.start_time < ? AND b.end_time >= ?) OR
-                    (b.start_time >= ? AND b.end_time <= ?)
-                )
-            ''', (
-                data['court_id'], 
-                data['booking_date'], 
-                data['start_time'], 
-                data['start_time'],
-                data['end_time'],
-                data['end_time'],
-                data['start_time'],
-                data['end_time']
-            ))
+            start_minute = time_to_minutes(data['start_time'])
+            end_minute = time_to_minutes(data['end_time'])
             
-            conflicting_booking = cursor.fetchone()
-            if conflicting_booking:
-                return jsonify({'error': 'This time slot is already booked. Please choose a different time.'}), 400
+            # Check and claim under the write lock so concurrent requests cannot both pass the checks
+            with immediate_transaction(conn) as cursor:
+                # Slots held by this user's own checkout hold count as open
+                release_expired_holds(cursor, data['court_id'], data['booking_date'])
+                hold_id = None
+                if data.get('hold_id'):
+                    cursor.execute('''
+                        SELECT id FROM slot_holds
+                        WHERE id = ? AND user_id = ? AND court_id = ? AND slot_date = ?
+                    ''', (data['hold_id'], user_id, data['court_id'], data['booking_date']))
+                    hold = cursor.fetchone()
+                    hold_id = hold['id'] if hold else None
+                
+                # Check if the specific time slot is already booked
+                if availability_index.find_conflicts(cursor, data['court_id'], data['booking_date'],
+                                                     data['start_time'], data['end_time']):
+                    raise TransactionAborted({'error': 'This time slot is already booked. Please choose a different time.'}, 400)
+                
+                # Also check that the slot exists for this date and every slot it covers is open
+                cursor.execute('''
+                    SELECT start_minute, status, hold_id FROM slot_inventory
+                    WHERE court_id = ? AND slot_date = ? AND start_minute >= ? AND start_minute < ?
+                ''', (data['court_id'], data['booking_date'], start_minute, end_minute))
+                slots = cursor.fetchall()
+                if (not any(slot['start_minute'] == start_minute for slot in slots)
+                        or any(slot['status'] != 'open' or slot['hold_id'] not in (None, hold_id) for slot in slots)):
+                    raise TransactionAborted({'error': 'Selected time slot is not available'}, 400)
+                
+                # Create booking (idx_bookings_active_slot rejects a second active booking of the slot)
+                try:
+                    cursor.execute('''
+                        INSERT INTO bookings (user_id, court_id, facility_id, booking_date, start_time, end_time, duration, total_amount, payment_method, status, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (
+                        user_id,
+                        data['court_id'],
+                        court['facility_id'],  # Get facility_id from court
+                        data['booking_date'],
+                        data['start_time'],
+                        data['end_time'],
+                        data['duration'],
+                        data['total_amount'],
+                        data['payment_method'],
+                        data['status']
+                    ))
+                except sqlite3.IntegrityError as e:
+                    if "UNIQUE constraint failed" in str(e):
+                        raise TransactionAborted({'error': 'This time slot is already booked. Please choose a different time.'}, 400)
+                    raise e
+                
+                booking_id = cursor.lastrowid
+                
+                # Mark the booked slots for this date only; every covered slot must flip from open
+                if claim_booking_slots(cursor, booking_id, data['court_id'], data['booking_date'],
+                                       data['start_time'], data['end_time'], hold_id) != len(slots):
+                    raise TransactionAborted({'error': 'Selected time slot is not available'}, 400)
+                
+                # The hold has served its purpose
+                release_holds(cursor, [hold_id] if hold_id else [])
+                
+                cursor.execute('SELECT id, user_id, start_time, end_time FROM bookings WHERE id = ?', (booking_id,))
+                booking = dict(cursor.fetchone())
+                day_version = availability_index.day_version(cursor, data['court_id'], data['booking_date'])
             
-            # Also check if the time slot exists and is available in the time_slots table
-            cursor.execute('''
-                SELECT id FROM time_slots 
-                WHERE court_id = ? AND day_of_week = ? AND start_time = ? AND is_available = TRUE
-            ''', (data['court_id'], day_of_week, data['start_time']))
+            availability_index.record_booking(data['court_id'], data['booking_date'], booking, day_version)
+            if hold_id:
+                hold_wheel.cancel(hold_id)
+            invalidate_availability(court['facility_id'])
             
-            if not cursor.fetchone():
-                return jsonify({'error': 'Selected time slot is not available'}), 400
+            return jsonify({
+                'message': 'Booking created successfully',
+                'booking_id': booking_id
+            }), 201
             
-            # Create booking
-            cursor.execute('''
-                INSERT INTO bookings (user_id, court_id, facility_id, booking_date, start_time, end_time, duration, total_amount, payment_method, status, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                data['user_id'],
-                data['court_id'],
-                court['facility_id'],  # Get facility_id from court
-                data['booking_date'],
-                data['start_time'],
-                data['end_time'],
-                data['duration'],
-                data['total_amount'],
-                data['payment_method'],
-                data['status']
-            ))
+        finally:
+            close_db(conn)
+            
+    except TransactionAborted as e:
+        return jsonify(e.payload), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/bookings/bulk', methods=['POST'])
+@login_required
+def create_bulk_booking():
+    """Book many slots or a weekly recurrence on one court in a single transaction"""
+    try:
+        data = request.get_json()
+        
+        required_fields = ['court_id', 'payment_method', 'status']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'error': f'{field} is required'}), 400
+        user_id = request_user_id(data.get('user_id'))
+        
+        try:
+            occurrences = parse_occurrences(data)
+            amount = float(data['amount_per_booking']) if data.get('amount_per_booking') is not None else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Book what is free and report the rest, instead of all or nothing
+        skip_conflicts = str(data.get('skip_conflicts', 'false')).lower() == 'true'
+        
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
             
-            booking_id = cursor.lastrowid
+            # Check if court exists and is available
+            cursor.execute('SELECT id, status, facility_id, hourly_rate FROM courts WHERE id = ?', (data['court_id'],))
+            court = cursor.fetchone()
             
-            # Update time slot availability
-            cursor.execute('''
-                UPDATE time_slots 
-                SET is_available = FALSE 
-                WHERE court_id = ? AND day_of_week = ? AND start_time = ?
-            ''', (data['court_id'], day_of_week, data['start_time']))
+            if not court:
+                return jsonify({'error': 'Court not found'}), 404
             
-            conn.commit()
+            if court['status'] != 'active':
+                return jsonify({'error': 'Court is not available for booking'}), 400
+            
+            if ensure_inventory(cursor, occurrences[0][0], occurrences[-1][0], [court['id']]):
+                conn.commit()
+            
+            with immediate_transaction(conn) as cursor:
+                release_expired_holds(cursor, court['id'], occurrences[0][0], until_date=occurrences[-1][0])
+                checks = check_occurrences(cursor, court['id'], occurrences)
+                bookable = [occurrence for occurrence, (error, _) in zip(occurrences, checks) if error is None]
+                
+                if not bookable or (len(bookable) < len(occurrences) and not skip_conflicts):
+                    results = [
+                        {'booking_date': booking_date, 'start_time': start_time, 'end_time': end_time,
+                         'booked': False, 'error': error}
+                        for (booking_date, start_time, end_time), (error, _) in zip(occurrences, checks)
+                    ]
+                    raise TransactionAborted({
+                        'error': 'Some occurrences are not available' if bookable else 'No occurrences are available',
+                        'booked_count': 0,
+                        'results': results
+                    }, 409)
+                
+                booked, claimed = insert_occurrences(cursor, user_id, court, bookable, amount,
+                                                     data['payment_method'], data['status'])
+                if claimed != sum(slot_count for error, slot_count in checks if error is None):
+                    raise TransactionAborted({'error': 'Selected time slots are no longer available'}, 409)
+            
+            invalidate_availability(court['facility_id'])
+            
+            results = []
+            for (booking_date, start_time, end_time), (error, _) in zip(occurrences, checks):
+                result = {'booking_date': booking_date, 'start_time': start_time, 'end_time': end_time}
+                if error is None:
+                    result.update({'booked': True, 'booking_id': booked[(booking_date, start_time, end_time)]})
+                else:
+                    result.update({'booked': False, 'error': error})
+                results.append(result)
             
             return jsonify({
-                'message': 'Booking created successfully',
-                'booking_id': booking_id
+                'message': f'{len(booked)} bookings created successfully',
+                'booked_count': len(booked),
+                'skipped_count': len(occurrences) - len(booked),
+                'results': results
             }), 201
             
         finally:
             close_db(conn)
             
+    except TransactionAborted as e:
+        return jsonify(e.payload), e.status
+    except sqlite3.IntegrityError as e:
+        return jsonify({'error': 'Selected time slots are no longer available'}), 409
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1782,9 +2189,19 @@ def update_booking(booking_id):
             
             # Check if booking exists
             cursor.execute('SELECT * FROM bookings WHERE id = ?', (booking_id,))
-            if not cursor.fetchone():
+            booking = cursor.fetchone()
+            if not booking:
                 return jsonify({'error': 'Booking not found'}), 404
             
+            new_status = data.get('status', booking['status'])
+            cancelling = new_status == 'cancelled' and booking['status'] != 'cancelled'
+            reactivating = booking['status'] == 'cancelled' and new_status != 'cancelled'
+            
+            # A reactivated booking claims its slots again, so generate the date's inventory up front
+            if reactivating and ensure_inventory(cursor, booking['booking_date'], booking['booking_date'],
+                                                 [booking['court_id']]):
+                conn.commit()
+            
             # Update booking fields
             update_fields = ['status', 'payment_status']
             
@@ -1796,16 +2213,55 @@ def update_booking(booking_id):
                     update_values.append(data[field])
                     update_sql.append(f'{field} = ?')
             
-            if update_sql:
-                update_values.append(booking_id)
+            # Check and write under the write lock so a reactivated booking cannot overlap another
+            with immediate_transaction(conn) as cursor:
+                if reactivating:
+                    release_expired_holds(cursor, booking['court_id'], booking['booking_date'])
+                    if availability_index.find_conflicts(cursor, booking['court_id'], booking['booking_date'],
+                                                         booking['start_time'], booking['end_time']):
+                        raise TransactionAborted({'error': 'This time slot has been booked since the booking was cancelled'}, 409)
+                    
+                    start_minute = time_to_minutes(booking['start_time'])
+                    cursor.execute('''
+                        SELECT start_minute, status, hold_id FROM slot_inventory
+                        WHERE court_id = ? AND slot_date = ? AND start_minute >= ? AND start_minute < ?
+                    ''', (booking['court_id'], booking['booking_date'], start_minute,
+                          time_to_minutes(booking['end_time'])))
+                    slots = cursor.fetchall()
+                    if (not any(slot['start_minute'] == start_minute for slot in slots)
+                            or any(slot['status'] != 'open' or slot['hold_id'] is not None for slot in slots)):
+                        raise TransactionAborted({'error': 'Selected time slot is not available'}, 409)
                 
-                cursor.execute(f'''
-                    UPDATE bookings 
-                    SET {', '.join(update_sql)}
-                    WHERE id = ?
-                ''', update_values)
-            
-            conn.commit()
+                if update_sql:
+                    update_sql.append('updated_at = CURRENT_TIMESTAMP')
+                    update_values.append(booking_id)
+                    
+                    cursor.execute(f'''
+                        UPDATE bookings 
+                        SET {', '.join(update_sql)}
+                        WHERE id = ?
+                    ''', update_values)
+                
+                # Keep the slot inventory in step with status changes; every covered slot must flip back
+                if cancelling:
+                    release_booking_slots(cursor, booking_id)
+                elif reactivating:
+                    if claim_booking_slots(cursor, booking_id, booking['court_id'], booking['booking_date'],
+                                           booking['start_time'], booking['end_time']) != len(slots):
+                        raise TransactionAborted({'error': 'Selected time slot is not available'}, 409)
+                
+                day_version = availability_index.day_version(cursor, booking['court_id'], booking['booking_date'])
+            
+            if cancelling:
+                availability_index.release_booking(booking['court_id'], booking['booking_date'], booking_id, day_version)
+            elif reactivating:
+                availability_index.record_booking(booking['court_id'], booking['booking_date'], {
+                    'id': booking_id,
+                    'user_id': booking['user_id'],
+                    'start_time': booking['start_time'],
+                    'end_time': booking['end_time']
+                }, day_version)
+            invalidate_availability(booking['facility_id'])
             
             return jsonify({
                 'message': 'Booking updated successfully',
@@ -1815,61 +2271,90 @@ def update_booking(booking_id):
         finally:
             close_db(conn)
         
+    except TransactionAborted as e:
+        return jsonify(e.payload), e.status
+    except sqlite3.IntegrityError:
+        return jsonify({'error': 'This time slot is already booked'}), 409
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/bookings/stats', methods=['GET'])
+@conditional('bookings')
 def get_booking_stats():
-    """Get booking statistics for a facility"""
+    """Get booking statistics for a facility from the daily rollup
+    
+    Query parameters: facility_id (required), from and to (booking dates,
+    inclusive; default all time) and series=daily for per-day chart data.
+    """
     try:
         facility_id = request.args.get('facility_id')
         if not facility_id:
             return jsonify({'error': 'Facility ID is required'}), 400
         
+        try:
+            for param in ('from', 'to'):
+                if request.args.get(param):
+                    datetime.strptime(request.args[param], '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+        
+        conditions = ['facility_id = ?']
+        params = [facility_id]
+        if request.args.get('from'):
+            conditions.append('booking_date >= ?')
+            params.append(request.args['from'])
+        if request.args.get('to'):
+            conditions.append('booking_date <= ?')
+            params.append(request.args['to'])
+        
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
             
-            # Get total bookings
-            cursor.execute('SELECT COUNT(*) as total FROM bookings WHERE facility_id = ?', (facility_id,))
-            total = cursor.fetchone()['total']
-            
-            # Get upcoming bookings
-            cursor.execute('''
-                SELECT COUNT(*) as upcoming FROM bookings 
-                WHERE facility_id = ? AND booking_date >= DATE('now') AND status = 'confirmed'
-            ''', (facility_id,))
-            upcoming = cursor.fetchone()['upcoming']
-            
-            # Get completed bookings
-            cursor.execute('''
-                SELECT COUNT(*) as completed FROM bookings 
-                WHERE facility_id = ? AND status = 'completed'
-            ''', (facility_id,))
-            completed = cursor.fetchone()['completed']
-            
-            # Get cancelled bookings
-            cursor.execute('''
-                SELECT COUNT(*) as cancelled FROM bookings 
-                WHERE facility_id = ? AND status = 'cancelled'
-            ''', (facility_id,))
-            cancelled = cursor.fetchone()['cancelled']
-            
-            # Get total revenue
-            cursor.execute('''
-                SELECT COALESCE(SUM(total_amount), 0) as revenue FROM bookings 
-                WHERE facility_id = ? AND payment_status = 'paid'
-            ''', (facility_id,))
-            revenue = cursor.fetchone()['revenue']
+            # One range scan of the rollup answers every counter
+            cursor.execute(f'''
+                SELECT
+                    COALESCE(SUM(booking_count), 0) AS total,
+                    COALESCE(SUM(CASE WHEN booking_date >= DATE('now') AND status = 'confirmed'
+                                      THEN booking_count END), 0) AS upcoming,
+                    COALESCE(SUM(CASE WHEN status = 'completed' THEN booking_count END), 0) AS completed,
+                    COALESCE(SUM(CASE WHEN status = 'cancelled' THEN booking_count END), 0) AS cancelled,
+                    COALESCE(SUM(CASE WHEN payment_status = 'paid' THEN revenue END), 0) AS revenue,
+                    COALESCE(SUM(CASE WHEN status != 'cancelled' THEN booked_minutes END), 0) AS booked_minutes
+                FROM booking_daily_rollup
+                WHERE {' AND '.join(conditions)}
+            ''', params)
+            row = cursor.fetchone()
             
             stats = {
-                'total': total,
-                'upcoming': upcoming,
-                'completed': completed,
-                'cancelled': cancelled,
-                'revenue': float(revenue) if revenue else 0
+                'total': row['total'],
+                'upcoming': row['upcoming'],
+                'completed': row['completed'],
+                'cancelled': row['cancelled'],
+                'revenue': float(row['revenue']) if row['revenue'] else 0,
+                'booked_hours': round(row['booked_minutes'] / 60, 2)
             }
             
+            if request.args.get('series') == 'daily':
+                cursor.execute(f'''
+                    SELECT booking_date,
+                           SUM(booking_count) AS bookings,
+                           SUM(CASE WHEN status = 'cancelled' THEN booking_count ELSE 0 END) AS cancelled,
+                           SUM(CASE WHEN payment_status = 'paid' THEN revenue ELSE 0 END) AS revenue,
+                           SUM(CASE WHEN status != 'cancelled' THEN booked_minutes ELSE 0 END) AS booked_minutes
+                    FROM booking_daily_rollup
+                    WHERE {' AND '.join(conditions)}
+                    GROUP BY booking_date
+                    ORDER BY booking_date
+                ''', params)
+                stats['daily'] = [{
+                    'date': day['booking_date'],
+                    'bookings': day['bookings'],
+                    'cancelled': day['cancelled'],
+                    'revenue': float(day['revenue']),
+                    'booked_hours': round(day['booked_minutes'] / 60, 2)
+                } for day in cursor.fetchall()]
+            
             return jsonify(stats), 200
             
         finally:
@@ -1909,6 +2394,7 @@ def database_health_check():
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
+            'pool': db_pool.get_stats(),
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -1919,37 +2405,56 @@ def database_health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/health/cache', methods=['GET'])
+def cache_health_check():
+    """Response cache hit/miss/eviction counters"""
+    return jsonify({
+        'status': 'healthy',
+        'cache': response_cache.get_stats(),
+        'availability_index': availability_index.get_stats(),
+        'kpi_snapshot': kpi_snapshot.get_stats(),
+        'email_outbox': email_outbox.get_stats(),
+        'password_hashing': password_hasher.get_stats(),
+        'principal_cache': principal_cache.get_stats(),
+        'otp_janitor': get_janitor_report(),
+        'rate_limit': rate_limiter.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    }), 200
+
 @app.route('/change-password', methods=['POST'])
+@login_required
+@rate_limited('change_password', ip='10/minute', account='5/minute')
 def change_password():
     """Change user password"""
     try:
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['user_id', 'current_password', 'new_password']
+        required_fields = ['current_password', 'new_password']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
+        user_id = request_user_id(data.get('user_id'))
         
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
             
             # Get user's current password hash
-            cursor.execute('SELECT password_hash FROM users WHERE id = ?', (data['user_id'],))
+            cursor.execute('SELECT password_hash FROM users WHERE id = ?', (user_id,))
             user = cursor.fetchone()
             
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             
             # Verify current password
-            if not check_password_hash(user['password_hash'], data['current_password']):
+            if not password_hasher.verify(user['password_hash'], data['current_password']):
                 return jsonify({'error': 'Current password is incorrect'}), 400
             
             # Hash new password and update
-            new_password_hash = generate_password_hash(data['new_password'])
+            new_password_hash = password_hasher.hash(data['new_password'])
             cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?', 
-                         (new_password_hash, data['user_id']))
+                         (new_password_hash, user_id))
             
             conn.commit()
             return jsonify({'message': 'Password changed successfully'}), 200
@@ -1957,20 +2462,24 @@ def change_password():
         finally:
             close_db(conn)
             
+    except HashingBusy:
+        return jsonify({'error': 'Server is busy, please try again'}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/reviews', methods=['POST'])
+@login_required
 def create_review():
     """Create a new review for a facility"""
     try:
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['user_id', 'facility_id', 'rating', 'review_text']
+        required_fields = ['facility_id', 'rating', 'review_text']
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
+        user_id = request_user_id(data.get('user_id'))
         
         # Validate rating
         rating = data['rating']
@@ -1987,7 +2496,7 @@ def create_review():
             
             # Check if user already reviewed this facility
             cursor.execute('SELECT id FROM reviews WHERE user_id = ? AND facility_id = ?', 
-                         (data['user_id'], data['facility_id']))
+                         (user_id, data['facility_id']))
             if cursor.fetchone():
                 return jsonify({'error': 'You have already reviewed this facility'}), 400
             
@@ -1995,9 +2504,10 @@ def create_review():
             cursor.execute('''
                 INSERT INTO reviews (user_id, facility_id, rating, review_text)
                 VALUES (?, ?, ?, ?)
-            ''', (data['user_id'], data['facility_id'], rating, data['review_text']))
+            ''', (user_id, data['facility_id'], rating, data['review_text']))
             
             conn.commit()
+            invalidate_facility(data['facility_id'])
             return jsonify({'message': 'Review created successfully'}), 201
             
         finally:
@@ -2007,6 +2517,7 @@ def create_review():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/reviews/facility/<int:facility_id>', methods=['GET'])
+@conditional('reviews', 'users')
 def get_facility_reviews(facility_id):
     """Get all reviews for a specific facility"""
     try:
@@ -2043,6 +2554,8 @@ def get_facility_reviews(facility_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/reviews/facility/<int:facility_id>/stats', methods=['GET'])
+@conditional('reviews')
+@cached(lambda: [f"facility:{request.view_args['facility_id']}"])
 def get_facility_review_stats(facility_id):
     """Get review statistics for a facility"""
     try:
@@ -2050,10 +2563,10 @@ def get_facility_review_stats(facility_id):
         try:
             cursor = conn.cursor()
             
-            # Get average rating and total reviews
+            # Get average rating and total reviews from the summary read model
             cursor.execute('''
-                SELECT AVG(rating) as avg_rating, COUNT(*) as total_reviews
-                FROM reviews
+                SELECT avg_rating, review_count as total_reviews
+                FROM facility_summary
                 WHERE facility_id = ?
             ''', (facility_id,))
             
@@ -2076,10 +2589,11 @@ def get_facility_review_stats(facility_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/reviews/can-review/<int:facility_id>', methods=['GET'])
+@conditional('bookings', 'courts')
 def can_user_review_facility(facility_id):
     """Check if a user can review a facility (must have completed booking)"""
     try:
-        user_id = request.args.get('user_id')
+        user_id = request_user_id(request.args.get('user_id'))
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
         
@@ -2110,6 +2624,8 @@ def can_user_review_facility(facility_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/facility-courts', methods=['GET'])
+@conditional('facility_courts')
+@cached(lambda: [f"facility:{request.args.get('facility_id')}"])
 def get_facility_courts():
     """Get facility courts information"""
     try:
@@ -2158,29 +2674,25 @@ def check_booking_conflict():
             cursor = conn.cursor()
             
             # Check for conflicts with existing bookings
-            cursor.execute('''
-                SELECT id, start_time, end_time, user_id
-                FROM bookings 
-                WHERE court_id = ? 
-                AND booking_date = ? 
-                AND status != 'cancelled'
-                AND (
-                    (start_time <= ? AND end_time > ?) OR
-                    (start_time < ? AND end_time >= ?) OR
-                    (start_time >= ? AND end_time <= ?)
-                )
-            ''', (
-                data['court_id'], 
-                data['booking_date'], 
-                data['start_time'], 
-                data['start_time'],
-                data['end_time'], 
-                data['end_time'],
-                data['start_time'], 
-                data['end_time']
-            ))
+            conflicts = availability_index.find_conflicts(cursor, data['court_id'], data['booking_date'],
+                                                          data['start_time'], data['end_time'])
             
-            conflicts = cursor.fetchall()
+            # Slots held by another player's checkout are taken too
+            if not conflicts:
+                cursor.execute('''
+                    SELECT COUNT(*) AS held FROM slot_inventory si
+                    JOIN slot_holds h ON h.id = si.hold_id
+                    WHERE si.court_id = ? AND si.slot_date = ? AND si.start_minute >= ? AND si.start_minute < ?
+                    AND h.expires_at > ? AND h.user_id IS NOT ?
+                ''', (data['court_id'], data['booking_date'], time_to_minutes(data['start_time']),
+                      time_to_minutes(data['end_time']), time.time(), request_user_id(data.get('user_id'))))
+                if cursor.fetchone()['held']:
+                    return jsonify({
+                        'has_conflict': True,
+                        'held': True,
+                        'conflicts': [],
+                        'message': 'This time slot is being held by another player'
+                    }), 409
             
             if conflicts:
                 return jsonify({
@@ -2207,57 +2719,147 @@ def check_booking_conflict():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/bookings/<int:booking_id>/cancel', methods=['POST'])
-def cancel_booking(booking_id):
-    """Cancel a booking"""
+@app.route('/holds', methods=['POST'])
+@login_required
+def create_hold():
+    """Hold a court's slots for a few minutes while the player checks out"""
     try:
         data = request.get_json()
-        user_id = data.get('user_id')
+        required_fields = ['court_id', 'booking_date', 'start_time', 'end_time']
+        for field in required_fields:
+            if not data.get(field):
+                return jsonify({'error': f'{field} is required'}), 400
+        user_id = request_user_id(data.get('user_id'))
         
-        if not user_id:
-            return jsonify({'error': 'User ID is required'}), 400
+        try:
+            minutes = int(data.get('minutes', HOLD_DEFAULT_MINUTES))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'minutes must be an integer'}), 400
+        if not 1 <= minutes <= HOLD_MAX_MINUTES:
+            return jsonify({'error': f'minutes must be between 1 and {HOLD_MAX_MINUTES}'}), 400
         
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
             
-            # Get booking details
-            cursor.execute('''
-                SELECT b.*, c.id as court_id, c.facility_id
-                FROM bookings b
-                JOIN courts c ON b.court_id = c.id
-                WHERE b.id = ? AND b.user_id = ?
-            ''', (booking_id, user_id))
+            # Check if court exists and is available
+            cursor.execute('SELECT id, status, facility_id FROM courts WHERE id = ?', (data['court_id'],))
+            court = cursor.fetchone()
             
-            booking = cursor.fetchone()
-            if not booking:
-                return jsonify({'error': 'Booking not found or unauthorized'}), 404
+            if not court:
+                return jsonify({'error': 'Court not found'}), 404
             
-            if booking['status'] == 'cancelled':
-                return jsonify({'error': 'Booking is already cancelled'}), 400
+            if court['status'] != 'active':
+                return jsonify({'error': 'Court is not available for booking'}), 400
             
-            # Cancel the booking
-            cursor.execute('''
-                UPDATE bookings 
-                SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (booking_id,))
+            if ensure_inventory(cursor, data['booking_date'], data['booking_date'], [data['court_id']]):
+                conn.commit()
             
-            # Free up the time slot
-            day_of_week = get_day_of_week(booking['booking_date'])
-            cursor.execute('''
-                UPDATE time_slots 
-                SET is_available = TRUE 
-                WHERE court_id = ? AND day_of_week = ? AND start_time = ?
-            ''', (booking['court_id'], day_of_week, booking['start_time']))
+            with immediate_transaction(conn) as cursor:
+                hold_id, expires_at = place_hold(
+                    cursor, user_id, data['court_id'], court['facility_id'], data['booking_date'],
+                    time_to_minutes(data['start_time']), time_to_minutes(data['end_time']), minutes
+                )
+                if hold_id is None:
+                    raise TransactionAborted({'error': 'Selected time slot is not available'}, 409)
             
-            conn.commit()
+            hold_wheel.schedule(hold_id, expires_at - time.time())
+            invalidate_availability(court['facility_id'])
+            
+            return jsonify({
+                'message': 'Time slot held',
+                'hold_id': hold_id,
+                'expires_at': datetime.fromtimestamp(expires_at).isoformat(),
+                'expires_in': minutes * 60
+            }), 201
+            
+        finally:
+            close_db(conn)
+        
+    except TransactionAborted as e:
+        return jsonify(e.payload), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/holds/<int:hold_id>', methods=['DELETE'])
+@login_required
+def release_hold(hold_id):
+    """Release a checkout hold early"""
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = request_user_id(data.get('user_id'))
+        
+        conn = get_db_connection()
+        try:
+            with immediate_transaction(conn) as cursor:
+                cursor.execute('SELECT id FROM slot_holds WHERE id = ? AND user_id = ?', (hold_id, user_id))
+                if not cursor.fetchone():
+                    raise TransactionAborted({'error': 'Hold not found or unauthorized'}, 404)
+                
+                facility_ids = release_holds(cursor, [hold_id])
+            
+            hold_wheel.cancel(hold_id)
+            release_hold_caches(facility_ids)
+            
+            return jsonify({'message': 'Hold released successfully'}), 200
+            
+        finally:
+            close_db(conn)
+        
+    except TransactionAborted as e:
+        return jsonify(e.payload), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/bookings/<int:booking_id>/cancel', methods=['POST'])
+@login_required
+def cancel_booking(booking_id):
+    """Cancel a booking"""
+    try:
+        data = request.get_json(silent=True) or {}
+        user_id = request_user_id(data.get('user_id'))
+        
+        conn = get_db_connection()
+        try:
+            # Check and cancel under the write lock so a concurrent create or reactivation cannot interleave
+            with immediate_transaction(conn) as cursor:
+                # Get booking details
+                cursor.execute('''
+                    SELECT b.*, c.id as court_id, c.facility_id
+                    FROM bookings b
+                    JOIN courts c ON b.court_id = c.id
+                    WHERE b.id = ? AND b.user_id = ?
+                ''', (booking_id, user_id))
+                
+                booking = cursor.fetchone()
+                if not booking:
+                    raise TransactionAborted({'error': 'Booking not found or unauthorized'}, 404)
+                
+                if booking['status'] == 'cancelled':
+                    raise TransactionAborted({'error': 'Booking is already cancelled'}, 400)
+                
+                # Cancel the booking
+                cursor.execute('''
+                    UPDATE bookings 
+                    SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (booking_id,))
+                
+                # Free up the time slot
+                release_booking_slots(cursor, booking_id)
+                
+                day_version = availability_index.day_version(cursor, booking['court_id'], booking['booking_date'])
+            
+            availability_index.release_booking(booking['court_id'], booking['booking_date'], booking_id, day_version)
+            invalidate_availability(booking['facility_id'])
             
             return jsonify({'message': 'Booking cancelled successfully'}), 200
             
         finally:
             close_db(conn)
             
+    except TransactionAborted as e:
+        return jsonify(e.payload), e.status
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2272,8 +2874,10 @@ def clear_time_slots():
             # Delete all existing time slots
             cursor.execute('DELETE FROM time_slots')
             deleted_count = cursor.rowcount
+            resync_court_inventory(cursor)
             
             conn.commit()
+            invalidate_availability()
             
             return jsonify({
                 'message': f'Cleared {deleted_count} time slots',
@@ -2288,45 +2892,53 @@ def clear_time_slots():
 
 @app.route('/time-slots/initialize', methods=['POST'])
 def initialize_time_slots():
-    """Initialize time slots for all courts (for testing)"""
+    """Bulk-generate weekly time slots for courts
+
+    Optional JSON body: court_ids (default all courts), a default schedule
+    (open_time, close_time, slot_minutes, days or day_mask) and per-court
+    overrides under courts, keyed by court id.
+    """
     try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            default_schedule = {key: data[key] for key in ('open_time', 'close_time', 'slot_minutes', 'days', 'day_mask') if key in data}
+            schedule = parse_schedule(default_schedule)
+            overrides = {
+                int(court_id): parse_schedule(spec, dict(DEFAULT_SCHEDULE, **default_schedule))
+                for court_id, spec in (data.get('courts') or {}).items()
+            }
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
             
-            # Get all courts
-            cursor.execute('SELECT id FROM courts')
+            # Get the courts to initialize
+            if data.get('court_ids'):
+                court_ids = [int(court_id) for court_id in data['court_ids']]
+                cursor.execute(f'''
+                    SELECT id FROM courts WHERE id IN ({', '.join('?' for _ in court_ids)})
+                ''', court_ids)
+            else:
+                cursor.execute('SELECT id FROM courts')
             courts = cursor.fetchall()
             
             if not courts:
                 return jsonify({'error': 'No courts found'}), 404
             
-            # Create time slots for each court (7 AM to 11 PM, 1-hour slots)
-            time_slots_created = 0
-            for court in courts:
-                for day in range(7):  # 0 = Sunday, 6 = Saturday
-                    for hour in range(7, 23):  # 7 AM to 11 PM
-                        start_time = f"{hour:02d}:00"
-                        end_time = f"{hour+1:02d}:00"
-                        
-                        # Check if time slot already exists
-                        cursor.execute('''
-                            SELECT id FROM time_slots 
-                            WHERE court_id = ? AND day_of_week = ? AND start_time = ?
-                        ''', (court['id'], day, start_time))
-                        
-                        if not cursor.fetchone():
-                            cursor.execute('''
-                                INSERT INTO time_slots (court_id, day_of_week, start_time, end_time, is_available)
-                                VALUES (?, ?, ?, ?, TRUE)
-                            ''', (court['id'], day, start_time, end_time))
-                            time_slots_created += 1
+            court_schedules = {court['id']: overrides.get(court['id'], schedule) for court in courts}
+            stats = generate_time_slots(conn, court_schedules)
+            invalidate_availability()
             
-            conn.commit()
+            print(f"Initialized {stats['rows_created']} time slots for {stats['courts']} courts "
+                  f"({stats['rows_per_second']} rows/s)")
             
             return jsonify({
-                'message': f'Initialized {time_slots_created} time slots',
-                'courts_count': len(courts)
+                'message': f"Initialized {stats['rows_created']} time slots",
+                'courts_count': len(courts),
+                'stats': stats
             }), 200
             
         finally:
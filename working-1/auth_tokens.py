@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify, g
+
+# Session token lifetime, and the principal cache's size and entry lifetime
+AUTH_TOKEN_TTL = int(os.getenv('AUTH_TOKEN_TTL', str(24 * 60 * 60)))
+PRINCIPAL_CACHE_SIZE = int(os.getenv('PRINCIPAL_CACHE_SIZE', '1024'))
+PRINCIPAL_CACHE_TTL = float(os.getenv('PRINCIPAL_CACHE_TTL', '300'))
+
+# Request fields naming the acting user, which must match a sent token
+IDENTITY_FIELDS = ('user_id', 'owner_id')
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _sign(secret, payload):
+    return _b64encode(hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest())
+
+def issue_token(secret, user_id, role, ttl=AUTH_TOKEN_TTL):
+    """Issue a signed token carrying the user id, role and expiry; returns (token, expires_at)"""
+    expires_at = int(time.time()) + ttl
+    payload = _b64encode(json.dumps({'uid': user_id, 'role': role, 'exp': expires_at},
+                                    separators=(',', ':')).encode('utf-8'))
+    return f'{payload}.{_sign(secret, payload)}', expires_at
+
+def verify_token(secret, token):
+    """Get a token's claims, or None if it is malformed, forged or expired"""
+    payload, _, signature = token.partition('.')
+    # compare_digest only takes ASCII strings, and a real token is always ASCII
+    if not signature or not token.isascii() or not hmac.compare_digest(signature, _sign(secret, payload)):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+class PrincipalCache:
+    """Small LRU cache of {id, role, status, full_name, email} by user id
+
+    Callers invalidate a user after changing their row. A load that overlaps
+    an invalidation is not stored, so a stale row cannot outlive it.
+    """
+
+    def __init__(self, max_size=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (principal, expires_at)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _store(self, user_id, principal):
+        """Insert an entry, evicting the least recently used (caller holds the lock)"""
+        self._entries[user_id] = (principal, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, cursor, user_id):
+        """Get a user's principal, querying users only on a miss; None if there is no such user"""
+        user_id = int(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+            generation = self._generation
+        cursor.execute('SELECT id, role, status, full_name, email FROM users WHERE id = ?', (user_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        principal = dict(row)
+        with self._lock:
+            if generation == self._generation:
+                self._store(user_id, principal)
+        return principal
+
+    def put(self, row):
+        """Prime the cache from a users row already in hand (e.g. at login)"""
+        principal = {key: row[key] for key in ('id', 'role', 'status', 'full_name', 'email')}
+        with self._lock:
+            self._store(principal['id'], principal)
+
+    def invalidate(self, user_id):
+        """Forget a user after their profile or role changed"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(int(user_id), None) is not None:
+                self._stats['invalidations'] += 1
+
+    def get_stats(self):
+        """Get hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), max_size=self.max_size)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        return stats
+
+principal_cache = PrincipalCache()
+
+def request_user_id(claimed=None):
+    """The acting user's id: the token's, the id an admin acts for, or without a token the id passed"""
+    principal = g.get('principal')
+    if principal is None:
+        return claimed
+    if principal['role'] == 'admin' and claimed not in (None, ''):
+        return claimed
+    return principal['user_id']
+
+def login_required(view):
+    """Answer 401 unless the request sent a valid session token, before the view runs"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('principal') is None:
+            return jsonify({'error': 'Authentication required'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def init_app(app):
+    """Verify a bearer token, if any, before each request without touching the database
+
+    A valid token sets g.principal = {'user_id', 'role'}. An invalid or
+    expired token gets 401, and a non-admin's request whose user_id or
+    owner_id (query string, form or JSON body) names someone else gets 403.
+    Views that act as a user are wrapped in login_required; read endpoints
+    without a token keep taking user_id as before.
+    """
+    @app.before_request
+    def load_principal():
+        g.principal = None
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return None
+        claims = verify_token(app.config['SECRET_KEY'], header[len('Bearer '):].strip())
+        if claims is None:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+        g.principal = {'user_id': claims['uid'], 'role': claims['role']}
+
+        # Admins may act on other users' behalf
+        if claims['role'] == 'admin':
+            return None
+        body = request.get_json(silent=True) if request.is_json else None
+        for source in (request.args, request.form, body if isinstance(body, dict) else {}):
+            for field in IDENTITY_FIELDS:
+                value = source.get(field)
+                if value not in (None, '') and str(value) != str(claims['uid']):
+                    return jsonify({'error': f'{field} does not match the session token'}), 403
+        return None
@@ -0,0 +1,340 @@
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from facility_loader import MAX_IN_CLAUSE_SIZE
+
+# Bitmap resolution in minutes (5, 15 or 60; any divisor of 60 works)
+AVAILABILITY_RESOLUTION_MINUTES = int(os.getenv('AVAILABILITY_RESOLUTION_MINUTES', '5'))
+AVAILABILITY_INDEX_MAX_ENTRIES = int(os.getenv('AVAILABILITY_INDEX_MAX_ENTRIES', '50000'))
+
+# Longest date window served by /facilities/<id>/availability
+AVAILABILITY_MAX_DAYS = int(os.getenv('AVAILABILITY_MAX_DAYS', '31'))
+
+def time_to_minutes(value):
+    """Convert an 'HH:MM' string to minutes after midnight"""
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def minutes_to_time(value):
+    """Convert minutes after midnight to an 'HH:MM' string"""
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+class DayBookings:
+    """Booked bitmap plus the active bookings for one (court_id, booking_date)"""
+
+    def __init__(self, version, bookings, mask):
+        self.version = version
+        self.bookings = bookings  # booking id -> {'id', 'user_id', 'start_time', 'end_time'}
+        self.mask = mask
+
+class AvailabilityIndex:
+    """In-process bitset index of booked time per court and date
+
+    Each (court_id, booking_date) keeps an integer bitmap with one bit per
+    resolution-sized block of the day, set where an active booking covers it,
+    so overlap checks for arbitrary ranges are a single AND. Entries are built
+    lazily from bookings and stamped with that day's version from
+    booking_day_versions, so a write from any code path or process makes only
+    the days it touched rebuild on next use. create/cancel apply their change
+    directly when the entry was current just before the write.
+    """
+
+    def __init__(self, resolution=AVAILABILITY_RESOLUTION_MINUTES, max_entries=AVAILABILITY_INDEX_MAX_ENTRIES):
+        self.resolution = resolution
+        self.max_entries = max_entries
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'builds': 0, 'stale_rebuilds': 0, 'incremental_updates': 0}
+
+    def range_mask(self, start_minute, end_minute):
+        """Bitmask covering [start_minute, end_minute), widened to whole blocks"""
+        first = start_minute // self.resolution
+        last = -(-end_minute // self.resolution)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def _booking_mask(self, booking):
+        return self.range_mask(time_to_minutes(booking['start_time']), time_to_minutes(booking['end_time']))
+
+    def _remember(self, entries, key, entry):
+        """Store an entry, evicting the least recently used beyond max_entries (caller holds the lock)"""
+        entries[key] = entry
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def day_versions(self, cursor, court_id, booking_dates):
+        """Get {booking_date: version} for a court's days from booking_day_versions"""
+        cursor.execute(f'''
+            SELECT booking_date, version
+            FROM booking_day_versions
+            WHERE court_id = ? AND booking_date IN ({', '.join('?' for _ in booking_dates)})
+        ''', [court_id] + list(booking_dates))
+        versions = {booking_date: 0 for booking_date in booking_dates}
+        versions.update((row['booking_date'], row['version']) for row in cursor.fetchall())
+        return versions
+
+    def day_version(self, cursor, court_id, booking_date):
+        """Get the bookings version of one court and date"""
+        return self.day_versions(cursor, court_id, [booking_date])[booking_date]
+
+    def get_day(self, cursor, court_id, booking_date):
+        """Get the DayBookings entry for a court and date, building it if missing or stale"""
+        return self.get_days(cursor, court_id, [booking_date])[booking_date]
+
+    def get_days(self, cursor, court_id, booking_dates):
+        """Get {booking_date: DayBookings} for a court, building missing or stale dates in one query"""
+        booking_dates = list(set(booking_dates))
+        versions = self.day_versions(cursor, court_id, booking_dates)
+        days = {}
+        missing = []
+        with self._lock:
+            for booking_date in booking_dates:
+                key = (int(court_id), booking_date)
+                entry = self._days.get(key)
+                if entry is not None and entry.version == versions[booking_date]:
+                    self._days.move_to_end(key)
+                    self._stats['hits'] += 1
+                    days[booking_date] = entry
+                else:
+                    self._stats['stale_rebuilds' if entry is not None else 'builds'] += 1
+                    missing.append(booking_date)
+        if not missing:
+            return days
+
+        for booking_date in missing:
+            days[booking_date] = DayBookings(versions[booking_date], {}, 0)
+        cursor.execute(f'''
+            SELECT id, user_id, booking_date, start_time, end_time
+            FROM bookings
+            WHERE court_id = ? AND booking_date IN ({', '.join('?' for _ in missing)}) AND status != 'cancelled'
+        ''', [court_id] + missing)
+        for row in cursor.fetchall():
+            booking = dict(row)
+            entry = days[booking.pop('booking_date')]
+            entry.bookings[booking['id']] = booking
+            entry.mask |= self._booking_mask(booking)
+
+        with self._lock:
+            for booking_date in missing:
+                self._remember(self._days, (int(court_id), booking_date), days[booking_date])
+        return days
+
+    def find_conflicts(self, cursor, court_id, booking_date, start_time, end_time):
+        """Get active bookings overlapping [start_time, end_time) on a court and date"""
+        day = self.get_day(cursor, court_id, booking_date)
+        requested = self.range_mask(time_to_minutes(start_time), time_to_minutes(end_time))
+        if not day.mask & requested:
+            return []
+        return sorted(
+            (booking for booking in day.bookings.values() if self._booking_mask(booking) & requested),
+            key=lambda booking: booking['start_time']
+        )
+
+    def _apply(self, court_id, booking_date, version_after_write, change):
+        """Apply an in-place change if the entry was current right before our write, else drop it"""
+        key = (int(court_id), booking_date)
+        with self._lock:
+            entry = self._days.get(key)
+            if entry is None:
+                return
+            if entry.version != version_after_write - 1:
+                del self._days[key]
+                return
+            change(entry)
+            entry.version = version_after_write
+            self._stats['incremental_updates'] += 1
+
+    def record_booking(self, court_id, booking_date, booking, version_after_write):
+        """Mark a newly committed booking as taken"""
+        def change(entry):
+            entry.bookings[booking['id']] = booking
+            entry.mask |= self._booking_mask(booking)
+        self._apply(court_id, booking_date, version_after_write, change)
+
+    def release_booking(self, court_id, booking_date, booking_id, version_after_write):
+        """Free the blocks of a cancelled booking"""
+        def change(entry):
+            entry.bookings.pop(booking_id, None)
+            entry.mask = 0
+            for booking in entry.bookings.values():
+                entry.mask |= self._booking_mask(booking)
+        self._apply(court_id, booking_date, version_after_write, change)
+
+    def get_stats(self):
+        """Get hit/build counters and entry counts"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['day_entries'] = len(self._days)
+        stats['resolution_minutes'] = self.resolution
+        return stats
+
+availability_index = AvailabilityIndex()
+
+def _slot_inventory(start_date, end_date, court_ids=None):
+    """Inventory source that reads generated slot_inventory rows only"""
+    return 'slot_inventory', []
+
+def build_availability_grid(cursor, facility_id, dates, sport=None, inventory=_slot_inventory):
+    """Build a court x date x slot availability grid for a facility
+
+    Uses two set-based queries whatever the number of courts and days: the
+    facility's active courts, then one range scan of the inventory for the
+    window. dates is the list of dates in the window; inventory is
+    slot_inventory.inventory_source (or any function with its signature).
+    """
+    court_filter = 'c.facility_id = ? AND c.status = \'active\''
+    court_params = [facility_id]
+    if sport:
+        court_filter += ' AND c.sport_type = ?'
+        court_params.append(sport)
+
+    cursor.execute(f'''
+        SELECT c.id, c.name, c.sport_type, c.hourly_rate
+        FROM courts c
+        WHERE {court_filter}
+        ORDER BY c.sport_type, c.court_number, c.id
+    ''', court_params)
+    courts = [dict(row) for row in cursor.fetchall()]
+    if not courts or not dates:
+        return courts
+
+    days = {(court['id'], date): [] for court in courts for date in dates}
+    source, source_params = inventory(dates[0], dates[-1])
+    cursor.execute(f'''
+        SELECT si.court_id, si.slot_date, si.start_minute, si.end_minute, si.status, si.hold_id
+        FROM {source} si
+        JOIN courts c ON c.id = si.court_id
+        WHERE {court_filter}
+        AND si.slot_date BETWEEN ? AND ?
+        ORDER BY si.court_id, si.slot_date, si.start_minute
+    ''', source_params + court_params + [dates[0], dates[-1]])
+    for row in cursor.fetchall():
+        days[(row['court_id'], row['slot_date'])].append({
+            'start_time': minutes_to_time(row['start_minute']),
+            'end_time': minutes_to_time(row['end_minute']),
+            'is_available': row['status'] == 'open' and row['hold_id'] is None
+        })
+
+    for court in courts:
+        court['days'] = {date: days[(court['id'], date)] for date in dates}
+    return courts
+
+def _court_openings(rows, window_end, duration):
+    """Yield (slot_date, start_minute, end_minute) for each start of a court's open runs that fits duration
+
+    rows are the court's open inventory rows ordered by date and start;
+    back-to-back rows (end == next start) form a run.
+    """
+    run = []
+    for row in rows + [None]:
+        if run and (row is None or row['slot_date'] != run[-1]['slot_date']
+                    or row['start_minute'] != run[-1]['end_minute']):
+            run_end = run[-1]['end_minute']
+            for slot in run:
+                end_minute = slot['start_minute'] + duration
+                if end_minute > run_end or end_minute > window_end:
+                    break
+                yield slot['slot_date'], slot['start_minute'], end_minute
+            run = []
+        if row is not None:
+            run.append(row)
+
+def _court_rows(cursor, inventory, court_ids, start_date, end_date, window_start, window_end):
+    """Yield (court_id, rows): each court's open, unheld rows in the window, ordered by date and start
+
+    Court ids are queried MAX_IN_CLAUSE_SIZE at a time and rows are read
+    from the cursor as they are consumed.
+    """
+    for first in range(0, len(court_ids), MAX_IN_CLAUSE_SIZE):
+        chunk = court_ids[first:first + MAX_IN_CLAUSE_SIZE]
+        source, params = inventory(start_date, end_date, chunk)
+        cursor.execute(f'''
+            SELECT court_id, slot_date, start_minute, end_minute
+            FROM {source} si
+            WHERE court_id IN ({', '.join('?' for _ in chunk)})
+            AND slot_date BETWEEN ? AND ?
+            AND start_minute >= ? AND start_minute < ?
+            AND status = 'open' AND hold_id IS NULL
+            ORDER BY court_id, slot_date, start_minute
+        ''', params + chunk + [start_date, end_date, window_start, window_end])
+        for court_id, rows in groupby(cursor, key=lambda row: row['court_id']):
+            yield court_id, list(rows)
+
+def search_available_slots(cursor, start_date, end_date, window_start, window_end, duration, sport=None, city=None,
+                           sort='start', limit=20, inventory=_slot_inventory):
+    """Find the earliest (or cheapest) open court slots across facilities
+
+    One query picks the matching courts (idx_courts_sport_status, facilities
+    by city). Sorting by start reads the inventory one date at a time and
+    stops at the date that fills the page; sorting by price reads courts in
+    groups of equal price, cheapest first, until the page is full. Within a
+    read, each court's rows become a stream of start-sorted openings that
+    heapq merges. inventory is slot_inventory.inventory_source (or any
+    function with its signature) giving the rows' FROM-clause source.
+    """
+    conditions = ["c.status = 'active'", "f.status = 'active'"]
+    params = []
+    if sport:
+        conditions.append('c.sport_type = ?')
+        params.append(sport)
+    if city:
+        conditions.append('f.city = ?')
+        params.append(city)
+    cursor.execute(f'''
+        SELECT c.id, c.name, c.sport_type, c.hourly_rate, f.id AS facility_id, f.name AS facility_name, f.city
+        FROM courts c
+        JOIN facilities f ON f.id = c.facility_id
+        WHERE {' AND '.join(conditions)}
+    ''', params)
+    courts = {row['id']: dict(row) for row in cursor.fetchall()}
+    if not courts:
+        return []
+
+    def price(court):
+        return round(court['hourly_rate'] * duration / 60, 2) if court['hourly_rate'] is not None else None
+
+    def streams(court_ids, first_date, last_date):
+        """One (slot_date, start_minute, price, court_id, end_minute) stream per court with open rows"""
+        return [
+            [(slot_date, start_minute, price(courts[court_id]) or 0, court_id, end_minute)
+             for slot_date, start_minute, end_minute in _court_openings(rows, window_end, duration)]
+            for court_id, rows in _court_rows(cursor, inventory, court_ids, first_date, last_date,
+                                              window_start, window_end)
+        ]
+
+    matches = []
+    if sort == 'price':
+        by_price = sorted(courts, key=lambda court_id: (price(courts[court_id]) or 0, court_id))
+        for _, group in groupby(by_price, key=lambda court_id: price(courts[court_id]) or 0):
+            matches.extend(islice(heapq.merge(*streams(list(group), start_date, end_date)), limit - len(matches)))
+            if len(matches) == limit:
+                break
+    else:
+        day = datetime.strptime(start_date, '%Y-%m-%d')
+        while day.strftime('%Y-%m-%d') <= end_date and len(matches) < limit:
+            date = day.strftime('%Y-%m-%d')
+            matches.extend(islice(heapq.merge(*streams(list(courts), date, date)), limit - len(matches)))
+            day += timedelta(days=1)
+
+    results = []
+    for slot_date, start_minute, _, court_id, end_minute in matches:
+        court = courts[court_id]
+        results.append({
+            'facility_id': court['facility_id'],
+            'facility_name': court['facility_name'],
+            'city': court['city'],
+            'court_id': court_id,
+            'court_name': court['name'],
+            'sport_type': court['sport_type'],
+            'date': slot_date,
+            'start_time': minutes_to_time(start_minute),
+            'end_time': minutes_to_time(end_minute),
+            'hourly_rate': float(court['hourly_rate']) if court['hourly_rate'] is not None else None,
+            'price': price(court)
+        })
+    return results
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Concurrent booking stress test run against a scratch copy of quickcourt.db
+Usage: python bench_booking.py [attempts] [threads]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ATTEMPTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+COURTS = 4
+DAYS = 30
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def main():
+    source = os.path.abspath('quickcourt.db')
+    workdir = tempfile.mkdtemp(prefix='quickcourt-bench-')
+    shutil.copy(source, os.path.join(workdir, 'quickcourt.db'))
+    os.chdir(workdir)
+    os.environ.setdefault('DB_POOL_SIZE', str(THREADS))
+
+    from app import app
+    from database import get_db_connection, close_db
+    from auth_tokens import issue_token
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, role FROM users ORDER BY id LIMIT 1")
+        user = cursor.fetchone()
+        cursor.execute('''
+            SELECT c.id FROM courts c JOIN facilities f ON f.id = c.facility_id
+            WHERE c.status = 'active' ORDER BY c.id LIMIT ?
+        ''', (COURTS,))
+        court_ids = [row['id'] for row in cursor.fetchall()]
+        cursor.execute('SELECT COALESCE(MAX(id), 0) AS max_id FROM bookings')
+        baseline_id = cursor.fetchone()['max_id']
+    finally:
+        close_db(conn)
+    if not user or not court_ids:
+        print("❌ Need at least one user and one active court in quickcourt.db")
+        sys.exit(2)
+
+    client = app.test_client()
+    client.post('/time-slots/initialize', json={'court_ids': court_ids})
+
+    first_day = datetime.now() + timedelta(days=1)
+    dates = [(first_day + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(DAYS)]
+
+    # Overlapping 1-2 hour requests over a small slot space to force contention
+    requests = []
+    for _ in range(ATTEMPTS):
+        start_hour = random.randint(7, 21)
+        hours = random.choice([1, 1, 2])
+        requests.append({
+            'user_id': user['id'],
+            'court_id': random.choice(court_ids),
+            'booking_date': random.choice(dates),
+            'start_time': f"{start_hour:02d}:00",
+            'end_time': f"{start_hour + hours:02d}:00",
+            'duration': hours,
+            'total_amount': 100 * hours,
+            'payment_method': 'card',
+            'status': 'confirmed'
+        })
+
+    token, _ = issue_token(app.config['SECRET_KEY'], user['id'], user['role'])
+    headers = {'Authorization': f'Bearer {token}'}
+
+    latencies = []
+    outcomes = {'created': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(batch):
+        worker_client = app.test_client()
+        barrier.wait()
+        for payload in batch:
+            started = time.perf_counter()
+            response = worker_client.post('/bookings', json=payload, headers=headers)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            outcome = 'created' if response.status_code == 201 else 'rejected' if response.status_code < 500 else 'errors'
+            with lock:
+                latencies.append(elapsed_ms)
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker, args=(requests[i::THREADS],)) for i in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) AS double_bookings
+            FROM bookings a
+            JOIN bookings b ON b.court_id = a.court_id AND b.booking_date = a.booking_date AND b.id > a.id
+            WHERE a.id > ? AND a.status != 'cancelled' AND b.status != 'cancelled'
+            AND a.start_time < b.end_time AND b.start_time < a.end_time
+        ''', (baseline_id,))
+        double_bookings = cursor.fetchone()['double_bookings']
+    finally:
+        close_db(conn)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies.sort()
+    print(f"Attempts:        {ATTEMPTS} from {THREADS} threads on {len(court_ids)} courts x {DAYS} days")
+    print(f"Created:         {outcomes['created']}")
+    print(f"Rejected:        {outcomes['rejected']}")
+    print(f"Errors:          {outcomes['errors']}")
+    print(f"Throughput:      {ATTEMPTS / elapsed:.1f} attempts/s")
+    print(f"Latency p50/p99: {percentile(latencies, 0.50):.2f} / {percentile(latencies, 0.99):.2f} ms")
+    print(f"Double bookings: {double_bookings}")
+    if double_bookings or outcomes['errors']:
+        print("❌ Booking path is not race-free")
+        sys.exit(1)
+    print("✅ No double bookings")
+
+if __name__ == "__main__":
+    main()
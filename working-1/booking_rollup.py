@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the booking_daily_rollup read model
+Usage: python booking_rollup.py rebuild | check
+"""
+
+import sys
+from database import (get_db_connection, close_db, booking_rollup_select_sql, rebuild_booking_rollup,
+                      ROLLUP_KEY_COLUMNS)
+
+# Measures compared by the consistency checker
+ROLLUP_COLUMNS = ['booking_count', 'revenue', 'booked_minutes']
+
+def _values_equal(stored, expected):
+    """Compare two measures, allowing for float rounding in revenue sums"""
+    if isinstance(stored, float) or isinstance(expected, float):
+        return abs(stored - expected) < 1e-6
+    return stored == expected
+
+def check_booking_rollup(cursor):
+    """Compare stored rollup rows against freshly aggregated bookings
+
+    Returns a list of {'key', 'column', 'stored', 'expected'} mismatches;
+    column is None when the whole row is missing or left over.
+    """
+    cursor.execute('SELECT * FROM booking_daily_rollup')
+    stored_rows = {tuple(row[column] for column in ROLLUP_KEY_COLUMNS): row for row in cursor.fetchall()}
+
+    mismatches = []
+    cursor.execute(booking_rollup_select_sql())
+    for expected in cursor.fetchall():
+        key = tuple(expected[column] for column in ROLLUP_KEY_COLUMNS)
+        stored = stored_rows.pop(key, None)
+        if stored is None:
+            mismatches.append({'key': key, 'column': None, 'stored': None, 'expected': 'row'})
+            continue
+        for column in ROLLUP_COLUMNS:
+            if not _values_equal(stored[column], expected[column]):
+                mismatches.append({'key': key, 'column': column,
+                                   'stored': stored[column], 'expected': expected[column]})
+
+    # Rows left over have no bookings behind them
+    for key in stored_rows:
+        mismatches.append({'key': key, 'column': None, 'stored': 'row', 'expected': None})
+    return mismatches
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if command == 'rebuild':
+            rebuilt = rebuild_booking_rollup(cursor)
+            conn.commit()
+            print(f"✅ Rebuilt {rebuilt} booking rollup rows")
+        elif command == 'check':
+            mismatches = check_booking_rollup(cursor)
+            if mismatches:
+                print(f"❌ {len(mismatches)} booking rollup mismatches:")
+                for mismatch in mismatches:
+                    print(f"   - {mismatch['key']}: {mismatch['column']} "
+                          f"stored={mismatch['stored']!r} expected={mismatch['expected']!r}")
+                sys.exit(1)
+            print("✅ booking_daily_rollup is consistent")
+        else:
+            print(__doc__)
+            sys.exit(2)
+    finally:
+        close_db(conn)
@@ -0,0 +1,156 @@
+import os
+from datetime import datetime, timedelta
+from availability import availability_index, time_to_minutes, minutes_to_time
+from slot_inventory import claim_many_booking_slots
+
+# Most occurrences a single bulk booking may create
+BULK_BOOKING_MAX_OCCURRENCES = int(os.getenv('BULK_BOOKING_MAX_OCCURRENCES', '200'))
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be in YYYY-MM-DD format')
+
+def _parse_times(start_time, end_time):
+    """Normalize a start/end pair to 'HH:MM' strings and minutes"""
+    try:
+        start_minute = time_to_minutes(start_time)
+        end_minute = time_to_minutes(end_time)
+    except (AttributeError, ValueError):
+        raise ValueError('start_time and end_time must be in HH:MM format')
+    if not 0 <= start_minute < end_minute <= 24 * 60:
+        raise ValueError('start_time must be before end_time')
+    return minutes_to_time(start_minute), minutes_to_time(end_minute)
+
+def expand_recurrence(rule):
+    """Expand a weekly recurrence rule into (booking_date, start_time, end_time) occurrences
+
+    rule has start_date, start_time, end_time, optional days (0 = Sunday,
+    defaults to start_date's weekday), optional interval in weeks and either
+    count (occurrences) or until (last date, inclusive).
+    """
+    start_date = _parse_date(rule.get('start_date'), 'start_date')
+    start_time, end_time = _parse_times(rule.get('start_time'), rule.get('end_time'))
+    try:
+        days = {int(day) for day in rule.get('days', [(start_date.weekday() + 1) % 7])}
+        interval = int(rule.get('interval', 1))
+        count = int(rule['count']) if rule.get('count') is not None else None
+    except (TypeError, ValueError):
+        raise ValueError('days, interval and count must be integers')
+    if not days or not days <= set(range(7)):
+        raise ValueError('days must be between 0 (Sunday) and 6 (Saturday)')
+    if interval < 1:
+        raise ValueError('interval must be at least 1')
+    if count is None and not rule.get('until'):
+        raise ValueError('recurrence needs count or until')
+    until = _parse_date(rule['until'], 'until') if rule.get('until') else None
+    if count is not None and not 0 < count <= BULK_BOOKING_MAX_OCCURRENCES:
+        raise ValueError(f'count must be between 1 and {BULK_BOOKING_MAX_OCCURRENCES}')
+
+    # Walk whole weeks from the Sunday on or before start_date
+    week_start = start_date - timedelta(days=(start_date.weekday() + 1) % 7)
+    occurrences = []
+    while True:
+        for day in sorted(days):
+            current = week_start + timedelta(days=day)
+            if current < start_date:
+                continue
+            if (until and current > until) or (count is not None and len(occurrences) >= count):
+                return occurrences
+            occurrences.append((current.strftime('%Y-%m-%d'), start_time, end_time))
+            if len(occurrences) > BULK_BOOKING_MAX_OCCURRENCES:
+                raise ValueError(f'A bulk booking can have at most {BULK_BOOKING_MAX_OCCURRENCES} occurrences')
+        week_start += timedelta(weeks=interval)
+
+def parse_occurrences(data):
+    """Get the sorted, de-duplicated occurrences of a bulk booking request
+
+    Takes either a recurrence rule or a slots list of
+    {booking_date, start_time, end_time}. Raises ValueError with a message
+    suitable for a 400 response.
+    """
+    if data.get('recurrence'):
+        occurrences = expand_recurrence(data['recurrence'])
+    elif data.get('slots'):
+        occurrences = []
+        for slot in data['slots']:
+            booking_date = _parse_date(slot.get('booking_date'), 'booking_date').strftime('%Y-%m-%d')
+            occurrences.append((booking_date,) + _parse_times(slot.get('start_time'), slot.get('end_time')))
+    else:
+        raise ValueError('recurrence or slots is required')
+
+    occurrences = sorted(set(occurrences))
+    if len(occurrences) > BULK_BOOKING_MAX_OCCURRENCES:
+        raise ValueError(f'A bulk booking can have at most {BULK_BOOKING_MAX_OCCURRENCES} occurrences')
+    return occurrences
+
+def check_occurrences(cursor, court_id, occurrences):
+    """Check every occurrence against the availability index and slot inventory in one pass
+
+    One query loads the bitmaps of all dates and one scans their inventory;
+    occurrences are also checked against each other. Returns an
+    (error or None, slot_count) pair per occurrence.
+    """
+    dates = sorted({booking_date for booking_date, _, _ in occurrences})
+    days = availability_index.get_days(cursor, court_id, dates)
+    cursor.execute(f'''
+        SELECT slot_date, start_minute, status, hold_id FROM slot_inventory
+        WHERE court_id = ? AND slot_date IN ({', '.join('?' for _ in dates)})
+    ''', [court_id] + dates)
+    inventory = {}
+    for row in cursor.fetchall():
+        inventory.setdefault(row['slot_date'], []).append(row)
+
+    pending = {}
+    results = []
+    for booking_date, start_time, end_time in occurrences:
+        start_minute = time_to_minutes(start_time)
+        end_minute = time_to_minutes(end_time)
+        requested = availability_index.range_mask(start_minute, end_minute)
+        slots = [slot for slot in inventory.get(booking_date, [])
+                 if start_minute <= slot['start_minute'] < end_minute]
+
+        if days[booking_date].mask & requested:
+            results.append(('This time slot is already booked', 0))
+        elif pending.get(booking_date, 0) & requested:
+            results.append(('Overlaps another occurrence in this request', 0))
+        elif (not any(slot['start_minute'] == start_minute for slot in slots)
+                or any(slot['status'] != 'open' or slot['hold_id'] is not None for slot in slots)):
+            results.append(('Selected time slot is not available', 0))
+        else:
+            pending[booking_date] = pending.get(booking_date, 0) | requested
+            results.append((None, len(slots)))
+    return results
+
+def insert_occurrences(cursor, user_id, court, occurrences, amount, payment_method, status):
+    """Insert bookings for checked occurrences with one executemany and claim their inventory
+
+    amount is per occurrence; when None it is the court's hourly rate times
+    the duration. Returns ({occurrence: booking_id}, inventory rows claimed).
+    """
+    rows = []
+    for booking_date, start_time, end_time in occurrences:
+        hours = (time_to_minutes(end_time) - time_to_minutes(start_time)) / 60
+        total = amount if amount is not None else round((court['hourly_rate'] or 0) * hours, 2)
+        rows.append((user_id, court['id'], court['facility_id'], booking_date, start_time, end_time,
+                     hours, total, payment_method, status))
+    cursor.executemany('''
+        INSERT INTO bookings (user_id, court_id, facility_id, booking_date, start_time, end_time, duration, total_amount, payment_method, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', rows)
+
+    # executemany has no per-row lastrowid; active (court, date, start) is unique
+    dates = sorted({booking_date for booking_date, _, _ in occurrences})
+    cursor.execute(f'''
+        SELECT id, booking_date, start_time FROM bookings
+        WHERE court_id = ? AND booking_date IN ({', '.join('?' for _ in dates)}) AND status != 'cancelled'
+    ''', [court['id']] + dates)
+    booking_ids = {(row['booking_date'], row['start_time']): row['id'] for row in cursor.fetchall()}
+    booked = {occurrence: booking_ids[occurrence[:2]] for occurrence in occurrences}
+
+    claimed = claim_many_booking_slots(cursor, [
+        (booking_id, court['id'], booking_date, time_to_minutes(start_time), time_to_minutes(end_time))
+        for (booking_date, start_time, end_time), booking_id in booked.items()
+    ])
+    return booked, claimed
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app
+
+# Response cache settings
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '60'))
+
+# Rough per-entry bookkeeping cost counted against the byte budget
+ENTRY_OVERHEAD_BYTES = 256
+
+class CacheEntry:
+    def __init__(self, body, status, mimetype, tags, expires_at, size):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.tags = tags
+        self.expires_at = expires_at
+        self.size = size
+
+class ResponseCache:
+    """In-process TTL + LRU cache of serialized responses with tag invalidation
+
+    Entries are evicted least-recently-used first once the byte budget is
+    exceeded. Invalidation is local to this process, so with several workers
+    the TTL bounds how stale another worker's copy can get.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, default_ttl=RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._tag_index = {}  # tag -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def _remove(self, key):
+        """Drop an entry and its tag references (caller holds the lock)"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+        return entry
+
+    def get(self, key):
+        """Get a live entry, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def set(self, key, body, status=200, mimetype='application/json', tags=(), ttl=None):
+        """Store a response body under key, evicting LRU entries to fit the byte budget"""
+        size = len(body) + len(repr(key)) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        entry = CacheEntry(body, status, mimetype, frozenset(tags), expires_at, size)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove(key)
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """Get hit/miss/eviction counters and memory use"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0
+        return stats
+
+response_cache = ResponseCache()
+
+def invalidate(*tags):
+    """Purge cached responses for the given tags (call after committing a write)"""
+    response_cache.invalidate(*tags)
+
+def cached(tags, ttl=None):
+    """Cache a GET view's successful responses, keyed by path and query arguments
+
+    tags is a list of tags, or a callable evaluated in the request context
+    (so it can read request.view_args and request.args) that returns one.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            entry = response_cache.get(key)
+            if entry is not None:
+                response = current_app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                entry_tags = tags() if callable(tags) else tags
+                response_cache.set(key, response.get_data(), response.status_code,
+                                   response.mimetype, entry_tags, ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
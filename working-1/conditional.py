@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, current_app, g
+from database import get_db_connection, close_db
+
+def get_table_versions(table_names):
+    """Get {table_name: (version, updated_at)} for the given tables"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT table_name, version, updated_at
+            FROM table_versions
+            WHERE table_name IN ({', '.join('?' for _ in table_names)})
+        ''', list(table_names))
+        return {row['table_name']: (row['version'], row['updated_at']) for row in cursor.fetchall()}
+    finally:
+        close_db(conn)
+
+def _parse_timestamp(value):
+    """Parse a SQLite CURRENT_TIMESTAMP string as a UTC datetime"""
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+
+def conditional(*table_names):
+    """Answer conditional GETs with 304 before running the view
+
+    The weak ETag hashes the request path, query string, session token's
+    user and the version counters of the tables the response is built from;
+    Last-Modified is the latest write to any of them. A matching
+    If-None-Match (or, without one, an If-Modified-Since later than
+    Last-Modified) returns 304 without querying or serializing anything else.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_table_versions(table_names)
+            
+            # Token-authenticated responses differ per user even at the same URL
+            principal = g.get('principal')
+            fingerprint = hashlib.sha1(repr((
+                request.path,
+                sorted(request.args.items(multi=True)),
+                principal['user_id'] if principal else None,
+                sorted(versions.items())
+            )).encode('utf-8')).hexdigest()
+            
+            timestamps = [updated_at for _, updated_at in versions.values() if updated_at]
+            last_modified = _parse_timestamp(max(timestamps)) if timestamps else None
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(fingerprint)
+            else:
+                # Last-Modified has one-second resolution, so a copy dated the same second as the
+                # latest write may predate a later write in that second; only the ETag can tell
+                not_modified = (last_modified is not None and request.if_modified_since is not None
+                                and last_modified < request.if_modified_since)
+            
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(fingerprint, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -1,15 +1,196 @@
 import sqlite3
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from flask import g, has_app_context
 
 # Database file path
 DB_FILE = "quickcourt.db"
 
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_HEALTH_CHECK_INTERVAL', '30'))
+
+# Retries for BEGIN IMMEDIATE when another writer holds the lock past busy_timeout
+DB_WRITE_RETRIES = int(os.getenv('DB_WRITE_RETRIES', '5'))
+DB_WRITE_RETRY_BACKOFF = float(os.getenv('DB_WRITE_RETRY_BACKOFF', '0.05'))
+
+# PRAGMAs applied once when a pooled connection is opened
+CONNECTION_PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 268435456),  # 256 MB
+    ('cache_size', -16000),  # 16 MB (negative value is in KiB)
+    ('busy_timeout', 5000),
+]
+
+# foreign_keys stays off, as SQLite defaults to: existing databases hold orphaned rows (see
+# report_foreign_key_orphans), and enforcing it would reject writes touching them and make
+# DELETE /courts cascade away booking history
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+class ConnectionPool:
+    """Bounded pool of configured SQLite connections shared by worker threads"""
+
+    def __init__(self, db_file, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 health_check_interval=DB_HEALTH_CHECK_INTERVAL):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'health_checks': 0
+        }
+
+    def _connect(self):
+        """Open a new connection and apply the connection PRAGMAs"""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        with self._cond:
+            self._stats['connections_created'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """Check that an idle connection is still usable"""
+        with self._cond:
+            self._stats['health_checks'] += 1
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection and free its slot in the pool"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['connections_discarded'] += 1
+            self._cond.notify()
+
+    def acquire(self):
+        """Check out a connection, waiting up to the pool timeout for a free one"""
+        wait_started = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                if wait_started is None:
+                    wait_started = time.monotonic()
+                    self._stats['waits'] += 1
+                remaining = self.timeout - (time.monotonic() - wait_started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                self._cond.wait(remaining)
+            
+            self._stats['checkouts'] += 1
+            if wait_started is not None:
+                self._stats['wait_time_ms'] += (time.monotonic() - wait_started) * 1000
+        
+        if conn is None:
+            try:
+                return self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        
+        # Re-validate connections that have been sitting idle for a while
+        if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            with self._cond:
+                self._stats['connections_discarded'] += 1
+            try:
+                return self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections return to the pool on release as usual)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            conn.close()
+
+    def get_stats(self):
+        """Get pool counters and current occupancy"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+        stats['avg_wait_ms'] = round(stats['wait_time_ms'] / stats['waits'], 3) if stats['waits'] else 0
+        return stats
+
+pool = ConnectionPool(DB_FILE)
+
 def get_db_connection():
-    """Get a database connection"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a database connection
+    
+    Inside a Flask app context the connection is checked out once per request
+    and returned to the pool on teardown; elsewhere the caller must pass it to
+    close_db() when done.
+    """
+    if has_app_context():
+        if 'db_conn' not in g:
+            g.db_conn = pool.acquire()
+        return g.db_conn
+    return pool.acquire()
+
+def table_exists(cursor, table_name):
+    """Check whether a table exists (venue tables come from create_venue_tables.py)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    return cursor.fetchone() is not None
 
 def init_db():
     """Initialize the database with required tables"""
@@ -57,11 +238,60 @@ def init_db():
         )
     ''')
     
+    # Account status shown and filtered in admin user management
+    cursor.execute('PRAGMA table_info(users)')
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'status' not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
+    
+    # Email verification flag returned by /login, set when /verify-otp creates the account
+    if 'email_verified' not in columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN email_verified BOOLEAN NOT NULL DEFAULT FALSE')
+        # One-off backfill: /verify-otp has always been the only way to create an account
+        cursor.execute('UPDATE users SET email_verified = TRUE')
+    
+    # Outgoing emails, written in the caller's transaction and sent by email_outbox.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)')
+    
+    # Token buckets for rate_limit.py's shared mode (RATE_LIMIT_SHARED=1)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            bucket_key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            full_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)')
+    
     # Create indexes
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)')
+    
+    # Indexes backing /admin/users keyset pages, filters and case-insensitive prefix search
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role_created ON users (role, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_status_created ON users (status, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_name_nocase ON users (full_name COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_otps_user_id ON otps (user_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_otps_expires_at ON otps (expires_at)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_otps_temp_email ON otps_temp (email)')
+    # Covers /verify-otp's lookup and newest-first order; its email prefix serves the other email lookups
+    cursor.execute('DROP INDEX IF EXISTS idx_otps_temp_email')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_otps_temp_lookup ON otps_temp (email, otp_code, is_used, created_at)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_otps_temp_expires_at ON otps_temp (expires_at)')
     
     # Create reviews table
@@ -146,10 +376,771 @@ def init_db():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_reviews_user_id ON reviews (user_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_facility_courts_facility_id ON facility_courts (facility_id)')
     
+    # Indexes backing the /facilities listing filters and keyset pagination
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_facility_courts_sport_type ON facility_courts (sport_type, facility_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reviews_facility_rating ON reviews (facility_id, rating)')
+    if table_exists(cursor, 'facilities'):
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_facilities_status_created ON facilities (status, created_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_facilities_city_status_created ON facilities (city, status, created_at, id)')
+    if table_exists(cursor, 'facility_amenities'):
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_facility_amenities_name ON facility_amenities (amenity_name, facility_id)')
+    if table_exists(cursor, 'courts'):
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_courts_facility_rate ON courts (facility_id, hourly_rate)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_courts_sport_status ON courts (sport_type, status, facility_id)')
+
+    # Weekly templates are unique per court, day and start time (duplicates are dropped once)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_time_slots_court_day_start'")
+    if cursor.fetchone() is None:
+        cursor.execute('''
+            DELETE FROM time_slots WHERE id NOT IN (
+                SELECT MIN(id) FROM time_slots GROUP BY court_id, day_of_week, start_time
+            )
+        ''')
+        if cursor.rowcount:
+            print(f"Removed {cursor.rowcount} duplicate time slots")
+        cursor.execute('CREATE UNIQUE INDEX idx_time_slots_court_day_start ON time_slots (court_id, day_of_week, start_time)')
+    cursor.execute('DROP INDEX IF EXISTS idx_time_slots_court_day')
+
+    # Index used to build availability bitmaps per court and date
+    if table_exists(cursor, 'bookings'):
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_court_date ON bookings (court_id, booking_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookings_created_at ON bookings (created_at)')
+        
+        # At most one active booking may start at a given court slot
+        cursor.execute('''
+            SELECT COUNT(*) AS duplicates FROM (
+                SELECT 1 FROM bookings WHERE status != 'cancelled'
+                GROUP BY court_id, booking_date, start_time HAVING COUNT(*) > 1
+            )
+        ''')
+        duplicates = cursor.fetchone()['duplicates']
+        if duplicates:
+            print(f"Skipping idx_bookings_active_slot: {duplicates} slots are double-booked")
+        else:
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_active_slot
+                ON bookings (court_id, booking_date, start_time)
+                WHERE status != 'cancelled'
+            ''')
+        
+        # Covering indexes for the GET /bookings history pages, per player and per facility
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bookings_user_history
+            ON bookings (user_id, booking_date DESC, start_time, id, status, facility_id, court_id,
+                         end_time, duration, total_amount, payment_method, created_at)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bookings_facility_history
+            ON bookings (facility_id, booking_date DESC, start_time, id, status, user_id, court_id,
+                         end_time, duration, total_amount, payment_method, created_at)
+        ''')
+
+    if all(table_exists(cursor, name) for name in ('facilities', 'facility_sports', 'facility_amenities')):
+        init_search_index(cursor)
+    
+    if all(table_exists(cursor, name) for name in ('facilities', 'courts', 'facility_photos')):
+        init_facility_summary(cursor)
+    
+    if all(table_exists(cursor, name) for name in ('bookings', 'courts')):
+        init_booking_rollup(cursor)
+    
+    if all(table_exists(cursor, name) for name in ('users', 'bookings', 'facilities')):
+        init_user_stats(cursor)
+    
+    if table_exists(cursor, 'courts'):
+        init_slot_inventory(cursor)
+    
+    init_table_versions(cursor)
+    
+    if table_exists(cursor, 'bookings'):
+        init_booking_day_versions(cursor)
+    
     conn.commit()
-    conn.close()
+    report_foreign_key_orphans(cursor)
+    close_db(conn)
+
+def report_foreign_key_orphans(cursor):
+    """Print rows whose foreign keys point at missing parents; returns {(table, parent): count}"""
+    cursor.execute('PRAGMA foreign_key_check')
+    orphans = {}
+    for row in cursor.fetchall():
+        key = (row[0], row[2])
+        orphans[key] = orphans.get(key, 0) + 1
+    for (table, parent), count in sorted(orphans.items()):
+        print(f"Warning: {count} {table} rows reference missing {parent} rows (foreign keys are not enforced)")
+    return orphans
+
+# Column expressions used to (re)build a facility's full-text search row
+SEARCH_SPORTS_SQL = '''(
+    SELECT group_concat(name, ' ') FROM (
+        SELECT sport_name AS name FROM facility_sports WHERE facility_id = {id}
+        UNION
+        SELECT sport_type FROM facility_courts WHERE facility_id = {id}
+    )
+)'''
+SEARCH_AMENITIES_SQL = "(SELECT group_concat(amenity_name, ' ') FROM facility_amenities WHERE facility_id = {id})"
+
+def init_search_index(cursor):
+    """Create the FTS5 facility search index and the triggers that keep it in sync"""
+    created = not table_exists(cursor, 'facility_search')
+    
+    # rowid is the facility id; columns are weighted by the bm25() rank below
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS facility_search USING fts5(
+            name, description, location, city, sports, amenities,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+    
+    if created:
+        cursor.execute("INSERT INTO facility_search (facility_search, rank) VALUES ('rank', 'bm25(10.0, 1.0, 2.0, 3.0, 5.0, 2.0)')")
+        cursor.execute(f'''
+            INSERT INTO facility_search (rowid, name, description, location, city, sports, amenities)
+            SELECT f.id, f.name, f.description, f.location, f.city,
+                   {SEARCH_SPORTS_SQL.format(id='f.id')}, {SEARCH_AMENITIES_SQL.format(id='f.id')}
+            FROM facilities f
+        ''')
+    
+    # Facilities
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_search_insert AFTER INSERT ON facilities
+        BEGIN
+            INSERT INTO facility_search (rowid, name, description, location, city, sports, amenities)
+            VALUES (NEW.id, NEW.name, NEW.description, NEW.location, NEW.city,
+                    {SEARCH_SPORTS_SQL.format(id='NEW.id')}, {SEARCH_AMENITIES_SQL.format(id='NEW.id')});
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_search_update AFTER UPDATE OF name, description, location, city ON facilities
+        BEGIN
+            UPDATE facility_search
+            SET name = NEW.name, description = NEW.description, location = NEW.location, city = NEW.city
+            WHERE rowid = NEW.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_search_delete AFTER DELETE ON facilities
+        BEGIN
+            DELETE FROM facility_search WHERE rowid = OLD.id;
+        END
+    ''')
+    
+    # Sports come from both facility_sports and the per-sport court counts in facility_courts
+    for table in ('facility_sports', 'facility_courts'):
+        for event, row in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_facility_search_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE facility_search SET sports = {SEARCH_SPORTS_SQL.format(id=row + '.facility_id')}
+                    WHERE rowid = {row}.facility_id;
+                END
+            ''')
+    
+    # Amenities
+    for event, row in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_facility_search_amenities_{event.lower()} AFTER {event} ON facility_amenities
+            BEGIN
+                UPDATE facility_search SET amenities = {SEARCH_AMENITIES_SQL.format(id=row + '.facility_id')}
+                WHERE rowid = {row}.facility_id;
+            END
+        ''')
+
+# Per-facility aggregates recomputed from child tables, keyed by summary column
+SUMMARY_RECOMPUTED_COLUMNS = {
+    'court_count': '(SELECT COUNT(*) FROM courts WHERE facility_id = {id})',
+    'min_hourly_rate': '(SELECT MIN(hourly_rate) FROM courts WHERE facility_id = {id})',
+    'sports': "(SELECT group_concat(sport_type, ',') FROM facility_courts WHERE facility_id = {id})",
+    'primary_photo_url': '''(
+        SELECT photo_url FROM facility_photos WHERE facility_id = {id}
+        ORDER BY is_primary DESC, id ASC LIMIT 1
+    )'''
+}
+
+# Child tables whose writes recompute summary columns: (table, trigger name, watched columns, summary columns)
+SUMMARY_CHILD_TABLES = [
+    ('courts', 'court', 'facility_id, hourly_rate', ['court_count', 'min_hourly_rate']),
+    ('facility_courts', 'sport', 'facility_id, sport_type', ['sports']),
+    ('facility_photos', 'photo', 'facility_id, photo_url, is_primary', ['primary_photo_url'])
+]
+
+def facility_summary_select_sql(where=''):
+    """SELECT computing every facility_summary column from the base tables"""
+    recomputed = ',\n'.join(
+        f'{expression.format(id="f.id")} AS {column}'
+        for column, expression in SUMMARY_RECOMPUTED_COLUMNS.items()
+    )
+    return f'''
+        SELECT f.id AS facility_id,
+               COALESCE(r.review_count, 0) AS review_count,
+               COALESCE(r.rating_sum, 0) AS rating_sum,
+               r.avg_rating AS avg_rating,
+               {recomputed}
+        FROM facilities f
+        LEFT JOIN (
+            SELECT facility_id, COUNT(*) AS review_count, SUM(rating) AS rating_sum,
+                   AVG(rating) AS avg_rating
+            FROM reviews
+            GROUP BY facility_id
+        ) r ON r.facility_id = f.id
+        {where}
+    '''
+
+def rebuild_facility_summary(cursor, facility_ids=None):
+    """Recompute facility_summary rows from the base tables (all facilities by default)"""
+    where = ''
+    params = []
+    if facility_ids is not None:
+        facility_ids = list(facility_ids)
+        if not facility_ids:
+            return 0
+        where = f"WHERE f.id IN ({', '.join('?' for _ in facility_ids)})"
+        params = facility_ids
+    
+    columns = ['review_count', 'rating_sum', 'avg_rating'] + list(SUMMARY_RECOMPUTED_COLUMNS)
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO facility_summary (facility_id, {', '.join(columns)})
+        {facility_summary_select_sql(where)}
+    ''', params)
+    rebuilt = cursor.rowcount
+    
+    # Drop rows for facilities that no longer exist
+    if facility_ids is None:
+        cursor.execute('DELETE FROM facility_summary WHERE facility_id NOT IN (SELECT id FROM facilities)')
+    return rebuilt
+
+def init_facility_summary(cursor):
+    """Create the facility_summary read model and the triggers that maintain it
+    
+    Review aggregates are adjusted arithmetically per row; court, sport and
+    photo columns are recomputed for the one affected facility only.
+    """
+    created = not table_exists(cursor, 'facility_summary')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS facility_summary (
+            facility_id INTEGER PRIMARY KEY,
+            review_count INTEGER NOT NULL DEFAULT 0,
+            rating_sum INTEGER NOT NULL DEFAULT 0,
+            avg_rating REAL,
+            court_count INTEGER NOT NULL DEFAULT 0,
+            min_hourly_rate DECIMAL(10,2),
+            sports TEXT,
+            primary_photo_url TEXT,
+            FOREIGN KEY (facility_id) REFERENCES facilities (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_facility_summary_avg_rating ON facility_summary (avg_rating)')
+    
+    if created:
+        rebuild_facility_summary(cursor)
+    
+    ensure_row = 'INSERT INTO facility_summary (facility_id) VALUES ({id}) ON CONFLICT (facility_id) DO NOTHING;'
+    
+    # Facilities
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_summary_facility_insert AFTER INSERT ON facilities
+        BEGIN
+            {ensure_row.format(id='NEW.id')}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_summary_facility_delete AFTER DELETE ON facilities
+        BEGIN
+            DELETE FROM facility_summary WHERE facility_id = OLD.id;
+        END
+    ''')
+    
+    # Reviews
+    add_review = '''
+        UPDATE facility_summary
+        SET review_count = review_count + 1,
+            rating_sum = rating_sum + {row}.rating,
+            avg_rating = (rating_sum + {row}.rating) * 1.0 / (review_count + 1)
+        WHERE facility_id = {row}.facility_id;
+    '''
+    remove_review = '''
+        UPDATE facility_summary
+        SET review_count = review_count - 1,
+            rating_sum = rating_sum - {row}.rating,
+            avg_rating = CASE WHEN review_count > 1
+                              THEN (rating_sum - {row}.rating) * 1.0 / (review_count - 1)
+                         END
+        WHERE facility_id = {row}.facility_id;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_summary_review_insert AFTER INSERT ON reviews
+        BEGIN
+            {ensure_row.format(id='NEW.facility_id')}
+            {add_review.format(row='NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_summary_review_delete AFTER DELETE ON reviews
+        BEGIN
+            {remove_review.format(row='OLD')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_facility_summary_review_update AFTER UPDATE OF rating, facility_id ON reviews
+        BEGIN
+            {remove_review.format(row='OLD')}
+            {ensure_row.format(id='NEW.facility_id')}
+            {add_review.format(row='NEW')}
+        END
+    ''')
+    
+    # Courts, per-sport court counts and photos
+    for table, name, watched, columns in SUMMARY_CHILD_TABLES:
+        for event, rows in (('INSERT', ['NEW']), ('DELETE', ['OLD']), (f'UPDATE OF {watched}', ['OLD', 'NEW'])):
+            statements = []
+            for row in rows:
+                facility_id = f'{row}.facility_id'
+                assignments = ', '.join(f'{column} = {SUMMARY_RECOMPUTED_COLUMNS[column].format(id=facility_id)}'
+                                        for column in columns)
+                statements.append(ensure_row.format(id=facility_id))
+                statements.append(f'UPDATE facility_summary SET {assignments} WHERE facility_id = {facility_id};')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_facility_summary_{name}_{event.split()[0].lower()} AFTER {event} ON {table}
+                BEGIN
+                    {' '.join(statements)}
+                END
+            ''')
+
+# Rollup key and measures for one booking row ({row} is b, NEW or OLD)
+ROLLUP_KEY_COLUMNS = ['facility_id', 'booking_date', 'court_id', 'sport', 'status', 'payment_status']
+ROLLUP_KEY_SQL = {
+    'facility_id': 'COALESCE({row}.facility_id, (SELECT facility_id FROM courts WHERE id = {row}.court_id), 0)',
+    'booking_date': '{row}.booking_date',
+    'court_id': '{row}.court_id',
+    'sport': "COALESCE((SELECT sport_type FROM courts WHERE id = {row}.court_id), '')",
+    'status': "COALESCE({row}.status, '')",
+    'payment_status': "COALESCE({row}.payment_status, '')"
+}
+ROLLUP_MINUTES_SQL = (
+    "((CAST(substr({row}.end_time, 1, instr({row}.end_time, ':') - 1) AS INTEGER) * 60"
+    " + CAST(substr({row}.end_time, instr({row}.end_time, ':') + 1, 2) AS INTEGER))"
+    " - (CAST(substr({row}.start_time, 1, instr({row}.start_time, ':') - 1) AS INTEGER) * 60"
+    " + CAST(substr({row}.start_time, instr({row}.start_time, ':') + 1, 2) AS INTEGER)))"
+)
+
+def booking_rollup_select_sql(where=''):
+    """SELECT computing every booking_daily_rollup row from the bookings table"""
+    keys = ', '.join(f"{ROLLUP_KEY_SQL[column].format(row='b')} AS {column}" for column in ROLLUP_KEY_COLUMNS)
+    return f'''
+        SELECT {keys},
+               COUNT(*) AS booking_count,
+               COALESCE(SUM(b.total_amount), 0) AS revenue,
+               COALESCE(SUM({ROLLUP_MINUTES_SQL.format(row='b')}), 0) AS booked_minutes
+        FROM bookings b
+        {where}
+        GROUP BY {', '.join(ROLLUP_KEY_COLUMNS)}
+    '''
+
+def rebuild_booking_rollup(cursor):
+    """Recompute booking_daily_rollup from the bookings table"""
+    cursor.execute('DELETE FROM booking_daily_rollup')
+    cursor.execute(f'''
+        INSERT INTO booking_daily_rollup ({', '.join(ROLLUP_KEY_COLUMNS)}, booking_count, revenue, booked_minutes)
+        {booking_rollup_select_sql()}
+    ''')
+    return cursor.rowcount
+
+def init_booking_rollup(cursor):
+    """Create the per-day booking rollup and the triggers that maintain it
+    
+    One row per (facility, date, court, sport, status, payment status) with
+    the booking count, revenue and booked minutes; each booking insert,
+    update or delete adjusts the affected rows arithmetically. The sport and
+    fallback facility come from courts, so changing or deleting a court
+    re-keys that court's rows.
+    """
+    created = not table_exists(cursor, 'booking_daily_rollup')
+    
+    # Rollups made before the courts triggers existed may hold stale keys
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_booking_rollup_court_delete'")
+    rekey = cursor.fetchone() is None
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS booking_daily_rollup (
+            facility_id INTEGER NOT NULL,
+            booking_date DATE NOT NULL,
+            court_id INTEGER NOT NULL,
+            sport TEXT NOT NULL,
+            status TEXT NOT NULL,
+            payment_status TEXT NOT NULL,
+            booking_count INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(10,2) NOT NULL DEFAULT 0,
+            booked_minutes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (facility_id, booking_date, court_id, sport, status, payment_status)
+        ) WITHOUT ROWID
+    ''')
+    
+    if created or rekey:
+        rebuild_booking_rollup(cursor)
+    
+    def key_values(row):
+        return ', '.join(ROLLUP_KEY_SQL[column].format(row=row) for column in ROLLUP_KEY_COLUMNS)
+    
+    def key_match(row):
+        return ' AND '.join(f"{column} = {ROLLUP_KEY_SQL[column].format(row=row)}" for column in ROLLUP_KEY_COLUMNS)
+    
+    add_booking = '''
+        INSERT INTO booking_daily_rollup ({columns}, booking_count, revenue, booked_minutes)
+        VALUES ({values}, 1, COALESCE({row}.total_amount, 0), {minutes})
+        ON CONFLICT ({columns}) DO UPDATE
+        SET booking_count = booking_count + 1,
+            revenue = revenue + excluded.revenue,
+            booked_minutes = booked_minutes + excluded.booked_minutes;
+    '''
+    remove_booking = '''
+        UPDATE booking_daily_rollup
+        SET booking_count = booking_count - 1,
+            revenue = revenue - COALESCE({row}.total_amount, 0),
+            booked_minutes = booked_minutes - {minutes}
+        WHERE {match};
+        DELETE FROM booking_daily_rollup WHERE {match} AND booking_count <= 0;
+    '''
+    
+    def add(row):
+        return add_booking.format(columns=', '.join(ROLLUP_KEY_COLUMNS), values=key_values(row), row=row,
+                                  minutes=ROLLUP_MINUTES_SQL.format(row=row))
+    
+    def remove(row):
+        return remove_booking.format(match=key_match(row), row=row, minutes=ROLLUP_MINUTES_SQL.format(row=row))
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_rollup_insert AFTER INSERT ON bookings
+        BEGIN
+            {add('NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_rollup_delete AFTER DELETE ON bookings
+        BEGIN
+            {remove('OLD')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_rollup_update
+        AFTER UPDATE OF facility_id, court_id, booking_date, start_time, end_time, total_amount, status, payment_status
+        ON bookings
+        BEGIN
+            {remove('OLD')}
+            {add('NEW')}
+        END
+    ''')
+    
+    # Courts: recompute the court's rows when its sport or facility changes or it is deleted
+    rekey_court = f'''
+        DELETE FROM booking_daily_rollup WHERE court_id = {{id}};
+        INSERT INTO booking_daily_rollup ({', '.join(ROLLUP_KEY_COLUMNS)}, booking_count, revenue, booked_minutes)
+        {booking_rollup_select_sql('WHERE b.court_id = {id}')};
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_rollup_court_update AFTER UPDATE OF sport_type, facility_id ON courts
+        WHEN NEW.sport_type IS NOT OLD.sport_type OR NEW.facility_id IS NOT OLD.facility_id
+        BEGIN
+            {rekey_court.format(id='NEW.id')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_rollup_court_delete AFTER DELETE ON courts
+        BEGIN
+            {rekey_court.format(id='OLD.id')}
+        END
+    ''')
+
+def rebuild_user_stats(cursor):
+    """Recompute user_stats from users, bookings and facilities"""
+    cursor.execute('DELETE FROM user_stats')
+    cursor.execute('''
+        INSERT INTO user_stats (user_id, total_bookings, total_spent, facilities_owned)
+        SELECT u.id, COALESCE(b.total_bookings, 0), COALESCE(b.total_spent, 0), COALESCE(f.facilities_owned, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS total_bookings, SUM(total_amount) AS total_spent
+            FROM bookings
+            GROUP BY user_id
+        ) b ON b.user_id = u.id
+        LEFT JOIN (
+            SELECT owner_id, COUNT(*) AS facilities_owned
+            FROM facilities
+            GROUP BY owner_id
+        ) f ON f.owner_id = u.id
+    ''')
+    return cursor.rowcount
+
+def init_user_stats(cursor):
+    """Create the per-user aggregates shown in admin user management and their triggers
+    
+    Booking count, amount spent and facilities owned are adjusted
+    arithmetically per booking or facility row, so listing users never
+    joins bookings or facilities.
+    """
+    created = not table_exists(cursor, 'user_stats')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_bookings INTEGER NOT NULL DEFAULT 0,
+            total_spent DECIMAL(10,2) NOT NULL DEFAULT 0,
+            facilities_owned INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    if created:
+        rebuild_user_stats(cursor)
+    
+    ensure_row = 'INSERT INTO user_stats (user_id) VALUES ({id}) ON CONFLICT (user_id) DO NOTHING;'
+    add_booking = '''
+        UPDATE user_stats
+        SET total_bookings = total_bookings {sign} 1,
+            total_spent = total_spent {sign} COALESCE({row}.total_amount, 0)
+        WHERE user_id = {row}.user_id;
+    '''
+    add_facility = '''
+        UPDATE user_stats SET facilities_owned = facilities_owned {sign} 1 WHERE user_id = {row}.owner_id;
+    '''
+    
+    # Users
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_user_insert AFTER INSERT ON users
+        BEGIN
+            {ensure_row.format(id='NEW.id')}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_user_delete AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_stats WHERE user_id = OLD.id;
+        END
+    ''')
+    
+    # Bookings and facilities
+    for table, owner, statement, watched in (('bookings', 'user_id', add_booking, 'user_id, total_amount'),
+                                             ('facilities', 'owner_id', add_facility, 'owner_id')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_user_stats_{table}_insert AFTER INSERT ON {table}
+            BEGIN
+                {ensure_row.format(id=f'NEW.{owner}')}
+                {statement.format(sign='+', row='NEW')}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_user_stats_{table}_delete AFTER DELETE ON {table}
+            BEGIN
+                {statement.format(sign='-', row='OLD')}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_user_stats_{table}_update AFTER UPDATE OF {watched} ON {table}
+            BEGIN
+                {statement.format(sign='-', row='OLD')}
+                {ensure_row.format(id=f'NEW.{owner}')}
+                {statement.format(sign='+', row='NEW')}
+            END
+        ''')
+
+def init_slot_inventory(cursor):
+    """Create the date-specific slot inventory generated from the weekly time_slots templates
+
+    One row per (court, date, slot start); status is 'open', 'blocked' or
+    'booked', and hold_id marks an open row held during checkout. Rows are
+    rolled forward by slot_inventory.py; holds are managed by holds.py.
+    """
+    created = not table_exists(cursor, 'slot_inventory')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS slot_inventory (
+            court_id INTEGER NOT NULL,
+            slot_date TEXT NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'blocked', 'booked')),
+            time_slot_id INTEGER,
+            booking_id INTEGER,
+            hold_id INTEGER,
+            PRIMARY KEY (court_id, slot_date, start_minute),
+            FOREIGN KEY (court_id) REFERENCES courts (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_slot_inventory_booking_id ON slot_inventory (booking_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_slot_inventory_date ON slot_inventory (slot_date)')
+    
+    # One-off: bookings used to clear is_available on the weekly template, which inventory now
+    # reads as 'blocked' on every week; reopen templates that a booking of that court,
+    # weekday and start cleared (an owner's own block at the same time is reopened too)
+    if created and all(table_exists(cursor, name) for name in ('time_slots', 'bookings')):
+        cursor.execute('''
+            UPDATE time_slots SET is_available = TRUE
+            WHERE NOT is_available AND EXISTS (
+                SELECT 1 FROM bookings b
+                WHERE b.court_id = time_slots.court_id AND b.start_time = time_slots.start_time
+                AND CAST(strftime('%w', b.booking_date) AS INTEGER) = time_slots.day_of_week
+            )
+        ''')
+        if cursor.rowcount:
+            print(f"Reopened {cursor.rowcount} time slot templates closed by past bookings")
+    
+    # Add the hold column to inventory created before holds existed
+    cursor.execute('PRAGMA table_info(slot_inventory)')
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'hold_id' not in columns:
+        cursor.execute('ALTER TABLE slot_inventory ADD COLUMN hold_id INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_slot_inventory_hold_id ON slot_inventory (hold_id)')
+    
+    # Short-lived checkout holds; expires_at is a Unix timestamp
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS slot_holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            court_id INTEGER NOT NULL,
+            facility_id INTEGER,
+            slot_date TEXT NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (court_id) REFERENCES courts (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_slot_holds_court_date ON slot_holds (court_id, slot_date, expires_at)')
+
+# Tables whose writes bump a version counter used for ETag / Last-Modified headers
+VERSIONED_TABLES = ['users', 'facilities', 'facility_courts', 'facility_amenities', 'facility_photos',
+                    'courts', 'time_slots', 'bookings', 'reviews', 'slot_holds']
+
+def init_table_versions(cursor):
+    """Create the per-table version counters and the triggers that bump them"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    for table in VERSIONED_TABLES:
+        if not table_exists(cursor, table):
+            continue
+        cursor.execute('INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_table_version_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions
+                    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE table_name = '{table}';
+                END
+            ''')
+
+def init_booking_day_versions(cursor):
+    """Create the per-(court, date) bookings version counters and the triggers that bump them
+    
+    A missing row is version 0. An update that moves a booking bumps both
+    the old and the new day, and every other write bumps its day once.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS booking_day_versions (
+            court_id INTEGER NOT NULL,
+            booking_date TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (court_id, booking_date)
+        ) WITHOUT ROWID
+    ''')
+    
+    bump = '''
+        INSERT INTO booking_day_versions (court_id, booking_date, version)
+        SELECT {row}.court_id, {row}.booking_date, 1 WHERE {condition}
+        ON CONFLICT (court_id, booking_date) DO UPDATE SET version = version + 1;
+    '''
+    moved = 'NEW.court_id IS NOT OLD.court_id OR NEW.booking_date IS NOT OLD.booking_date'
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_day_version_insert AFTER INSERT ON bookings
+        BEGIN
+            {bump.format(row='NEW', condition='1')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_day_version_delete AFTER DELETE ON bookings
+        BEGIN
+            {bump.format(row='OLD', condition='1')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_booking_day_version_update AFTER UPDATE ON bookings
+        BEGIN
+            {bump.format(row='OLD', condition='1')}
+            {bump.format(row='NEW', condition=moved)}
+        END
+    ''')
+
+# Serializes this process's immediate transactions
+_write_lock = threading.Lock()
+
+def is_busy_error(error):
+    """Check whether an OperationalError is SQLITE_BUSY / SQLITE_LOCKED"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+class TransactionAborted(Exception):
+    """Raised inside immediate_transaction to roll it back and answer with an error
+
+    payload is the JSON body and status the HTTP status the handler returns.
+    """
+
+    def __init__(self, payload, status):
+        super().__init__(payload.get('error'))
+        self.payload = payload
+        self.status = status
+
+@contextmanager
+def immediate_transaction(conn, retries=DB_WRITE_RETRIES, backoff=DB_WRITE_RETRY_BACKOFF):
+    """Run a block in a BEGIN IMMEDIATE transaction, committing on success
+    
+    Taking the write lock up front makes check-then-write sequences atomic
+    across workers. Threads of this process queue on a local lock first, so
+    they hand the database lock over without SQLite's busy-sleep polling;
+    if another process still holds it after busy_timeout, BEGIN is retried
+    with jittered exponential backoff. Any exception rolls back; leaving the
+    block any other way, including return, commits, so error paths raise
+    TransactionAborted instead of returning.
+    """
+    with _write_lock:
+        for attempt in range(retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                break
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == retries:
+                    raise
+                time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+        try:
+            yield conn.cursor()
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
 
 def close_db(conn):
     """Close database connection"""
-    if conn:
-        conn.close()
+    if not conn:
+        return
+    # Request-scoped connections go back to the pool on app context teardown
+    if has_app_context() and g.get('db_conn') is conn:
+        return
+    pool.release(conn)
+
+def teardown_db(exception=None):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        pool.release(conn)
+
+def init_app(app):
+    """Register the pooled connection teardown with the Flask app"""
+    app.teardown_appcontext(teardown_db)
@@ -0,0 +1,224 @@
+import os
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+import requests
+from database import get_db_connection, close_db, immediate_transaction
+
+# Transport: sendgrid (default), smtp (e.g. a local debugging sink) or file (writes .eml files)
+EMAIL_TRANSPORT = os.getenv('EMAIL_TRANSPORT', 'sendgrid')
+EMAIL_FILE_SINK_DIR = os.getenv('EMAIL_FILE_SINK_DIR', 'sent_emails')
+SMTP_HOST = os.getenv('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '1025'))
+SENDER_EMAIL = os.getenv('SENDER_EMAIL', 'noreply@quickcourt.com')
+SENDGRID_SEND_URL = 'https://api.sendgrid.com/v3/mail/send'
+SENDGRID_TIMEOUT = float(os.getenv('SENDGRID_TIMEOUT', '10'))
+
+# Sender pool and retry policy
+EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', '2'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+EMAIL_OUTBOX_BACKOFF = float(os.getenv('EMAIL_OUTBOX_BACKOFF', '2'))
+EMAIL_OUTBOX_MAX_BACKOFF = float(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF', '300'))
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '5'))
+
+# A claimed message is retried by any worker if not finished within the lease
+EMAIL_OUTBOX_LEASE_SECONDS = 60
+
+class SendGridTransport:
+    """SendGrid v3 mail/send over a keep-alive requests session per sender thread"""
+
+    def __init__(self):
+        self.api_key = os.getenv('SENDGRID_API_KEY')
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'Authorization': f'Bearer {self.api_key}'})
+            self._local.session = session
+        return session
+
+    def send(self, recipient, subject, body):
+        if not self.api_key:
+            raise ValueError("SENDGRID_API_KEY not found in environment variables")
+        response = self._session().post(SENDGRID_SEND_URL, timeout=SENDGRID_TIMEOUT, json={
+            'personalizations': [{'to': [{'email': recipient}]}],
+            'from': {'email': SENDER_EMAIL},
+            'subject': subject,
+            'content': [{'type': 'text/plain', 'value': body}]
+        })
+        if response.status_code not in (200, 201, 202):
+            raise RuntimeError(f"SendGrid returned {response.status_code}: {response.text[:200]}")
+
+class SmtpTransport:
+    """Plain SMTP, keeping one connection open per sender thread"""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def send(self, recipient, subject, body):
+        message = EmailMessage()
+        message['From'] = SENDER_EMAIL
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        smtp = getattr(self._local, 'smtp', None)
+        try:
+            if smtp is None:
+                smtp = self._local.smtp = smtplib.SMTP(self.host, self.port, timeout=10)
+            smtp.send_message(message)
+        except Exception:
+            self._local.smtp = None
+            raise
+
+class FileTransport:
+    """Write each message to an .eml file, for local testing"""
+
+    def __init__(self, directory=EMAIL_FILE_SINK_DIR):
+        self.directory = directory
+
+    def send(self, recipient, subject, body):
+        os.makedirs(self.directory, exist_ok=True)
+        message = EmailMessage()
+        message['From'] = SENDER_EMAIL
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        name = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{recipient.replace('@', '_at_')}.eml"
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(bytes(message))
+
+TRANSPORTS = {'sendgrid': SendGridTransport, 'smtp': SmtpTransport, 'file': FileTransport}
+
+def enqueue_email(cursor, recipient, subject, body):
+    """Queue an email in the caller's transaction; call email_outbox.wake() after commit"""
+    cursor.execute('''
+        INSERT INTO email_outbox (recipient, subject, body, next_attempt_at)
+        VALUES (?, ?, ?, ?)
+    ''', (recipient, subject, body, time.time()))
+    return cursor.lastrowid
+
+def retry_delay(attempts, base=EMAIL_OUTBOX_BACKOFF, maximum=EMAIL_OUTBOX_MAX_BACKOFF):
+    """Exponential backoff with full jitter after the given number of failed attempts"""
+    return random.uniform(0, min(maximum, base * 2 ** (attempts - 1)))
+
+class EmailOutbox:
+    """Pool of sender threads draining the email_outbox table
+
+    Workers claim one due message at a time under a lease, so a message
+    claimed by a crashed worker is picked up again once the lease runs out.
+    Failures are retried with exponential backoff until max_attempts.
+    """
+
+    def __init__(self, transport=None, workers=EMAIL_OUTBOX_WORKERS, max_attempts=EMAIL_OUTBOX_MAX_ATTEMPTS):
+        self.transport = transport or TRANSPORTS[EMAIL_TRANSPORT]()
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    def wake(self):
+        """Tell idle workers a message was queued"""
+        self._wakeup.set()
+
+    def _claim(self, conn):
+        now = time.time()
+        with immediate_transaction(conn) as cursor:
+            cursor.execute('''
+                UPDATE email_outbox
+                SET status = 'sending', attempts = attempts + 1, next_attempt_at = ?
+                WHERE id = (
+                    SELECT id FROM email_outbox
+                    WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at
+                    LIMIT 1
+                )
+                RETURNING id, recipient, subject, body, attempts
+            ''', (now + EMAIL_OUTBOX_LEASE_SECONDS, now))
+            row = cursor.fetchone()
+        return row
+
+    def _finish(self, conn, message, error):
+        with immediate_transaction(conn) as cursor:
+            if error is None:
+                cursor.execute('''
+                    UPDATE email_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                    WHERE id = ?
+                ''', (message['id'],))
+                outcome = 'sent'
+            elif message['attempts'] >= self.max_attempts:
+                cursor.execute("UPDATE email_outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                               (error, message['id']))
+                outcome = 'failed'
+            else:
+                cursor.execute('''
+                    UPDATE email_outbox SET status = 'pending', next_attempt_at = ?, last_error = ?
+                    WHERE id = ?
+                ''', (time.time() + retry_delay(message['attempts']), error, message['id']))
+                outcome = 'retried'
+        with self._lock:
+            self._stats[outcome] += 1
+        if outcome != 'sent':
+            print(f"Email {message['id']} to {message['recipient']} {outcome}: {error}")
+
+    def drain_once(self):
+        """Send one due message; returns False when nothing was due"""
+        conn = get_db_connection()
+        try:
+            message = self._claim(conn)
+            if message is None:
+                return False
+            try:
+                self.transport.send(message['recipient'], message['subject'], message['body'])
+                error = None
+            except Exception as e:
+                error = str(e)
+            self._finish(conn, message, error)
+            return True
+        finally:
+            close_db(conn)
+
+    def _worker(self):
+        while True:
+            # Clear before looking, so a wake() during the claim is not lost
+            self._wakeup.clear()
+            try:
+                if self.drain_once():
+                    continue
+            except Exception as e:
+                print(f"Email outbox worker error: {e}")
+            self._wakeup.wait(EMAIL_OUTBOX_POLL_INTERVAL)
+
+    def start(self):
+        """Start the sender threads"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'email-outbox-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def get_stats(self):
+        """Get send counters and queued message counts by status"""
+        with self._lock:
+            stats = dict(self._stats)
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, COUNT(*) AS count FROM email_outbox GROUP BY status')
+            stats['queue'] = {row['status']: row['count'] for row in cursor.fetchall()}
+        finally:
+            close_db(conn)
+        stats['transport'] = type(self.transport).__name__
+        return stats
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,72 @@
+# Keep IN (...) lists well below SQLite's bound-parameter limit
+MAX_IN_CLAUSE_SIZE = 500
+
+def _chunks(ids, size=MAX_IN_CLAUSE_SIZE):
+    """Split a list of ids into IN-clause sized chunks"""
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def _placeholders(ids):
+    """Build the ?, ?, ... placeholder list for an IN clause"""
+    return ', '.join('?' for _ in ids)
+
+def load_facility_relations(cursor, facility_ids):
+    """Load child relations for a page of facilities in a fixed number of queries
+
+    Each relation (facility courts, amenities and photos) is fetched once with
+    WHERE facility_id IN (...) and grouped in Python, so the query count does
+    not grow with the number of facilities. Aggregates such as ratings and
+    court counts come from facility_summary instead. Returns a dict keyed by
+    facility id.
+    """
+    facility_ids = list(dict.fromkeys(facility_ids))
+    relations = {
+        facility_id: {
+            'facility_courts': [],
+            'amenities': [],
+            'photos': []
+        }
+        for facility_id in facility_ids
+    }
+
+    for chunk in _chunks(facility_ids):
+        in_clause = _placeholders(chunk)
+
+        # Get sports and court counts per sport
+        cursor.execute(f'''
+            SELECT facility_id, sport_type, court_count
+            FROM facility_courts
+            WHERE facility_id IN ({in_clause})
+            ORDER BY facility_id, id
+        ''', chunk)
+        for row in cursor.fetchall():
+            relations[row['facility_id']]['facility_courts'].append({
+                'sport_type': row['sport_type'],
+                'court_count': row['court_count']
+            })
+
+        # Get amenities
+        cursor.execute(f'''
+            SELECT facility_id, amenity_name
+            FROM facility_amenities
+            WHERE facility_id IN ({in_clause})
+            ORDER BY facility_id, amenity_name
+        ''', chunk)
+        for row in cursor.fetchall():
+            relations[row['facility_id']]['amenities'].append(row['amenity_name'])
+
+        # Get photos, primary photo first
+        cursor.execute(f'''
+            SELECT facility_id, photo_url, caption, is_primary
+            FROM facility_photos
+            WHERE facility_id IN ({in_clause})
+            ORDER BY facility_id, is_primary DESC, id ASC
+        ''', chunk)
+        for row in cursor.fetchall():
+            relations[row['facility_id']]['photos'].append({
+                'url': row['photo_url'],
+                'caption': row['caption'],
+                'is_primary': row['is_primary']
+            })
+
+    return relations
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the facility_summary read model
+Usage: python facility_summary.py rebuild | check
+"""
+
+import sys
+from database import get_db_connection, close_db, facility_summary_select_sql, rebuild_facility_summary
+
+# Columns compared by the consistency checker
+SUMMARY_COLUMNS = ['review_count', 'rating_sum', 'avg_rating', 'court_count',
+                   'min_hourly_rate', 'sports', 'primary_photo_url']
+
+def _values_equal(stored, expected):
+    """Compare two column values, allowing for float rounding in averages"""
+    if isinstance(stored, float) and isinstance(expected, (int, float)):
+        return abs(stored - expected) < 1e-9
+    return stored == expected
+
+def check_facility_summary(cursor):
+    """Compare stored summary rows against freshly computed aggregates
+    
+    Returns a list of {'facility_id', 'column', 'stored', 'expected'} mismatches;
+    column is None when the whole row is missing or orphaned.
+    """
+    cursor.execute('SELECT * FROM facility_summary')
+    stored_rows = {row['facility_id']: row for row in cursor.fetchall()}
+    
+    mismatches = []
+    cursor.execute(facility_summary_select_sql())
+    for expected in cursor.fetchall():
+        stored = stored_rows.pop(expected['facility_id'], None)
+        if stored is None:
+            mismatches.append({'facility_id': expected['facility_id'], 'column': None,
+                               'stored': None, 'expected': 'row'})
+            continue
+        for column in SUMMARY_COLUMNS:
+            if not _values_equal(stored[column], expected[column]):
+                mismatches.append({'facility_id': expected['facility_id'], 'column': column,
+                                   'stored': stored[column], 'expected': expected[column]})
+    
+    # Summary rows left over belong to deleted facilities
+    for facility_id in stored_rows:
+        mismatches.append({'facility_id': facility_id, 'column': None,
+                           'stored': 'row', 'expected': None})
+    return mismatches
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if command == 'rebuild':
+            rebuilt = rebuild_facility_summary(cursor)
+            conn.commit()
+            print(f"✅ Rebuilt {rebuilt} facility summary rows")
+        elif command == 'check':
+            mismatches = check_facility_summary(cursor)
+            if mismatches:
+                print(f"❌ {len(mismatches)} facility summary mismatches:")
+                for mismatch in mismatches:
+                    print(f"   - facility {mismatch['facility_id']}: {mismatch['column']} "
+                          f"stored={mismatch['stored']!r} expected={mismatch['expected']!r}")
+                sys.exit(1)
+            print("✅ facility_summary is consistent")
+        else:
+            print(__doc__)
+            sys.exit(2)
+    finally:
+        close_db(conn)
@@ -0,0 +1,185 @@
+import math
+import os
+import threading
+import time
+from database import get_db_connection, close_db, immediate_transaction
+
+# Checkout hold settings
+HOLD_DEFAULT_MINUTES = int(os.getenv('HOLD_DEFAULT_MINUTES', '10'))
+HOLD_MAX_MINUTES = int(os.getenv('HOLD_MAX_MINUTES', '30'))
+HOLD_WHEEL_TICK_SECONDS = float(os.getenv('HOLD_WHEEL_TICK_SECONDS', '1'))
+HOLD_WHEEL_SIZE = int(os.getenv('HOLD_WHEEL_SIZE', '512'))
+
+class TimingWheel:
+    """Hashed timing wheel: O(1) schedule/cancel, expiry work proportional to one bucket per tick
+
+    Keys due further out than one revolution carry a rounds counter that is
+    decremented each time their bucket comes around.
+    """
+
+    def __init__(self, tick_seconds=HOLD_WHEEL_TICK_SECONDS, size=HOLD_WHEEL_SIZE):
+        self.tick_seconds = tick_seconds
+        self.size = size
+        self._buckets = [{} for _ in range(size)]  # key -> remaining rounds
+        self._where = {}  # key -> bucket index
+        self._current = 0
+        self._lock = threading.Lock()
+
+    def schedule(self, key, delay_seconds):
+        """Schedule key to expire after delay_seconds, replacing any earlier schedule"""
+        ticks = max(1, math.ceil(delay_seconds / self.tick_seconds))
+        with self._lock:
+            self._cancel(key)
+            index = (self._current + ticks) % self.size
+            self._buckets[index][key] = (ticks - 1) // self.size
+            self._where[key] = index
+
+    def _cancel(self, key):
+        index = self._where.pop(key, None)
+        if index is not None:
+            self._buckets[index].pop(key, None)
+
+    def cancel(self, key):
+        """Forget a scheduled key"""
+        with self._lock:
+            self._cancel(key)
+
+    def advance(self):
+        """Move one tick forward and return the keys that expired"""
+        with self._lock:
+            self._current = (self._current + 1) % self.size
+            bucket = self._buckets[self._current]
+            expired = []
+            for key, rounds in list(bucket.items()):
+                if rounds == 0:
+                    expired.append(key)
+                    del bucket[key]
+                    del self._where[key]
+                else:
+                    bucket[key] = rounds - 1
+            return expired
+
+    def __len__(self):
+        with self._lock:
+            return len(self._where)
+
+hold_wheel = TimingWheel()
+_expiry = {'thread': None, 'on_expired': None}
+_expiry_lock = threading.Lock()
+
+def release_expired_holds(cursor, court_id, slot_date, now=None, until_date=None):
+    """Release holds on one court and date (through until_date if given) that have passed expires_at
+
+    A safety net for holds whose wheel was lost with a crashed worker.
+    Returns the released hold ids.
+    """
+    cursor.execute('''
+        SELECT id FROM slot_holds
+        WHERE court_id = ? AND slot_date BETWEEN ? AND ? AND expires_at <= ?
+    ''', (court_id, slot_date, until_date or slot_date, now or time.time()))
+    hold_ids = [row['id'] for row in cursor.fetchall()]
+    release_holds(cursor, hold_ids)
+    return hold_ids
+
+def place_hold(cursor, user_id, court_id, facility_id, slot_date, start_minute, end_minute, minutes):
+    """Hold the open slots of [start_minute, end_minute) on a court and date
+
+    Must run inside an immediate transaction. Returns (hold_id, expires_at),
+    or (None, None) if any covered slot is missing, booked, blocked or held.
+    """
+    release_expired_holds(cursor, court_id, slot_date)
+    cursor.execute('''
+        SELECT start_minute, status, hold_id FROM slot_inventory
+        WHERE court_id = ? AND slot_date = ? AND start_minute >= ? AND start_minute < ?
+    ''', (court_id, slot_date, start_minute, end_minute))
+    slots = cursor.fetchall()
+    if (not any(slot['start_minute'] == start_minute for slot in slots)
+            or any(slot['status'] != 'open' or slot['hold_id'] is not None for slot in slots)):
+        return None, None
+
+    expires_at = time.time() + minutes * 60
+    cursor.execute('''
+        INSERT INTO slot_holds (user_id, court_id, facility_id, slot_date, start_minute, end_minute, expires_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, court_id, facility_id, slot_date, start_minute, end_minute, expires_at))
+    hold_id = cursor.lastrowid
+    cursor.execute('''
+        UPDATE slot_inventory SET hold_id = ?
+        WHERE court_id = ? AND slot_date = ? AND start_minute >= ? AND start_minute < ?
+        AND status = 'open' AND hold_id IS NULL
+    ''', (hold_id, court_id, slot_date, start_minute, end_minute))
+    return hold_id, expires_at
+
+def release_holds(cursor, hold_ids):
+    """Free the inventory rows of the given holds and delete them; returns affected facility ids"""
+    if not hold_ids:
+        return set()
+    placeholders = ', '.join('?' for _ in hold_ids)
+    cursor.execute(f'SELECT DISTINCT facility_id FROM slot_holds WHERE id IN ({placeholders})', hold_ids)
+    facility_ids = {row['facility_id'] for row in cursor.fetchall()}
+    cursor.execute(f'UPDATE slot_inventory SET hold_id = NULL WHERE hold_id IN ({placeholders})', hold_ids)
+    cursor.execute(f'DELETE FROM slot_holds WHERE id IN ({placeholders})', hold_ids)
+    return facility_ids
+
+def load_holds():
+    """Put live holds from slot_holds back on the wheel and release the ones that expired while down"""
+    now = time.time()
+    conn = get_db_connection()
+    try:
+        with immediate_transaction(conn) as cursor:
+            cursor.execute('SELECT id, expires_at FROM slot_holds')
+            expired = []
+            for row in cursor.fetchall():
+                if row['expires_at'] <= now:
+                    expired.append(row['id'])
+                else:
+                    hold_wheel.schedule(row['id'], row['expires_at'] - now)
+            release_holds(cursor, expired)
+        return len(hold_wheel), len(expired)
+    finally:
+        close_db(conn)
+
+def _expire(hold_ids):
+    conn = get_db_connection()
+    try:
+        with immediate_transaction(conn) as cursor:
+            facility_ids = release_holds(cursor, hold_ids)
+    finally:
+        close_db(conn)
+    if _expiry['on_expired']:
+        _expiry['on_expired'](facility_ids)
+
+def _expiry_loop():
+    started = time.monotonic()
+    ticks_done = 0
+    while True:
+        time.sleep(HOLD_WHEEL_TICK_SECONDS)
+        due = int((time.monotonic() - started) / HOLD_WHEEL_TICK_SECONDS)
+        expired = []
+        while ticks_done < due:
+            expired.extend(hold_wheel.advance())
+            ticks_done += 1
+        if expired:
+            try:
+                _expire(expired)
+            except Exception as e:
+                print(f"Releasing expired holds failed: {e}")
+                for hold_id in expired:
+                    hold_wheel.schedule(hold_id, HOLD_WHEEL_TICK_SECONDS)
+
+def start_hold_expiry(on_expired=None):
+    """Reload holds and start the thread that ticks the wheel
+
+    on_expired is called with the facility ids whose holds were released.
+    """
+    with _expiry_lock:
+        if _expiry['thread'] is not None:
+            return
+        _expiry['on_expired'] = on_expired
+        try:
+            live, expired = load_holds()
+            print(f"Loaded {live} slot holds ({expired} expired while down)")
+        except Exception as e:
+            print(f"Loading slot holds failed: {e}")
+        _expiry['thread'] = threading.Thread(target=_expiry_loop, name='slot-hold-expiry', daemon=True)
+        _expiry['thread'].start()
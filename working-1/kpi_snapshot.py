@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from datetime import datetime
+from database import get_db_connection, close_db
+
+# Longest a served snapshot may lag behind writes, and how often the refresher polls for them
+KPI_SNAPSHOT_MAX_AGE = float(os.getenv('KPI_SNAPSHOT_MAX_AGE', '60'))
+KPI_SNAPSHOT_REFRESH_INTERVAL = float(os.getenv('KPI_SNAPSHOT_REFRESH_INTERVAL', '15'))
+
+# Tables whose table_versions stamp a snapshot
+KPI_SOURCE_TABLES = ['users', 'facilities', 'courts', 'bookings']
+
+def _source_versions(cursor):
+    cursor.execute(f'''
+        SELECT table_name, version FROM table_versions
+        WHERE table_name IN ({', '.join('?' for _ in KPI_SOURCE_TABLES)})
+    ''', KPI_SOURCE_TABLES)
+    return tuple(sorted((row['table_name'], row['version']) for row in cursor.fetchall()))
+
+def compute_kpis(cursor):
+    """Compute the admin dashboard KPIs with four statements
+
+    Users are counted per role and per month in one scan; facility, court
+    and booking totals come from one statement of scalar subqueries (bookings
+    via booking_daily_rollup); sports are ranked from the rollup, whose sport
+    is the booked court's, and monthly bookings use idx_bookings_created_at.
+    """
+    cursor.execute('''
+        SELECT strftime('%Y-%m', created_at) AS month,
+               SUM(role = 'user') AS users,
+               SUM(role = 'facility_owner') AS owners,
+               SUM(created_at >= date('now', '-6 months')) AS recent
+        FROM users
+        GROUP BY month
+        ORDER BY month DESC
+    ''')
+    user_months = cursor.fetchall()
+
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM facilities) AS total_facilities,
+               (SELECT COUNT(*) FROM facilities WHERE status IN ('pending', 'pending_approval')) AS pending_approvals,
+               (SELECT COUNT(*) FROM courts) AS total_courts,
+               (SELECT COALESCE(SUM(booking_count), 0) FROM booking_daily_rollup) AS total_bookings
+    ''')
+    totals = cursor.fetchone()
+
+    cursor.execute('''
+        SELECT sport, SUM(booking_count) AS booking_count
+        FROM booking_daily_rollup
+        WHERE sport != ''
+        GROUP BY sport
+        ORDER BY booking_count DESC
+        LIMIT 5
+    ''')
+    most_active_sports = cursor.fetchall()
+
+    cursor.execute('''
+        SELECT strftime('%Y-%m', created_at) as month, COUNT(*) as count
+        FROM bookings
+        WHERE created_at >= date('now', '-6 months')
+        GROUP BY strftime('%Y-%m', created_at)
+        ORDER BY month DESC
+    ''')
+    monthly_bookings = cursor.fetchall()
+
+    return {
+        'kpi_data': {
+            'total_users': sum(row['users'] for row in user_months),
+            'total_facility_owners': sum(row['owners'] for row in user_months),
+            'total_facilities': totals['total_facilities'],
+            'total_bookings': totals['total_bookings'],
+            'total_courts': totals['total_courts'],
+            'pending_approvals': totals['pending_approvals']
+        },
+        'monthly_registrations': [{'month': row['month'], 'count': row['recent']}
+                                  for row in user_months if row['recent']],
+        'monthly_bookings': [{'month': row['month'], 'count': row['count']} for row in monthly_bookings],
+        'most_active_sports': [{'sport': row['sport'], 'bookings': row['booking_count']}
+                               for row in most_active_sports]
+    }
+
+class KpiSnapshot:
+    """In-memory admin KPI snapshot stamped with the source tables' versions
+
+    A background thread recomputes it when the versions move. A request
+    finding it unverified for longer than max_age checks the versions inline
+    (recomputing only if they moved), so served data never lags writes by
+    more than max_age.
+    """
+
+    def __init__(self, max_age=KPI_SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self._snapshot = None  # {'data', 'versions', 'computed_at', 'verified_at', 'compute_ms'}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'refreshes': 0, 'inline_refreshes': 0}
+        self._thread = None
+
+    def _refresh(self, cursor, versions):
+        started = time.perf_counter()
+        data = compute_kpis(cursor)
+        now = time.time()
+        snapshot = {
+            'data': data,
+            'versions': versions,
+            'computed_at': now,
+            'verified_at': now,
+            'compute_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        with self._lock:
+            self._snapshot = snapshot
+            self._stats['refreshes'] += 1
+        return snapshot
+
+    def refresh_if_changed(self, cursor):
+        """Recompute when the source tables changed since the snapshot; returns the current snapshot"""
+        versions = _source_versions(cursor)
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot['versions'] == versions:
+                # Unchanged data is as fresh as a recompute
+                snapshot = dict(snapshot, verified_at=time.time())
+                self._snapshot = snapshot
+                return snapshot
+        return self._refresh(cursor, versions)
+
+    def get(self, cursor):
+        """Get the snapshot, checking versions inline only once it is missing or unverified for max_age"""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.time() - snapshot['verified_at'] <= self.max_age:
+                self._stats['hits'] += 1
+                return snapshot
+            self._stats['inline_refreshes'] += 1
+        return self.refresh_if_changed(cursor)
+
+    def _refresh_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            conn = get_db_connection()
+            try:
+                self.refresh_if_changed(conn.cursor())
+            except Exception as e:
+                print(f"KPI snapshot refresh failed: {e}")
+            finally:
+                close_db(conn)
+
+    def start(self, interval=KPI_SNAPSHOT_REFRESH_INTERVAL):
+        """Start the background refresher"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, args=(interval,),
+                                            name='kpi-snapshot-refresher', daemon=True)
+            self._thread.start()
+
+    def get_stats(self):
+        """Get hit/refresh counters and the current snapshot's age"""
+        with self._lock:
+            stats = dict(self._stats)
+            snapshot = self._snapshot
+        stats['snapshot_age_seconds'] = round(time.time() - snapshot['verified_at'], 3) if snapshot else None
+        return stats
+
+kpi_snapshot = KpiSnapshot()
+
+def snapshot_response(snapshot):
+    """Build the /admin/stats body from a snapshot"""
+    body = dict(snapshot['data'])
+    body['snapshot_age'] = round(time.time() - snapshot['verified_at'], 3)
+    body['compute_ms'] = snapshot['compute_ms']
+    body['computed_at'] = datetime.fromtimestamp(snapshot['computed_at']).isoformat()
+    return body
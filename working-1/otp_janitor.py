@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Purge used and expired OTP rows from otps_temp and otps, and old sent or failed emails
+Usage: python otp_janitor.py   # one run, then print the report
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from database import get_db_connection, close_db
+
+# How often the janitor runs, and how long expired OTPs are kept (e.g. for /check-email-status)
+OTP_JANITOR_INTERVAL = float(os.getenv('OTP_JANITOR_INTERVAL', '300'))
+OTP_RETENTION_MINUTES = int(os.getenv('OTP_RETENTION_MINUTES', '60'))
+
+# How long sent and failed email_outbox messages (whose bodies carry OTPs) are kept
+EMAIL_OUTBOX_RETENTION_HOURS = float(os.getenv('EMAIL_OUTBOX_RETENTION_HOURS', '24'))
+
+# Rows deleted per transaction, and the pause between chunks that lets other writers in
+OTP_JANITOR_CHUNK_ROWS = int(os.getenv('OTP_JANITOR_CHUNK_ROWS', '500'))
+OTP_JANITOR_CHUNK_PAUSE = 0.01
+
+# Tables the janitor compacts
+OTP_TABLES = ['otps_temp', 'otps']
+
+_janitor = {'thread': None, 'last_report': None}
+_janitor_lock = threading.Lock()
+
+def _delete_in_chunks(conn, table, where, params):
+    """Delete matching rows OTP_JANITOR_CHUNK_ROWS at a time, committing each chunk"""
+    cursor = conn.cursor()
+    purged = 0
+    while True:
+        cursor.execute(f'''
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM {table} WHERE {where} LIMIT ?
+            )
+        ''', list(params) + [OTP_JANITOR_CHUNK_ROWS])
+        deleted = cursor.rowcount
+        conn.commit()
+        purged += deleted
+        if deleted < OTP_JANITOR_CHUNK_ROWS:
+            return purged
+        time.sleep(OTP_JANITOR_CHUNK_PAUSE)
+
+def _table_size(cursor, table):
+    """Get a table's row count and, where SQLite has dbstat, its bytes on disk"""
+    cursor.execute(f'SELECT COUNT(*) AS count FROM {table}')
+    rows = cursor.fetchone()['count']
+    try:
+        cursor.execute('SELECT COALESCE(SUM(pgsize), 0) AS bytes FROM dbstat WHERE name = ?', (table,))
+        size_bytes = cursor.fetchone()['bytes']
+    except sqlite3.OperationalError:
+        size_bytes = None
+    return rows, size_bytes
+
+def purge_otps():
+    """Delete used OTPs, OTPs expired past the retention window and old finished emails; returns a per-table report"""
+    started = time.perf_counter()
+    # expires_at is stored as a UTC ISO string, so cutoffs compare as strings
+    cutoff = (datetime.utcnow() - timedelta(minutes=OTP_RETENTION_MINUTES)).isoformat()
+    # created_at is SQLite's UTC CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS')
+    email_cutoff = (datetime.utcnow() - timedelta(hours=EMAIL_OUTBOX_RETENTION_HOURS)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = get_db_connection()
+    try:
+        report = {'tables': {}, 'ran_at': datetime.now().isoformat()}
+        for table in OTP_TABLES:
+            purged = _delete_in_chunks(conn, table, 'expires_at < ?', (cutoff,))
+            purged += _delete_in_chunks(conn, table, 'is_used = TRUE', ())
+            rows, size_bytes = _table_size(conn.cursor(), table)
+            report['tables'][table] = {'purged': purged, 'rows': rows, 'bytes': size_bytes}
+        
+        # Pending and sending messages are kept whatever their age
+        purged = _delete_in_chunks(conn, 'email_outbox', "status IN ('sent', 'failed') AND created_at < ?",
+                                   (email_cutoff,))
+        rows, size_bytes = _table_size(conn.cursor(), 'email_outbox')
+        report['tables']['email_outbox'] = {'purged': purged, 'rows': rows, 'bytes': size_bytes}
+        report['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        _janitor['last_report'] = report
+        return report
+    finally:
+        close_db(conn)
+
+def _janitor_loop():
+    while True:
+        try:
+            report = purge_otps()
+            summary = ', '.join(f"{table}: {stats['purged']} purged, {stats['rows']} left"
+                                for table, stats in report['tables'].items())
+            print(f"OTP janitor: {summary}")
+        except Exception as e:
+            print(f"OTP janitor failed: {e}")
+        time.sleep(OTP_JANITOR_INTERVAL)
+
+def start_otp_janitor():
+    """Start the background thread that compacts the OTP tables and the email outbox"""
+    with _janitor_lock:
+        if _janitor['thread'] is not None:
+            return
+        _janitor['thread'] = threading.Thread(target=_janitor_loop, name='otp-janitor', daemon=True)
+        _janitor['thread'].start()
+
+def get_janitor_report():
+    """Get the report of the janitor's latest run, or None before the first"""
+    return _janitor['last_report']
+
+if __name__ == "__main__":
+    report = purge_otps()
+    for table, stats in report['tables'].items():
+        size = f", {stats['bytes']} bytes" if stats['bytes'] is not None else ''
+        print(f"✅ {table}: {stats['purged']} rows purged, {stats['rows']} rows left{size}")
+    print(f"   Took {report['duration_ms']} ms")
@@ -0,0 +1,57 @@
+import base64
+import json
+
+# Page size limits for keyset-paginated endpoints
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a page size query parameter, clamped to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+def parse_page_limit(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Page size for a listing request, or None when it sent neither limit nor cursor
+
+    Callers written before pagination do not follow next_cursor, so they
+    keep getting every row.
+    """
+    if not args.get('limit') and not args.get('cursor'):
+        return None
+    return parse_limit(args.get('limit'), default, maximum)
+
+def fetch_limit(limit):
+    """SQL LIMIT value for a page fetch: limit + 1 rows, or -1 (no limit) when unpaged"""
+    return -1 if limit is None else limit + 1
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, size):
+    """Decode a cursor produced by encode_cursor() into its sort key values"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+def page_response(rows, limit, cursor_key):
+    """Trim a limit + 1 fetch to one page and build the next cursor
+
+    Returns (page_rows, next_cursor); next_cursor is None on the last page
+    and for an unpaged (limit None) fetch.
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(cursor_key(page[-1]))
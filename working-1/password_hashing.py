@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# KDF and cost parameters for new hashes, in werkzeug's method syntax (e.g. scrypt:32768:8:1, pbkdf2:sha256:600000)
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+# Hashing processes (0 hashes on the request thread), and how many hashes may be queued or running
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(max(1, PASSWORD_HASH_WORKERS) * 4)))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '2'))
+
+# Workers are started from a clean server process; forking the threaded app could copy held locks
+PASSWORD_HASH_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Recent latencies kept per operation for the percentiles in get_stats
+PASSWORD_HASH_LATENCY_SAMPLES = 1000
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue stays full for the queue timeout"""
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+def _werkzeug_prefix(method):
+    """The method prefix werkzeug writes for a method, with its default costs filled in"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return 'scrypt:' + ':'.join(args or ['32768', '8', '1'])
+    if name == 'pbkdf2':
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS}"
+    raise ValueError(f"Invalid hash method '{method}'")
+
+def _percentile(samples, fraction):
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3)
+
+class PasswordHasher:
+    """Runs password KDF work in a process pool so it does not hold the request threads' GIL
+
+    At most max_pending hashes are queued or running; callers wait up to
+    queue_timeout for room and then get HashingBusy.
+    """
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, queue_timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._method_prefix = _werkzeug_prefix(method)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'rejected': 0, 'rehashed': 0, 'pool_restarts': 0, 'max_pending': max_pending,
+                       'peak_pending': 0}
+        self._latency = {'hash': deque(maxlen=PASSWORD_HASH_LATENCY_SAMPLES),
+                         'verify': deque(maxlen=PASSWORD_HASH_LATENCY_SAMPLES)}
+        self._counts = {'hash': 0, 'verify': 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(PASSWORD_HASH_START_METHOD))
+            return self._executor
+
+    def _restart_executor(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self._stats['pool_restarts'] += 1
+        broken.shutdown(wait=False)
+
+    def _run(self, operation, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashingBusy('Password hashing queue is full')
+        with self._lock:
+            self._pending += 1
+            self._stats['peak_pending'] = max(self._stats['peak_pending'], self._pending)
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+                self._restart_executor(executor)
+                return self._get_executor().submit(fn, *args).result()
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._pending -= 1
+                self._counts[operation] += 1
+                self._latency[operation].append(elapsed_ms)
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run('hash', _hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        return self._run('verify', _verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash uses a method or cost other than the configured one"""
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def record_rehash(self):
+        with self._lock:
+            self._stats['rehashed'] += 1
+
+    def get_stats(self):
+        """Get queue counters and per-operation latency percentiles in ms"""
+        with self._lock:
+            stats = dict(self._stats, pending=self._pending, method=self.method, workers=self.workers)
+            latencies = {operation: sorted(samples) for operation, samples in self._latency.items()}
+            counts = dict(self._counts)
+        for operation, samples in latencies.items():
+            stats[operation] = {
+                'count': counts[operation],
+                'p50_ms': _percentile(samples, 0.5) if samples else None,
+                'p95_ms': _percentile(samples, 0.95) if samples else None,
+                'max_ms': round(samples[-1], 3) if samples else None
+            }
+        return stats
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,183 @@
+import math
+import os
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify, g
+from database import get_db_connection, close_db, immediate_transaction
+
+# Set RATE_LIMIT_ENABLED=0 to turn limiting off (e.g. for load tests)
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+
+# Keep buckets in the database so every worker process shares one limit (off: per-process memory)
+RATE_LIMIT_SHARED = os.getenv('RATE_LIMIT_SHARED', '0') == '1'
+
+# Trust X-Forwarded-For for the client IP (only behind a proxy that sets it)
+RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', '0') == '1'
+
+# In-memory bucket shards, and how often refilled buckets are swept out
+RATE_LIMIT_SHARDS = int(os.getenv('RATE_LIMIT_SHARDS', '16'))
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv('RATE_LIMIT_SWEEP_INTERVAL', '60'))
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+def parse_rate(spec):
+    """Parse 'N/period' (second, minute or hour) into (capacity, tokens per second); None for 'off'"""
+    if spec is None or spec == 'off':
+        return None
+    count, _, period = spec.partition('/')
+    if period not in PERIODS or not count.isdigit() or int(count) < 1:
+        raise ValueError(f"Invalid rate limit '{spec}', expected e.g. '10/minute'")
+    return int(count), int(count) / PERIODS[period]
+
+def _refill(tokens, updated_at, now, capacity, rate):
+    """Tokens in a bucket after refilling at rate per second since updated_at"""
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+class TokenBuckets:
+    """Per-process token buckets in sharded dicts, each shard under its own lock
+
+    A bucket is (tokens, updated_at, full_at) and is refilled lazily when
+    taken from. Buckets that have refilled are the same as absent ones, so
+    each shard drops them every sweep_interval seconds.
+    """
+
+    def __init__(self, shards=RATE_LIMIT_SHARDS, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self._shards = [{'lock': threading.Lock(), 'buckets': {}, 'swept_at': time.monotonic()}
+                        for _ in range(shards)]
+
+    def take(self, key, capacity, rate):
+        """Take one token; returns 0 if allowed, else the seconds until one is available"""
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with shard['lock']:
+            buckets = shard['buckets']
+            if now - shard['swept_at'] >= self.sweep_interval:
+                for idle_key in [k for k, bucket in buckets.items() if bucket[2] <= now]:
+                    del buckets[idle_key]
+                shard['swept_at'] = now
+            bucket = buckets.get(key)
+            tokens = _refill(bucket[0], bucket[1], now, capacity, rate) if bucket else capacity
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return 0 if allowed else (1 - tokens) / rate
+
+    def size(self):
+        return sum(len(shard['buckets']) for shard in self._shards)
+
+class SharedTokenBuckets:
+    """Token buckets in the rate_limit_buckets table, shared by every process using the database"""
+
+    def __init__(self, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self._swept_at = time.time()
+
+    def take(self, key, capacity, rate):
+        """Take one token; returns 0 if allowed, else the seconds until one is available"""
+        now = time.time()
+        conn = get_db_connection()
+        try:
+            with immediate_transaction(conn) as cursor:
+                cursor.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?', (key,))
+                row = cursor.fetchone()
+                tokens = _refill(row['tokens'], row['updated_at'], now, capacity, rate) if row else capacity
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                cursor.execute('''
+                    INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at, full_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (bucket_key) DO UPDATE SET
+                        tokens = excluded.tokens, updated_at = excluded.updated_at, full_at = excluded.full_at
+                ''', (key, tokens, now, now + (capacity - tokens) / rate))
+                if now - self._swept_at >= self.sweep_interval:
+                    self._swept_at = now
+                    cursor.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+        finally:
+            close_db(conn)
+        return 0 if allowed else (1 - tokens) / rate
+
+    def size(self):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) AS count FROM rate_limit_buckets')
+            return cursor.fetchone()['count']
+        finally:
+            close_db(conn)
+
+class RateLimiter:
+    """Checks a request against its route's per-IP and per-account buckets"""
+
+    def __init__(self, shared=RATE_LIMIT_SHARED):
+        self.store = SharedTokenBuckets() if shared else TokenBuckets()
+        self._lock = threading.Lock()
+        self._stats = {}  # route -> {'allowed', 'limited'}
+
+    def _identity(self, kind):
+        if kind == 'ip':
+            if RATE_LIMIT_TRUST_PROXY and request.access_route:
+                return request.access_route[0]
+            return request.remote_addr
+        body = request.get_json(silent=True) if request.is_json else None
+        if not isinstance(body, dict):
+            body = {}
+        # Accounts are named by email, or by the session token's user where the route has no email
+        if body.get('email'):
+            return str(body['email']).strip().lower()
+        principal = g.get('principal')
+        if principal:
+            return str(principal['user_id'])
+        return str(body['user_id']) if body.get('user_id') else None
+
+    def check(self, route, limits):
+        """Take a token from each of the route's buckets; returns 0 or the seconds to wait"""
+        retry_after = 0
+        for kind, limit in limits.items():
+            identity = self._identity(kind) if limit is not None else None
+            if identity is None:
+                continue
+            retry_after = self.store.take(f'{route}:{kind}:{identity}', *limit)
+            if retry_after:
+                break
+        with self._lock:
+            stats = self._stats.setdefault(route, {'allowed': 0, 'limited': 0})
+            stats['limited' if retry_after else 'allowed'] += 1
+        return retry_after
+
+    def get_stats(self):
+        """Get allowed/limited counts per route and the number of live buckets"""
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._stats.items()}
+        return {'enabled': RATE_LIMIT_ENABLED, 'store': type(self.store).__name__,
+                'buckets': self.store.size(), 'routes': routes}
+
+rate_limiter = RateLimiter()
+
+def rate_limited(route, ip=None, account=None):
+    """Answer 429 with Retry-After once a client exceeds the route's limits, before the view runs
+
+    ip and account are defaults like '10/minute', keyed by client IP and by
+    the email (or user_id) in the JSON body; RATE_LIMIT_<ROUTE>_IP and
+    RATE_LIMIT_<ROUTE>_ACCOUNT override them ('off' disables one).
+    """
+    limits = {
+        'ip': parse_rate(os.getenv(f'RATE_LIMIT_{route.upper()}_IP', ip)),
+        'account': parse_rate(os.getenv(f'RATE_LIMIT_{route.upper()}_ACCOUNT', account))
+    }
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED:
+                retry_after = rate_limiter.check(route, limits)
+                if retry_after:
+                    response = jsonify({'error': 'Too many requests, please try again later'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(math.ceil(retry_after))
+                    return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Bulk generation of weekly time slot templates
+Usage: python slot_generator.py [open_time] [close_time] [slot_minutes]
+"""
+
+import os
+import sys
+import time
+from database import get_db_connection, close_db
+from availability import time_to_minutes
+from slot_inventory import extend_court_inventory
+
+# Courts per transaction, so a large initialization never holds the write lock for long
+SLOT_GENERATOR_CHUNK_COURTS = int(os.getenv('SLOT_GENERATOR_CHUNK_COURTS', '50'))
+
+# Default schedule: 7 AM to 11 PM, 1-hour slots, every day (0 = Sunday, 6 = Saturday)
+DEFAULT_SCHEDULE = {
+    'open_time': '07:00',
+    'close_time': '23:00',
+    'slot_minutes': 60,
+    'days': [0, 1, 2, 3, 4, 5, 6]
+}
+
+def parse_schedule(spec=None, base=None):
+    """Validate a schedule spec into (open_minute, close_minute, slot_minutes, day_mask)
+
+    Missing keys fall back to base (or DEFAULT_SCHEDULE). Days can be given
+    as a list of weekday numbers or as day_mask, bit 0 being Sunday. Raises
+    ValueError with a message suitable for a 400 response.
+    """
+    schedule = dict(base or DEFAULT_SCHEDULE)
+    schedule.update(spec or {})
+
+    try:
+        open_minute = time_to_minutes(schedule['open_time'])
+        close_minute = time_to_minutes(schedule['close_time'])
+    except (AttributeError, ValueError):
+        raise ValueError('open_time and close_time must be in HH:MM format')
+    try:
+        slot_minutes = int(schedule['slot_minutes'])
+    except (TypeError, ValueError):
+        raise ValueError('slot_minutes must be an integer')
+
+    if 'day_mask' in schedule:
+        day_mask = int(schedule['day_mask'])
+    else:
+        day_mask = 0
+        for day in schedule['days']:
+            if int(day) not in range(7):
+                raise ValueError('days must be between 0 (Sunday) and 6 (Saturday)')
+            day_mask |= 1 << int(day)
+
+    if not 0 <= open_minute < close_minute <= 24 * 60:
+        raise ValueError('open_time must be before close_time')
+    if slot_minutes <= 0 or open_minute + slot_minutes > close_minute:
+        raise ValueError('slot_minutes must fit between open_time and close_time')
+    if not 0 < day_mask < 1 << 7:
+        raise ValueError('At least one day is required')
+    return open_minute, close_minute, slot_minutes, day_mask
+
+def _insert_chunk(cursor, court_ids, schedule):
+    """Insert one chunk of courts' slots with a single INSERT ... SELECT"""
+    open_minute, close_minute, slot_minutes, day_mask = schedule
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO time_slots (court_id, day_of_week, start_time, end_time, is_available)
+        WITH RECURSIVE
+            days(d) AS (SELECT 0 UNION ALL SELECT d + 1 FROM days WHERE d < 6),
+            starts(m) AS (SELECT ? UNION ALL SELECT m + ? FROM starts WHERE m + 2 * ? <= ?)
+        SELECT c.id, days.d,
+               printf('%02d:%02d', starts.m / 60, starts.m % 60),
+               printf('%02d:%02d', (starts.m + ?) / 60, (starts.m + ?) % 60),
+               TRUE
+        FROM courts c, days, starts
+        WHERE (? >> days.d) & 1 = 1
+        AND c.id IN ({', '.join('?' for _ in court_ids)})
+    ''', [open_minute, slot_minutes, slot_minutes, close_minute,
+          slot_minutes, slot_minutes, day_mask] + list(court_ids))
+    return cursor.rowcount
+
+def generate_time_slots(conn, court_schedules, chunk_size=SLOT_GENERATOR_CHUNK_COURTS):
+    """Generate templates for {court_id: parsed schedule} in chunked transactions
+
+    Courts sharing a schedule are inserted together; existing slots are kept
+    (the unique index on court_id, day_of_week, start_time makes reruns
+    idempotent). Each chunk also generates inventory rows for its new slots only.
+    Returns row counts, timing and template rows per second.
+    """
+    started = time.monotonic()
+    groups = {}
+    for court_id, schedule in court_schedules.items():
+        groups.setdefault(schedule, []).append(court_id)
+
+    cursor = conn.cursor()
+    rows_created = 0
+    inventory_rows = 0
+    insert_seconds = 0.0
+    chunks = 0
+    for schedule, court_ids in groups.items():
+        for i in range(0, len(court_ids), chunk_size):
+            chunk = court_ids[i:i + chunk_size]
+            cursor.execute('SELECT COALESCE(MAX(id), 0) AS max_id FROM time_slots')
+            last_id = cursor.fetchone()['max_id']
+            chunk_started = time.monotonic()
+            inserted = _insert_chunk(cursor, chunk, schedule)
+            insert_seconds += time.monotonic() - chunk_started
+            rows_created += inserted
+            if inserted:
+                inventory_rows += extend_court_inventory(cursor, chunk, after_time_slot_id=last_id)
+            conn.commit()
+            chunks += 1
+
+    elapsed = time.monotonic() - started
+    return {
+        'rows_created': rows_created,
+        'inventory_rows_created': inventory_rows,
+        'courts': len(court_schedules),
+        'chunks': chunks,
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'rows_per_second': round(rows_created / insert_seconds) if insert_seconds > 0 else 0
+    }
+
+if __name__ == "__main__":
+    spec = dict(zip(['open_time', 'close_time', 'slot_minutes'], sys.argv[1:4]))
+    try:
+        schedule = parse_schedule(spec)
+    except ValueError as e:
+        print(f"❌ {e}")
+        print(__doc__)
+        sys.exit(2)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM courts')
+        court_ids = [row['id'] for row in cursor.fetchall()]
+        stats = generate_time_slots(conn, {court_id: schedule for court_id in court_ids})
+        print(f"✅ Created {stats['rows_created']} time slots for {stats['courts']} courts "
+              f"in {stats['elapsed_ms']} ms ({stats['rows_per_second']} rows/s)")
+    finally:
+        close_db(conn)
@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from database import get_db_connection, close_db
+from availability import time_to_minutes
+
+# Rolling horizon of generated inventory
+SLOT_INVENTORY_HORIZON_DAYS = int(os.getenv('SLOT_INVENTORY_HORIZON_DAYS', '60'))
+SLOT_INVENTORY_RETENTION_DAYS = int(os.getenv('SLOT_INVENTORY_RETENTION_DAYS', '7'))
+SLOT_INVENTORY_ROLL_INTERVAL = float(os.getenv('SLOT_INVENTORY_ROLL_INTERVAL', '3600'))
+
+# Days generated per transaction, so the roller never holds the write lock for long
+SLOT_INVENTORY_CHUNK_DAYS = 7
+
+# Date window this process knows the roller has generated
+_rolled = {'from': None, 'through': None}
+_roller = {'thread': None}
+_roller_lock = threading.Lock()
+
+def minutes_sql(column):
+    """SQL expression converting an 'HH:MM' column to minutes after midnight"""
+    return (f"(CAST(substr({column}, 1, instr({column}, ':') - 1) AS INTEGER) * 60"
+            f" + CAST(substr({column}, instr({column}, ':') + 1, 2) AS INTEGER))")
+
+def _court_filter(court_ids, column):
+    """Build an optional court_id IN (...) filter and its parameters"""
+    if court_ids is None:
+        return '', []
+    court_ids = list(court_ids)
+    return f" AND {column} IN ({', '.join('?' for _ in court_ids)})", court_ids
+
+def generate_inventory(cursor, start_date, end_date, court_ids=None, after_time_slot_id=None):
+    """Generate inventory rows for [start_date, end_date] from the weekly templates
+
+    Existing rows are left alone (INSERT OR IGNORE), then rows covered by an
+    active booking are marked booked. after_time_slot_id limits generation
+    to templates created after that id. Returns the number of rows inserted.
+    """
+    court_filter, params = _court_filter(court_ids, 'ts.court_id')
+    if after_time_slot_id is not None:
+        court_filter += ' AND ts.id > ?'
+        params.append(after_time_slot_id)
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO slot_inventory (court_id, slot_date, start_minute, end_minute, status, time_slot_id)
+        WITH RECURSIVE days(d) AS (
+            SELECT ?
+            UNION ALL
+            SELECT date(d, '+1 day') FROM days WHERE d < ?
+        )
+        SELECT ts.court_id, days.d, {minutes_sql('ts.start_time')}, {minutes_sql('ts.end_time')},
+               CASE WHEN ts.is_available THEN 'open' ELSE 'blocked' END, ts.id
+        FROM days
+        JOIN time_slots ts ON ts.day_of_week = CAST(strftime('%w', days.d) AS INTEGER)
+        WHERE 1 = 1{court_filter}
+        ORDER BY ts.court_id, days.d, ts.start_time, ts.id
+    ''', [start_date, end_date] + params)
+    inserted = cursor.rowcount
+    mark_booked(cursor, start_date, end_date, court_ids)
+    return inserted
+
+def mark_booked(cursor, start_date, end_date, court_ids=None):
+    """Mark inventory rows whose start is covered by an active booking as booked"""
+    court_filter, params = _court_filter(court_ids, 'slot_inventory.court_id')
+    covering_booking = f'''
+        FROM bookings b
+        WHERE b.court_id = slot_inventory.court_id
+        AND b.booking_date = slot_inventory.slot_date
+        AND b.status != 'cancelled'
+        AND {minutes_sql('b.start_time')} <= slot_inventory.start_minute
+        AND {minutes_sql('b.end_time')} > slot_inventory.start_minute
+    '''
+    cursor.execute(f'''
+        UPDATE slot_inventory
+        SET status = 'booked', booking_id = (SELECT b.id {covering_booking} ORDER BY b.id LIMIT 1)
+        WHERE slot_date BETWEEN ? AND ?
+        AND status != 'booked'{court_filter}
+        AND EXISTS (SELECT 1 {covering_booking})
+    ''', [start_date, end_date] + params)
+    return cursor.rowcount
+
+def extend_court_inventory(cursor, court_ids=None, after_time_slot_id=None):
+    """Generate missing future inventory after templates are added (all courts if None)"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    end_date = _rolled['through'] or (datetime.now() + timedelta(days=SLOT_INVENTORY_HORIZON_DAYS)).strftime('%Y-%m-%d')
+    return generate_inventory(cursor, today, max(today, end_date), court_ids, after_time_slot_id)
+
+def resync_court_inventory(cursor, court_ids=None):
+    """Regenerate unbooked future inventory after courts' templates change (all courts if None)"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    court_filter, params = _court_filter(court_ids, 'court_id')
+    cursor.execute(f'''
+        DELETE FROM slot_inventory
+        WHERE slot_date >= ? AND status != 'booked' AND hold_id IS NULL{court_filter}
+    ''', [today] + params)
+    return extend_court_inventory(cursor, court_ids)
+
+def in_rolled_window(start_date, end_date):
+    """Check whether the roller has generated inventory for every date in [start_date, end_date]"""
+    return _rolled['through'] is not None and _rolled['from'] <= start_date and end_date <= _rolled['through']
+
+def ensure_inventory(cursor, start_date, end_date, court_ids=None):
+    """Generate inventory on demand for dates outside the rolled window (booking paths only)
+
+    Returns True if rows were generated (the caller must commit).
+    """
+    if in_rolled_window(start_date, end_date):
+        return False
+    generate_inventory(cursor, start_date, end_date, court_ids)
+    return True
+
+def inventory_source(start_date, end_date, court_ids=None):
+    """Get (sql, params) for a FROM-clause source of inventory rows in [start_date, end_date]
+
+    Inside the rolled window this is slot_inventory itself. Outside it, so
+    read paths never write, rows that were not generated are derived from
+    the weekly templates and active bookings the way generate_inventory and
+    mark_booked would make them.
+    """
+    if in_rolled_window(start_date, end_date):
+        return 'slot_inventory', []
+    court_filter, court_params = _court_filter(court_ids, 'ts.court_id')
+    start_minute = minutes_sql('ts.start_time')
+    covering_booking = f'''
+        SELECT b.id FROM bookings b
+        WHERE b.court_id = ts.court_id AND b.booking_date = days.d AND b.status != 'cancelled'
+        AND {minutes_sql('b.start_time')} <= {start_minute} AND {minutes_sql('b.end_time')} > {start_minute}
+        ORDER BY b.id LIMIT 1
+    '''
+    sql = f'''(
+        SELECT court_id, slot_date, start_minute, end_minute, status, time_slot_id, booking_id, hold_id
+        FROM slot_inventory
+        WHERE slot_date BETWEEN ? AND ?
+        UNION ALL
+        SELECT court_id, slot_date, start_minute, end_minute,
+               CASE WHEN booking_id IS NOT NULL THEN 'booked' WHEN is_available THEN 'open' ELSE 'blocked' END,
+               time_slot_id, booking_id, NULL
+        FROM (
+            WITH RECURSIVE days(d) AS (
+                SELECT ?
+                UNION ALL
+                SELECT date(d, '+1 day') FROM days WHERE d < ?
+            )
+            SELECT ts.court_id, days.d AS slot_date, {start_minute} AS start_minute,
+                   {minutes_sql('ts.end_time')} AS end_minute, ts.is_available, ts.id AS time_slot_id,
+                   ({covering_booking}) AS booking_id
+            FROM days
+            JOIN time_slots ts ON ts.day_of_week = CAST(strftime('%w', days.d) AS INTEGER)
+            WHERE ts.id = (
+                SELECT MIN(dup.id) FROM time_slots dup
+                WHERE dup.court_id = ts.court_id AND dup.day_of_week = ts.day_of_week
+                AND {minutes_sql('dup.start_time')} = {start_minute}
+            ){court_filter}
+            AND NOT EXISTS (
+                SELECT 1 FROM slot_inventory si
+                WHERE si.court_id = ts.court_id AND si.slot_date = days.d AND si.start_minute = {start_minute}
+            )
+        )
+    )'''
+    return sql, [start_date, end_date, start_date, end_date] + court_params
+
+def claim_booking_slots(cursor, booking_id, court_id, booking_date, start_time, end_time, hold_id=None):
+    """Flip the open inventory rows covered by a booking to booked
+
+    Rows held by another checkout are skipped; rows under hold_id (the
+    booker's own hold) are claimed and released from the hold.
+    """
+    cursor.execute('''
+        UPDATE slot_inventory
+        SET status = 'booked', booking_id = ?, hold_id = NULL
+        WHERE court_id = ? AND slot_date = ?
+        AND start_minute >= ? AND start_minute < ?
+        AND status = 'open' AND (hold_id IS NULL OR hold_id = ?)
+    ''', (booking_id, court_id, booking_date, time_to_minutes(start_time), time_to_minutes(end_time), hold_id))
+    return cursor.rowcount
+
+def claim_many_booking_slots(cursor, claims):
+    """Claim the open, unheld rows of many bookings with one executemany
+
+    claims are (booking_id, court_id, booking_date, start_minute, end_minute)
+    tuples. Returns the total number of rows claimed.
+    """
+    cursor.executemany('''
+        UPDATE slot_inventory
+        SET status = 'booked', booking_id = ?
+        WHERE court_id = ? AND slot_date = ?
+        AND start_minute >= ? AND start_minute < ?
+        AND status = 'open' AND hold_id IS NULL
+    ''', claims)
+    return cursor.rowcount
+
+def release_booking_slots(cursor, booking_id):
+    """Return a booking's inventory rows to their template state"""
+    cursor.execute('''
+        UPDATE slot_inventory
+        SET status = COALESCE((
+                SELECT CASE WHEN ts.is_available THEN 'open' ELSE 'blocked' END
+                FROM time_slots ts WHERE ts.id = slot_inventory.time_slot_id
+            ), 'blocked'),
+            booking_id = NULL
+        WHERE booking_id = ?
+    ''', (booking_id,))
+    return cursor.rowcount
+
+def roll_inventory():
+    """Extend inventory to the rolling horizon and drop rows past the retention window"""
+    today = datetime.now().date()
+    horizon = today + timedelta(days=SLOT_INVENTORY_HORIZON_DAYS)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        inserted = 0
+        chunk_start = today
+        while chunk_start <= horizon:
+            chunk_end = min(chunk_start + timedelta(days=SLOT_INVENTORY_CHUNK_DAYS - 1), horizon)
+            inserted += generate_inventory(cursor, chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d'))
+            conn.commit()
+            chunk_start = chunk_end + timedelta(days=1)
+
+        cursor.execute('DELETE FROM slot_inventory WHERE slot_date < ?',
+                       ((today - timedelta(days=SLOT_INVENTORY_RETENTION_DAYS)).strftime('%Y-%m-%d'),))
+        purged = cursor.rowcount
+        conn.commit()
+
+        _rolled['from'] = today.strftime('%Y-%m-%d')
+        _rolled['through'] = horizon.strftime('%Y-%m-%d')
+        return inserted, purged
+    finally:
+        close_db(conn)
+
+def _roller_loop():
+    while True:
+        try:
+            inserted, purged = roll_inventory()
+            print(f"Slot inventory rolled through {_rolled['through']}: {inserted} rows added, {purged} purged")
+        except Exception as e:
+            print(f"Slot inventory roll failed: {e}")
+        time.sleep(SLOT_INVENTORY_ROLL_INTERVAL)
+
+def start_inventory_roller():
+    """Start the background thread that keeps inventory rolled forward"""
+    with _roller_lock:
+        if _roller['thread'] is not None:
+            return
+        _roller['thread'] = threading.Thread(target=_roller_loop, name='slot-inventory-roller', daemon=True)
+        _roller['thread'].start()
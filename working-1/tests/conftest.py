@@ -0,0 +1,80 @@
+"""
+Shared fixtures; the whole session runs against a scratch copy of quickcourt.db
+"""
+
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# The app opens quickcourt.db relative to the working directory, so copy it and move there first
+WORKDIR = tempfile.mkdtemp(prefix='quickcourt-test-')
+shutil.copy(os.path.join(APP_DIR, 'quickcourt.db'), os.path.join(WORKDIR, 'quickcourt.db'))
+os.chdir(WORKDIR)
+
+from app import app  # noqa: E402
+from database import get_db_connection, close_db  # noqa: E402
+from auth_tokens import issue_token  # noqa: E402
+
+# Each test books on its own day so tests never collide on a slot
+_day_offsets = itertools.count(1)
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+@pytest.fixture
+def db():
+    """A cursor on the scratch database"""
+    conn = get_db_connection()
+    try:
+        yield conn.cursor()
+    finally:
+        close_db(conn)
+
+@pytest.fixture
+def user_id(db):
+    db.execute('SELECT id FROM users ORDER BY id LIMIT 1')
+    return db.fetchone()['id']
+
+@pytest.fixture
+def court(client, db):
+    """An active court of an existing facility, with its weekly time slots in place"""
+    db.execute('''
+        SELECT c.id, c.facility_id FROM courts c JOIN facilities f ON f.id = c.facility_id
+        WHERE c.status = 'active' ORDER BY c.id LIMIT 1
+    ''')
+    court = dict(db.fetchone())
+    client.post('/time-slots/initialize', json={'court_ids': [court['id']]})
+    return court
+
+@pytest.fixture
+def booking_date():
+    """A future date no other test has used"""
+    return (datetime.now() + timedelta(days=next(_day_offsets))).strftime('%Y-%m-%d')
+
+def booking_payload(user_id, court, booking_date, start_time='10:00', end_time='11:00'):
+    """JSON body for POST /bookings"""
+    return {
+        'user_id': user_id,
+        'court_id': court['id'],
+        'booking_date': booking_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'duration': 1,
+        'total_amount': 100,
+        'payment_method': 'card',
+        'status': 'confirmed'
+    }
+
+def auth_headers(user_id, role='user'):
+    """Authorization header carrying a session token for user_id"""
+    token, _ = issue_token(app.config['SECRET_KEY'], user_id, role)
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,68 @@
+import base64
+import json
+
+from app import app
+from conftest import auth_headers, booking_payload
+from auth_tokens import issue_token, verify_token
+
+SECRET = 'test-secret'
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def test_valid_token_round_trips():
+    token, expires_at = issue_token(SECRET, 7, 'user')
+    assert verify_token(SECRET, token) == {'uid': 7, 'role': 'user', 'exp': expires_at}
+
+def test_tampered_token_is_rejected():
+    token, _ = issue_token(SECRET, 7, 'user')
+    payload, signature = token.split('.')
+    claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    claims['role'] = 'admin'
+    forged = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b'=').decode()
+
+    assert verify_token(SECRET, f'{forged}.{signature}') is None
+    assert verify_token(SECRET, f'{payload}.{signature[:-2]}xx') is None
+    assert verify_token('another-secret', token) is None
+    assert verify_token(SECRET, payload) is None
+
+def test_non_ascii_token_is_rejected():
+    token, _ = issue_token(SECRET, 7, 'user')
+    payload, signature = token.split('.')
+    assert verify_token(SECRET, f'{payload}é.{signature}') is None
+    assert verify_token(SECRET, f'{payload}.{signature}é') is None
+
+def test_expired_token_is_rejected():
+    token, _ = issue_token(SECRET, 7, 'user', ttl=-1)
+    assert verify_token(SECRET, token) is None
+
+def test_requests_with_bad_tokens_get_401(client, user_id):
+    secret = app.config['SECRET_KEY']
+    token, _ = issue_token(secret, user_id, 'user')
+    expired, _ = issue_token(secret, user_id, 'user', ttl=-1)
+
+    assert client.get('/bookings', headers=bearer(token)).status_code == 200
+    assert client.get('/bookings', headers=bearer(token[:-1] + ('A' if token[-1] != 'A' else 'B'))).status_code == 401
+    assert client.get('/bookings', headers=bearer(expired)).status_code == 401
+    assert client.get('/bookings', headers=bearer(token + 'é')).status_code == 401
+
+def test_token_for_another_user_gets_403(client, user_id):
+    token, _ = issue_token(app.config['SECRET_KEY'], user_id, 'user')
+    assert client.get(f'/bookings?user_id={user_id + 1}', headers=bearer(token)).status_code == 403
+
+def test_writes_without_a_token_get_401(client, user_id, court, booking_date):
+    payload = booking_payload(user_id, court, booking_date)
+    assert client.post('/bookings', json=payload).status_code == 401
+    assert client.post('/holds', json=payload).status_code == 401
+    assert client.post('/change-password', json={'user_id': user_id, 'current_password': 'x',
+                                                 'new_password': 'y'}).status_code == 401
+    assert client.post('/reviews', json={'user_id': user_id, 'facility_id': court['facility_id'], 'rating': 5,
+                                         'review_text': 'Great courts all round'}).status_code == 401
+
+def test_writes_act_as_the_token_user(client, db, user_id, court, booking_date):
+    payload = booking_payload(user_id, court, booking_date)
+    del payload['user_id']
+    response = client.post('/bookings', json=payload, headers=auth_headers(user_id))
+    assert response.status_code == 201
+    db.execute('SELECT user_id FROM bookings WHERE id = ?', (response.get_json()['booking_id'],))
+    assert db.fetchone()['user_id'] == user_id
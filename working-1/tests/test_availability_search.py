@@ -0,0 +1,47 @@
+import pytest
+
+import availability
+
+@pytest.fixture
+def cheaper_court(client, db, court):
+    """A second, cheaper court at the same facility"""
+    db.execute('''
+        INSERT INTO courts (facility_id, name, sport_type, court_number, hourly_rate)
+        VALUES (?, 'Search Court', 'Tennis', 99, 60)
+    ''', (court['facility_id'],))
+    court_id = db.lastrowid
+    db.connection.commit()
+    client.post('/time-slots/initialize', json={'court_ids': [court_id]})
+    yield court_id
+    db.execute('DELETE FROM time_slots WHERE court_id = ?', (court_id,))
+    db.execute('DELETE FROM courts WHERE id = ?', (court_id,))
+    db.connection.commit()
+
+def search(client, query):
+    response = client.get(f'/availability/search?{query}')
+    assert response.status_code == 200
+    return response.get_json()['results']
+
+def check_prices(db, results):
+    for result in results:
+        db.execute('SELECT hourly_rate FROM courts WHERE id = ?', (result['court_id'],))
+        assert result['price'] == round(db.fetchone()['hourly_rate'], 2)
+
+def test_search_by_start_is_ordered_and_names_the_right_court(client, db, cheaper_court):
+    results = search(client, 'from=2031-03-03&to=2031-03-09&limit=30')
+    assert len(results) == 30
+    assert [(r['date'], r['start_time']) for r in results] == sorted((r['date'], r['start_time']) for r in results)
+    assert len({r['court_id'] for r in results}) > 1
+    check_prices(db, results)
+
+def test_search_by_price_is_ordered(client, db, cheaper_court):
+    results = search(client, 'from=2031-03-03&to=2031-03-09&sort=price&limit=30')
+    assert len(results) == 30
+    assert [r['price'] for r in results] == sorted(r['price'] for r in results)
+    assert results[0]['court_id'] == cheaper_court
+    check_prices(db, results)
+
+def test_search_chunks_the_court_list(client, cheaper_court, monkeypatch):
+    expected = search(client, 'from=2031-03-03&to=2031-03-04&limit=50')
+    monkeypatch.setattr(availability, 'MAX_IN_CLAUSE_SIZE', 1)
+    assert search(client, 'from=2031-03-03&to=2031-03-04&limit=50') == expected
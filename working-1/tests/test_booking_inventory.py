@@ -0,0 +1,84 @@
+from conftest import auth_headers, booking_payload
+
+def inventory(db, court, booking_date):
+    """{start_minute: (status, booking_id)} for the 10:00-11:00 rows of a court's date"""
+    db.execute('''
+        SELECT start_minute, status, booking_id FROM slot_inventory
+        WHERE court_id = ? AND slot_date = ? AND start_minute >= 600 AND start_minute < 660
+    ''', (court['id'], booking_date))
+    return {row['start_minute']: (row['status'], row['booking_id']) for row in db.fetchall()}
+
+def has_conflict(client, user_id, court, booking_date):
+    response = client.post('/bookings/check-conflict', json=booking_payload(user_id, court, booking_date))
+    return response.get_json()['has_conflict']
+
+def test_book_cancel_reactivate_keeps_inventory_in_step(client, db, user_id, court, booking_date):
+    response = client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                           headers=auth_headers(user_id))
+    assert response.status_code == 201
+    booking_id = response.get_json()['booking_id']
+    assert inventory(db, court, booking_date)
+    assert all(slot == ('booked', booking_id) for slot in inventory(db, court, booking_date).values())
+
+    assert client.post(f'/bookings/{booking_id}/cancel', headers=auth_headers(user_id)).status_code == 200
+    assert all(slot == ('open', None) for slot in inventory(db, court, booking_date).values())
+    assert not has_conflict(client, user_id, court, booking_date)
+
+    assert client.put(f'/bookings/{booking_id}', json={'status': 'confirmed'}).status_code == 200
+    assert all(slot == ('booked', booking_id) for slot in inventory(db, court, booking_date).values())
+    assert has_conflict(client, user_id, court, booking_date)
+
+def test_reactivating_over_a_newer_booking_is_refused(client, db, user_id, court, booking_date):
+    first = client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                        headers=auth_headers(user_id)).get_json()['booking_id']
+    client.post(f'/bookings/{first}/cancel', headers=auth_headers(user_id))
+    second = client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                         headers=auth_headers(user_id)).get_json()['booking_id']
+
+    assert client.put(f'/bookings/{first}', json={'status': 'confirmed'}).status_code == 409
+    db.execute('SELECT status FROM bookings WHERE id = ?', (first,))
+    assert db.fetchone()['status'] == 'cancelled'
+    assert all(slot == ('booked', second) for slot in inventory(db, court, booking_date).values())
+
+def test_reactivating_an_overlapping_booking_is_refused(client, db, user_id, court, booking_date):
+    first = client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                        headers=auth_headers(user_id)).get_json()['booking_id']
+    client.post(f'/bookings/{first}/cancel', headers=auth_headers(user_id))
+    overlapping = booking_payload(user_id, court, booking_date, start_time='09:00', end_time='11:00')
+    assert client.post('/bookings', json=overlapping,
+                       headers=auth_headers(overlapping['user_id'])).status_code == 201
+
+    assert client.put(f'/bookings/{first}', json={'status': 'confirmed'}).status_code == 409
+
+def test_reads_outside_the_rolled_window_do_not_write(client, db, court):
+    db.execute('SELECT COUNT(*) AS count FROM slot_inventory')
+    before = db.fetchone()['count']
+
+    slots = client.get(f"/time-slots?court_id={court['id']}&date=2024-01-01").get_json()['time_slots']
+    grid = client.get(f"/facilities/{court['facility_id']}/availability?from=2031-01-06&to=2031-01-12")
+    search = client.get('/availability/search?from=2031-01-06&to=2031-01-12')
+
+    assert slots and grid.status_code == 200 and search.status_code == 200
+    assert any(day for c in grid.get_json()['courts'] for day in c['days'].values())
+    db.execute('SELECT COUNT(*) AS count FROM slot_inventory')
+    assert db.fetchone()['count'] == before
+
+def test_reads_outside_the_rolled_window_show_bookings(client, user_id, court):
+    assert client.post('/bookings', json=booking_payload(user_id, court, '2031-02-03'),
+                       headers=auth_headers(user_id)).status_code == 201
+    slots = client.get(f"/time-slots?court_id={court['id']}&date=2031-02-03").get_json()['time_slots']
+    booked = {slot['start_time'] for slot in slots if not slot['is_available']}
+    assert '10:00' in booked
+
+def test_templates_closed_by_past_bookings_are_reopened(client, db):
+    # The shipped database's 2025-08-13 booking cleared court 16's Wednesday 08:00 template
+    db.execute("SELECT is_available FROM time_slots WHERE court_id = 16 AND day_of_week = 3 AND start_time = '08:00'")
+    assert all(row['is_available'] for row in db.fetchall())
+    slots = client.get('/time-slots?court_id=16&date=2031-01-08').get_json()['time_slots']
+    assert [slot['is_available'] for slot in slots if slot['start_time'] == '08:00'] == [True]
+
+def test_cancelling_twice_is_refused(client, user_id, court, booking_date):
+    booking_id = client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                             headers=auth_headers(user_id)).get_json()['booking_id']
+    assert client.post(f'/bookings/{booking_id}/cancel', headers=auth_headers(user_id)).status_code == 200
+    assert client.post(f'/bookings/{booking_id}/cancel', headers=auth_headers(user_id)).status_code == 400
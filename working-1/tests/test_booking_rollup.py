@@ -0,0 +1,28 @@
+from booking_rollup import check_booking_rollup
+from conftest import auth_headers, booking_payload
+
+def test_rollup_follows_court_changes(client, db, user_id, court, booking_date):
+    assert client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                       headers=auth_headers(user_id)).status_code == 201
+    assert check_booking_rollup(db) == []
+
+    db.execute('SELECT sport_type FROM courts WHERE id = ?', (court['id'],))
+    sport = db.fetchone()['sport_type']
+    db.execute("UPDATE courts SET sport_type = 'rollup-test' WHERE id = ?", (court['id'],))
+    assert check_booking_rollup(db) == []
+    db.execute("SELECT DISTINCT sport FROM booking_daily_rollup WHERE court_id = ?", (court['id'],))
+    assert [row['sport'] for row in db.fetchall()] == ['rollup-test']
+
+    db.execute('UPDATE courts SET sport_type = ? WHERE id = ?', (sport, court['id']))
+    assert check_booking_rollup(db) == []
+    db.connection.rollback()
+
+def test_rollup_follows_court_delete(client, db, user_id, court, booking_date):
+    assert client.post('/bookings', json=booking_payload(user_id, court, booking_date),
+                       headers=auth_headers(user_id)).status_code == 201
+
+    db.execute('DELETE FROM courts WHERE id = ?', (court['id'],))
+    assert check_booking_rollup(db) == []
+    db.execute("SELECT DISTINCT sport FROM booking_daily_rollup WHERE court_id = ?", (court['id'],))
+    assert [row['sport'] for row in db.fetchall()] == ['']
+    db.connection.rollback()
@@ -0,0 +1,15 @@
+import pytest
+
+from database import get_db_connection, close_db, immediate_transaction, TransactionAborted
+
+def test_aborted_transaction_rolls_back_earlier_writes(db):
+    conn = get_db_connection()
+    try:
+        with pytest.raises(TransactionAborted):
+            with immediate_transaction(conn) as cursor:
+                cursor.execute("INSERT INTO table_versions (table_name) VALUES ('aborted-write')")
+                raise TransactionAborted({'error': 'rejected'}, 409)
+    finally:
+        close_db(conn)
+    db.execute("SELECT COUNT(*) AS count FROM table_versions WHERE table_name = 'aborted-write'")
+    assert db.fetchone()['count'] == 0
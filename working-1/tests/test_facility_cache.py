@@ -0,0 +1,17 @@
+from conftest import auth_headers
+
+def test_owner_rename_reaches_cached_facility_details(client, db, court):
+    db.execute('''
+        SELECT u.id, u.full_name, u.email FROM facilities f JOIN users u ON u.id = f.owner_id WHERE f.id = ?
+    ''', (court['facility_id'],))
+    owner = dict(db.fetchone())
+    path = f"/facilities/{court['facility_id']}"
+    assert client.get(path).get_json()['facility']['owner_name'] == owner['full_name']
+
+    profile = {'user_id': owner['id'], 'full_name': 'Renamed Owner', 'email': owner['email']}
+    try:
+        assert client.post('/update-profile', json=profile, headers=auth_headers(owner['id'])).status_code == 200
+        assert client.get(path).get_json()['facility']['owner_name'] == 'Renamed Owner'
+    finally:
+        client.post('/update-profile', json=dict(profile, full_name=owner['full_name']),
+                    headers=auth_headers(owner['id']))
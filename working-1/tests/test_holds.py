@@ -0,0 +1,59 @@
+import time
+
+from conftest import auth_headers, booking_payload
+from holds import TimingWheel, hold_wheel
+
+def hold_payload(user_id, court, booking_date):
+    return {'user_id': user_id, 'court_id': court['id'], 'booking_date': booking_date,
+            'start_time': '10:00', 'end_time': '11:00', 'minutes': 1}
+
+def other_user(db, user_id):
+    db.execute('SELECT id FROM users WHERE id != ? ORDER BY id LIMIT 1', (user_id,))
+    return db.fetchone()['id']
+
+def test_timing_wheel_expires_keys_after_their_ticks():
+    wheel = TimingWheel(tick_seconds=1, size=4)
+    wheel.schedule('soon', 2)
+    wheel.schedule('later', 6)
+    wheel.schedule('cancelled', 1)
+    wheel.cancel('cancelled')
+
+    expired = [wheel.advance() for _ in range(6)]
+    assert expired == [[], ['soon'], [], [], [], ['later']]
+    assert len(wheel) == 0
+
+def test_expired_hold_is_released_on_the_booking_path(client, db, user_id, court, booking_date):
+    hold = client.post('/holds', json=hold_payload(user_id, court, booking_date),
+                       headers=auth_headers(user_id))
+    assert hold.status_code == 201
+    hold_id = hold.get_json()['hold_id']
+    hold_wheel.cancel(hold_id)
+    other = booking_payload(other_user(db, user_id), court, booking_date)
+    assert client.post('/bookings', json=other, headers=auth_headers(other['user_id'])).status_code == 400
+
+    # As if the worker that scheduled it had died: only expires_at says it is over
+    db.execute('UPDATE slot_holds SET expires_at = ? WHERE id = ?', (time.time() - 1, hold_id))
+    db.connection.commit()
+    assert client.post('/bookings', json=other, headers=auth_headers(other['user_id'])).status_code == 201
+    db.execute('SELECT COUNT(*) AS count FROM slot_holds WHERE id = ?', (hold_id,))
+    assert db.fetchone()['count'] == 0
+
+def test_expired_hold_is_released_by_the_wheel(client, db, user_id, court, booking_date):
+    hold_id = client.post('/holds', json=hold_payload(user_id, court, booking_date),
+                          headers=auth_headers(user_id)).get_json()['hold_id']
+    hold_wheel.schedule(hold_id, 0.01)
+
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        db.execute('SELECT COUNT(*) AS count FROM slot_holds WHERE id = ?', (hold_id,))
+        if db.fetchone()['count'] == 0:
+            break
+        time.sleep(0.1)
+    db.execute('SELECT COUNT(*) AS count FROM slot_holds WHERE id = ?', (hold_id,))
+    assert db.fetchone()['count'] == 0
+    db.execute('SELECT COUNT(*) AS count FROM slot_inventory WHERE hold_id = ?', (hold_id,))
+    assert db.fetchone()['count'] == 0
+    other_id = other_user(db, user_id)
+    held = client.post('/holds', json=hold_payload(other_id, court, booking_date),
+                       headers=auth_headers(other_id))
+    assert held.status_code == 201
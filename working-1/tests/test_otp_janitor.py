@@ -0,0 +1,19 @@
+from otp_janitor import purge_otps
+
+def test_old_finished_emails_are_purged(db):
+    rows = [('sent', '2000-01-01 00:00:00'), ('failed', '2000-01-01 00:00:00'),
+            ('pending', '2000-01-01 00:00:00'), ('sent', None)]
+    ids = []
+    for status, created_at in rows:
+        db.execute('''
+            INSERT INTO email_outbox (recipient, subject, body, status, next_attempt_at, created_at)
+            VALUES ('janitor@example.com', 'Your OTP', '123456', ?, 0, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', (status, created_at))
+        ids.append(db.lastrowid)
+    db.connection.commit()
+
+    report = purge_otps()
+
+    assert report['tables']['email_outbox']['purged'] >= 2
+    db.execute(f"SELECT id FROM email_outbox WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+    assert sorted(row['id'] for row in db.fetchall()) == ids[2:]
@@ -0,0 +1,62 @@
+from cache import response_cache
+
+def test_facilities_without_limit_or_cursor_are_not_truncated(client, db, user_id):
+    db.executemany("INSERT INTO facilities (owner_id, name, location) VALUES (?, ?, 'Test Road')",
+                   [(user_id, f'Paged Venue {number}') for number in range(25)])
+    db.connection.commit()
+    response_cache.clear()
+    try:
+        db.execute("SELECT COUNT(*) AS count FROM facilities WHERE status = 'active'")
+        active = db.fetchone()['count']
+
+        everything = client.get('/facilities').get_json()
+        assert everything['count'] == active > 20
+        assert everything['next_cursor'] is None
+
+        page = client.get('/facilities?limit=5').get_json()
+        assert page['count'] == 5 and page['next_cursor']
+        rest = client.get(f"/facilities?cursor={page['next_cursor']}&limit=100").get_json()
+        assert page['count'] + rest['count'] == active
+    finally:
+        db.execute("DELETE FROM facilities WHERE name LIKE 'Paged Venue %'")
+        db.connection.commit()
+        response_cache.clear()
+
+def test_bookings_without_limit_or_cursor_are_not_truncated(client, db, user_id, court):
+    db.executemany('''
+        INSERT INTO bookings (user_id, court_id, facility_id, booking_date, start_time, end_time,
+                              total_amount, status)
+        VALUES (?, ?, ?, ?, '10:00', '11:00', 100, 'cancelled')
+    ''', [(user_id, court['id'], court['facility_id'], f'2020-01-{day:02d}') for day in range(1, 26)])
+    db.connection.commit()
+    try:
+        query = f'/bookings?user_id={user_id}&from=2020-01-01&to=2020-01-31'
+        everything = client.get(query).get_json()
+        assert everything['count'] == 25
+        assert everything['next_cursor'] is None
+
+        page = client.get(f'{query}&limit=5').get_json()
+        assert page['count'] == 5 and page['next_cursor']
+        rest = client.get(f"{query}&cursor={page['next_cursor']}&limit=100").get_json()
+        assert page['count'] + rest['count'] == 25
+    finally:
+        db.execute("DELETE FROM bookings WHERE user_id = ? AND booking_date BETWEEN '2020-01-01' AND '2020-01-31'",
+                   (user_id,))
+        db.connection.commit()
+
+def test_admin_users_without_limit_or_cursor_are_not_truncated(client, db):
+    db.executemany("INSERT INTO users (full_name, email, password_hash) VALUES (?, ?, 'x')",
+                   [(f'Paged User {number}', f'paged.user.{number}@example.com') for number in range(25)])
+    db.connection.commit()
+    try:
+        everything = client.get('/admin/users?q=Paged User').get_json()
+        assert everything['count'] == 25
+        assert everything['next_cursor'] is None
+
+        page = client.get('/admin/users?q=Paged User&limit=5').get_json()
+        assert page['count'] == 5 and page['next_cursor']
+        rest = client.get(f"/admin/users?q=Paged User&cursor={page['next_cursor']}&limit=100").get_json()
+        assert page['count'] + rest['count'] == 25
+    finally:
+        db.execute("DELETE FROM users WHERE email LIKE 'paged.user.%@example.com'")
+        db.connection.commit()
@@ -0,0 +1,9 @@
+from password_hashing import PasswordHasher
+
+def test_pool_workers_are_not_forked_from_the_server():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    password_hash = hasher.hash('secret')
+    assert hasher.verify(password_hash, 'secret')
+    assert not hasher.verify(password_hash, 'wrong')
+    assert hasher._executor._mp_context.get_start_method() != 'fork'
+    hasher._executor.shutdown()
@@ -0,0 +1,37 @@
+import pytest
+
+from rate_limit import TokenBuckets, parse_rate
+
+def login(client, email, ip):
+    return client.post('/login', json={'email': email, 'password': 'wrong-password'},
+                       environ_base={'REMOTE_ADDR': ip})
+
+def test_parse_rate():
+    assert parse_rate('10/minute') == (10, 10 / 60)
+    assert parse_rate('off') is None
+    with pytest.raises(ValueError):
+        parse_rate('10/fortnight')
+
+def test_bucket_allows_capacity_then_reports_the_wait():
+    buckets = TokenBuckets(shards=2)
+    assert [buckets.take('key', 3, 1) for _ in range(3)] == [0, 0, 0]
+    assert 0 < buckets.take('key', 3, 1) <= 1
+    assert buckets.take('other', 3, 1) == 0
+
+def test_login_account_limit_answers_429_with_retry_after(client):
+    for _ in range(10):
+        assert login(client, 'limited-account@example.com', '10.0.0.1').status_code == 401
+
+    response = login(client, 'limited-account@example.com', '10.0.0.1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert login(client, 'another-account@example.com', '10.0.0.1').status_code == 401
+
+def test_login_ip_limit_answers_429_across_accounts(client):
+    for attempt in range(30):
+        assert login(client, f'ip-limit-{attempt}@example.com', '10.0.0.2').status_code == 401
+
+    response = login(client, 'ip-limit-last@example.com', '10.0.0.2')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert login(client, 'ip-limit-last@example.com', '10.0.0.3').status_code == 401